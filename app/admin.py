@@ -0,0 +1,78 @@
+import os
+import secrets
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic import BaseModel
+
+from app import answer_cache, faq_cache, llm_accounting
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+APP_ENV = os.getenv("APP_ENV", "dev")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """
+    Admin guard:
+    - with ADMIN_TOKEN set, the X-Admin-Token header must match.
+    - without ADMIN_TOKEN, admin endpoints are open in dev and disabled in prod.
+    """
+    if ADMIN_TOKEN:
+        if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+        return
+    if APP_ENV.lower() == "prod":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints require ADMIN_TOKEN in production",
+        )
+
+
+class FaqCacheResponse(BaseModel):
+    stats: Dict[str, Any]
+    entries: List[Dict[str, Any]]
+
+
+class PurgeResponse(BaseModel):
+    purged: int
+
+
+@router.get("/faq-cache", response_model=FaqCacheResponse, dependencies=[Depends(require_admin)])
+def get_faq_cache() -> FaqCacheResponse:
+    return FaqCacheResponse(stats=faq_cache.stats(), entries=faq_cache.list_entries())
+
+
+@router.delete("/faq-cache", response_model=PurgeResponse, dependencies=[Depends(require_admin)])
+def purge_faq_cache() -> PurgeResponse:
+    return PurgeResponse(purged=faq_cache.purge())
+
+
+@router.delete("/faq-cache/{entry_id}", response_model=PurgeResponse, dependencies=[Depends(require_admin)])
+def purge_faq_cache_entry(entry_id: str) -> PurgeResponse:
+    purged = faq_cache.purge(entry_id)
+    if not purged:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="FAQ cache entry not found")
+    return PurgeResponse(purged=purged)
+
+
+@router.get("/answer-cache", dependencies=[Depends(require_admin)])
+def get_answer_cache() -> Dict[str, Any]:
+    return {"stats": answer_cache.stats()}
+
+
+@router.delete("/answer-cache", response_model=PurgeResponse, dependencies=[Depends(require_admin)])
+def purge_answer_cache() -> PurgeResponse:
+    return PurgeResponse(purged=answer_cache.clear())
+
+
+@router.get("/llm-calls", dependencies=[Depends(require_admin)])
+def get_llm_calls() -> Dict[str, Any]:
+    """Per-call-site latency, tokens, timeouts and errors (rolling window + lifetime)."""
+    return llm_accounting.ledger.summary()
+
+
+@router.delete("/llm-calls", response_model=PurgeResponse, dependencies=[Depends(require_admin)])
+def reset_llm_calls() -> PurgeResponse:
+    return PurgeResponse(purged=llm_accounting.ledger.reset())
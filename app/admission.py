@@ -0,0 +1,373 @@
+"""
+Admission control for the chat endpoints.
+
+AdmissionMiddleware sits in front of POST /api/v1/chat, /api/v1/chat/stream
+and /api/v1/chat/image (plus the legacy /chat routes) and decides per
+request, before any pipeline work starts:
+
+  1. per guest   at most ADMISSION_GUEST_MAX_INFLIGHT turns running or
+                 waiting, and a token bucket (ADMISSION_GUEST_RATE_PER_S,
+                 burst ADMISSION_GUEST_BURST)            → 429 RATE_LIMITED
+  2. global      ADMISSION_MAX_INFLIGHT concurrent turns and a token bucket
+                 (ADMISSION_RATE_PER_S, burst ADMISSION_BURST). Requests
+                 that do not fit wait in a bounded queue (ADMISSION_QUEUE_SIZE)
+                 for at most ADMISSION_QUEUE_TIMEOUT_MS; text turns are
+                 served before image turns                → 503 OVERLOADED
+
+Both rejections carry Retry-After. The guest is the `guestId` from the JSON
+or multipart body, else the client address. A slot is held until the
+response is complete, i.e. for the whole SSE stream.
+
+State lives on the event loop (no locks); limits are per process.
+
+Metrics (GET /api/v1/metrics):
+  kursbot_admission_decisions_total{kind,outcome}   admitted | queued |
+      guest_concurrency | guest_rate | queue_full | queue_timeout
+  kursbot_admission_wait_seconds{kind}              queue wait of admitted turns
+  kursbot_admission_inflight                        running turns (gauge)
+  kursbot_admission_queue_depth                     waiting turns (gauge)
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import metrics
+from app.clients import (
+    ADMISSION_BURST,
+    ADMISSION_ENABLED,
+    ADMISSION_GUEST_BURST,
+    ADMISSION_GUEST_MAX_INFLIGHT,
+    ADMISSION_GUEST_RATE_PER_S,
+    ADMISSION_MAX_INFLIGHT,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT_MS,
+    ADMISSION_RATE_PER_S,
+)
+
+CHAT_PATHS = {
+    "/chat": "text",
+    "/api/v1/chat": "text",
+    "/api/v1/chat/stream": "text",
+    "/chat/image": "image",
+    "/api/v1/chat/image": "image",
+}
+_PRIORITY = {"text": 0, "image": 1}
+
+DECISIONS_TOTAL = "kursbot_admission_decisions_total"
+WAIT_SECONDS = "kursbot_admission_wait_seconds"
+INFLIGHT = "kursbot_admission_inflight"
+QUEUE_DEPTH = "kursbot_admission_queue_depth"
+
+metrics.describe(DECISIONS_TOTAL, "counter", "Admission decisions for chat requests.")
+metrics.describe(WAIT_SECONDS, "histogram", "Time an admitted chat request waited in the admission queue.",
+                 buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+metrics.describe(INFLIGHT, "gauge", "Chat requests currently admitted.")
+metrics.describe(QUEUE_DEPTH, "gauge", "Chat requests waiting for admission.")
+
+
+class AdmissionRejected(Exception):
+    """Request refused; rendered as 429/503 with Retry-After."""
+
+    def __init__(self, status: int, code: str, reason: str, retry_after_s: int):
+        super().__init__(reason)
+        self.status = status
+        self.code = code
+        self.reason = reason
+        self.retry_after_s = max(1, retry_after_s)
+
+
+class TokenBucket:
+    """Classic token bucket; rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: Optional[float] = None) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def wait_s(self, now: Optional[float] = None) -> float:
+        """Seconds until the next token is available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic() if now is None else now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class Ticket:
+    __slots__ = ("guest", "kind")
+
+    def __init__(self, guest: str, kind: str):
+        self.guest = guest
+        self.kind = kind
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_inflight: int = ADMISSION_MAX_INFLIGHT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS,
+        rate_per_s: float = ADMISSION_RATE_PER_S,
+        burst: float = ADMISSION_BURST,
+        guest_max_inflight: int = ADMISSION_GUEST_MAX_INFLIGHT,
+        guest_rate_per_s: float = ADMISSION_GUEST_RATE_PER_S,
+        guest_burst: float = ADMISSION_GUEST_BURST,
+    ):
+        self.max_inflight = max(1, max_inflight)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout_s = max(0.0, queue_timeout_ms) / 1000
+        self.guest_max_inflight = guest_max_inflight
+        self.guest_rate_per_s = guest_rate_per_s
+        self.guest_burst = guest_burst
+        self._bucket = TokenBucket(rate_per_s, burst)
+        self._guest_buckets: Dict[str, TokenBucket] = {}
+        self._guest_inflight: Dict[str, int] = {}  # running + waiting
+        self._inflight = 0
+        self._waiters: List[Tuple[int, int, "asyncio.Future"]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ── public ──────────────────────────────────────────────────────────
+    async def acquire(self, guest: str, kind: str = "text") -> Ticket:
+        self._admit_guest(guest, kind)
+        ticket = Ticket(guest, kind)
+        if not self._waiters and self._inflight < self.max_inflight and self._bucket.take():
+            self._inflight += 1
+            self._record(kind, "admitted", 0.0)
+            return ticket
+        if len(self._waiters) >= self.queue_size:
+            self._reject_global(ticket, "queue_full")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (_PRIORITY.get(kind, 1), next(self._seq), future))
+        self._publish()
+        self._dispatch()
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():  # admitted in the same tick
+                self._record(kind, "queued", time.perf_counter() - queued_at)
+                return ticket
+            future.cancel()
+            self._purge()
+            self._reject_global(ticket, "queue_timeout")
+        except BaseException:  # client went away while queued
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            else:
+                future.cancel()
+                self._purge()
+            self._release_guest(guest)
+            raise
+        self._record(kind, "queued", time.perf_counter() - queued_at)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        self._release_guest(ticket.guest)
+        self._release_slot()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": self._inflight, "queued": len(self._waiters),
+                "guests": len(self._guest_inflight)}
+
+    # ── internals ───────────────────────────────────────────────────────
+    def _admit_guest(self, guest: str, kind: str) -> None:
+        active = self._guest_inflight.get(guest, 0)
+        if self.guest_max_inflight > 0 and active >= self.guest_max_inflight:
+            metrics.inc(DECISIONS_TOTAL, {"kind": kind, "outcome": "guest_concurrency"})
+            raise AdmissionRejected(429, "RATE_LIMITED", "guest_concurrency", 1)
+        bucket = self._guest_buckets.get(guest)
+        if bucket is None:
+            if len(self._guest_buckets) > 10_000:
+                self._prune_guest_buckets()
+            bucket = self._guest_buckets[guest] = TokenBucket(self.guest_rate_per_s, self.guest_burst)
+        if not bucket.take():
+            metrics.inc(DECISIONS_TOTAL, {"kind": kind, "outcome": "guest_rate"})
+            raise AdmissionRejected(429, "RATE_LIMITED", "guest_rate", math.ceil(bucket.wait_s()))
+        self._guest_inflight[guest] = active + 1
+
+    def _prune_guest_buckets(self) -> None:
+        # drop idle guests whose bucket has fully refilled
+        now = time.monotonic()
+        for guest, bucket in list(self._guest_buckets.items()):
+            bucket._refill(now)
+            if guest not in self._guest_inflight and bucket.tokens >= bucket.burst:
+                del self._guest_buckets[guest]
+
+    def _reject_global(self, ticket: Ticket, reason: str) -> None:
+        bucket = self._guest_buckets.get(ticket.guest)
+        if bucket is not None:
+            bucket.refund()  # not the guest's fault
+        self._release_guest(ticket.guest)
+        metrics.inc(DECISIONS_TOTAL, {"kind": ticket.kind, "outcome": reason})
+        print(f"[ADMISSION] rejected {ticket.kind} turn ({reason}, {self._inflight} in flight, "
+              f"{len(self._waiters)} queued)")
+        retry = max(self.queue_timeout_s, self._bucket.wait_s())
+        raise AdmissionRejected(503, "OVERLOADED", reason, math.ceil(retry))
+
+    def _release_guest(self, guest: str) -> None:
+        active = self._guest_inflight.get(guest, 0) - 1
+        if active > 0:
+            self._guest_inflight[guest] = active
+        else:
+            self._guest_inflight.pop(guest, None)
+
+    def _release_slot(self) -> None:
+        self._inflight = max(0, self._inflight - 1)
+        self._dispatch()
+
+    def _purge(self) -> None:
+        self._waiters = [w for w in self._waiters if not w[2].done()]
+        heapq.heapify(self._waiters)
+        self._publish()
+
+    def _dispatch(self) -> None:
+        """Hand free slots (and global tokens) to waiters in priority order."""
+        while self._waiters and self._inflight < self.max_inflight:
+            future = self._waiters[0][2]
+            if future.done() or future.get_loop().is_closed():
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._bucket.wait_s()
+            if wait > 0:
+                if self._timer is None or self._timer_loop.is_closed():
+                    self._timer_loop = future.get_loop()
+                    self._timer = self._timer_loop.call_later(wait, self._on_timer)
+                break
+            self._bucket.take()
+            heapq.heappop(self._waiters)
+            self._inflight += 1
+            future.set_result(None)
+        self._publish()
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _record(self, kind: str, outcome: str, waited_s: float) -> None:
+        metrics.inc(DECISIONS_TOTAL, {"kind": kind, "outcome": outcome})
+        metrics.observe(WAIT_SECONDS, waited_s, {"kind": kind})
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(INFLIGHT, self._inflight, {})
+        metrics.set_gauge(QUEUE_DEPTH, len(self._waiters), {})
+
+
+controller = AdmissionController()
+
+_MULTIPART_GUEST = re.compile(rb'name="guestId"\r\n\r\n([^\r\n]{1,200})\r\n')
+
+
+def _guest_key(scope: Dict[str, Any], body: bytes) -> str:
+    guest = None
+    content_type = dict(scope.get("headers") or []).get(b"content-type", b"")
+    if content_type.startswith(b"application/json"):
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict):
+                guest = payload.get("guestId")
+        except ValueError:
+            pass
+    elif content_type.startswith(b"multipart/form-data"):
+        match = _MULTIPART_GUEST.search(body)
+        if match:
+            guest = match.group(1).decode("utf-8", errors="replace")
+    if isinstance(guest, str) and guest.strip():
+        return f"guest:{guest.strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware (keeps StreamingResponse streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        kind = CHAT_PATHS.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if kind is None or scope.get("method") != "POST" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        body, receive = await _buffer_body(receive)
+        admission = controller  # module attribute, looked up per request (tests swap it)
+        try:
+            ticket = await admission.acquire(_guest_key(scope, body), kind)
+        except AdmissionRejected as exc:
+            await _send_rejection(send, exc)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(ticket)
+
+
+async def _buffer_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":  # disconnect before the body was complete
+            chunks = None
+            pending = message
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            pending = None
+            break
+    body = b"".join(chunks) if chunks is not None else b""
+    replayed = False
+
+    async def _replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            if pending is not None:
+                return pending
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, _replay
+
+
+async def _send_rejection(send, exc: AdmissionRejected) -> None:
+    message = ("Too many requests for this guest, please retry shortly." if exc.status == 429
+               else "Server is busy, please retry shortly.")
+    payload = json.dumps({"error": {"code": exc.code, "message": message}}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": exc.status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            (b"retry-after", str(exc.retry_after_s).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
@@ -0,0 +1,116 @@
+"""
+Exact-match answer cache for fresh KNOWLEDGE turns.
+
+Main completions run at temperature 0.0, so a knowledge question asked in a
+fresh conversation (no summary, no history) with the same retrieved chunks and
+the same prompt produces the same answer. Such answers are cached in-process
+and replayed instead of calling the LLM again.
+
+Key = (model, prompt template version, normalized message, retrieved chunk ids
++ chunk text hashes, hash of the assembled user prompt). Because the chunk
+text is part of the key, a re-ingest that changes course content makes old
+entries unreachable; they age out via TTL/LRU. clear() drops everything.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.clients import MODEL, ANSWER_CACHE_ENABLED, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_S
+from app.chat_modes import ChatMode
+from app.prompt_builder import SYSTEM_INSTRUCTIONS
+
+PROMPT_TEMPLATE_VERSION = hashlib.sha1(SYSTEM_INSTRUCTIONS.encode("utf-8")).hexdigest()[:12]
+
+_REPLAY_WORDS = 3
+_WORD_RE = re.compile(r"\S+\s*|\s+")
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+
+def normalize_message(message: str) -> str:
+    return " ".join((message or "").lower().split())
+
+
+def is_cacheable(
+    mode: ChatMode,
+    summary: Optional[str],
+    last_messages: List[Dict],
+    trennkost_results=None,
+    needs_clarification: Optional[str] = None,
+    image_path: Optional[str] = None,
+) -> bool:
+    """Only fresh-conversation KNOWLEDGE turns without engine, image or clarification."""
+    if not ANSWER_CACHE_ENABLED or mode != ChatMode.KNOWLEDGE:
+        return False
+    if summary or trennkost_results or needs_clarification or image_path:
+        return False
+    # last_messages includes the current user message. A canned opener from the
+    # intent shortcut (assistant-only history) carries no personal context.
+    history = (last_messages or [])[:-1]
+    return not any(m.get("role") == "user" for m in history)
+
+
+def make_key(normalized_message: str, docs: List[str], metas: List[Dict], llm_input: str) -> str:
+    """Cache key over model, template version, message, chunk ids/content and prompt."""
+    h = hashlib.sha256()
+    for part in (MODEL, PROMPT_TEMPLATE_VERSION, normalize_message(normalized_message)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    for doc, meta in zip(docs, metas):
+        chunk_id = f"{meta.get('path', '?')}#{meta.get('chunk', '?')}"
+        h.update(chunk_id.encode("utf-8"))
+        h.update(hashlib.sha1((doc or "").encode("utf-8")).digest())
+    h.update(b"\0")
+    h.update(llm_input.encode("utf-8"))
+    return h.hexdigest()
+
+
+def get(key: Optional[str]) -> Optional[str]:
+    if not key:
+        return None
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or now - entry[0] > ANSWER_CACHE_TTL_S:
+            if entry is not None:
+                del _entries[key]
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[1]
+
+
+def put(key: Optional[str], answer: str) -> None:
+    if not key or not answer:
+        return
+    with _lock:
+        _entries[key] = (time.time(), answer)
+        _entries.move_to_end(key)
+        _stats["stores"] += 1
+        while len(_entries) > ANSWER_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def clear() -> int:
+    with _lock:
+        n = len(_entries)
+        _entries.clear()
+        return n
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
+
+
+def replay_chunks(answer: str, words: int = _REPLAY_WORDS) -> Iterator[str]:
+    """Split a cached answer into small delta pieces (whitespace preserved)."""
+    tokens = _WORD_RE.findall(answer)
+    for i in range(0, len(tokens), words):
+        yield "".join(tokens[i:i + words])
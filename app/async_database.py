@@ -0,0 +1,135 @@
+"""
+Async access to app.database for the streaming path.
+
+Every function of app.database has an awaitable twin here with the same
+name and arguments:
+
+    from app import async_database as adb
+    conversation_id = await adb.create_conversation(guest_id)
+
+Calls are queued to one dedicated DB thread that keeps a persistent SQLite
+connection (database.use_persistent_connection), so an await costs a queue
+hand-off instead of a thread-pool round trip plus connection setup. The SQL
+itself is the sync implementation, run on that thread.
+
+run(fn, *args) executes any callable on the DB thread, for composite steps
+(e.g. save the answer and check the summary threshold in one hop). Keep
+network and LLM work off this thread: it serializes all DB access.
+"""
+import asyncio
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+from app import database
+
+
+class _DBThread:
+    def __init__(self):
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="async-db", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        database.use_persistent_connection()
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    return
+                fn, args, kwargs, loop, future = job
+                try:
+                    result = fn(*args, **kwargs)
+                    callback, value = _set_result, result
+                except BaseException as exc:  # delivered to the awaiting coroutine
+                    callback, value = _set_exception, exc
+                try:
+                    loop.call_soon_threadsafe(callback, future, value)
+                except RuntimeError:  # caller's loop already closed
+                    pass
+        finally:
+            database.close_persistent_connection()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> "asyncio.Future":
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((fn, args, kwargs, loop, future))
+        return future
+
+    def stop(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+        self._thread = None
+
+
+def _set_result(future: "asyncio.Future", result: Any) -> None:
+    if not future.cancelled():
+        future.set_result(result)
+
+
+def _set_exception(future: "asyncio.Future", exc: BaseException) -> None:
+    if not future.cancelled():
+        future.set_exception(exc)
+
+
+_db_thread = _DBThread()
+
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Run fn(*args, **kwargs) on the DB thread and await its result."""
+    return await _db_thread.submit(fn, *args, **kwargs)
+
+
+def shutdown() -> None:
+    """Stop the DB thread and close its connection (app shutdown)."""
+    _db_thread.stop()
+
+
+def _async(name: str) -> Callable:
+    async def _call(*args, **kwargs):
+        # looked up per call so patched database functions are honoured
+        return await _db_thread.submit(getattr(database, name), *args, **kwargs)
+    _call.__name__ = _call.__qualname__ = name
+    _call.__doc__ = getattr(database, name).__doc__
+    return _call
+
+
+create_conversation = _async("create_conversation")
+get_conversation = _async("get_conversation")
+update_conversation_timestamp = _async("update_conversation_timestamp")
+create_message = _async("create_message")
+delete_message = _async("delete_message")
+get_messages = _async("get_messages")
+get_last_n_messages = _async("get_last_n_messages")
+count_messages_since_cursor = _async("count_messages_since_cursor")
+get_messages_since_cursor = _async("get_messages_since_cursor")
+update_summary = _async("update_summary")
+get_total_message_count = _async("get_total_message_count")
+get_conversations_by_guest = _async("get_conversations_by_guest")
+get_all_conversations_without_guest = _async("get_all_conversations_without_guest")
+update_conversation_guest_id = _async("update_conversation_guest_id")
+update_conversation_title = _async("update_conversation_title")
+save_active_menu_state = _async("save_active_menu_state")
+get_active_menu_state = _async("get_active_menu_state")
+update_active_menu_focus = _async("update_active_menu_focus")
+clear_active_menu_state = _async("clear_active_menu_state")
+conversation_belongs_to_guest = _async("conversation_belongs_to_guest")
+export_conversation_for_feedback = _async("export_conversation_for_feedback")
+delete_conversation = _async("delete_conversation")
+create_user = _async("create_user")
+get_user_by_email = _async("get_user_by_email")
+get_user_by_id = _async("get_user_by_id")
+grant_entitlement = _async("grant_entitlement")
+set_conversation_start_intent = _async("set_conversation_start_intent")
+get_entitlements_for_user = _async("get_entitlements_for_user")
@@ -0,0 +1,125 @@
+"""
+Cancellation of chat turns whose client went away.
+
+handle_chat_stream_async owns one CancelToken per turn. When the SSE client
+disconnects, Starlette cancels the response generator; its finally block
+calls token.cancel(), and from then on:
+
+  - _prepare_stream (run via scoped()) stops at the next stage boundary:
+    check(stage) raises TurnCancelled, so no further rewrite, food
+    classification, retrieval or prompt assembly is started and the cpu
+    worker is free again,
+  - the LLM stream worker stops reading, closes the upstream HTTP response
+    (the API stops generating) and releases its llm pool thread,
+  - STREAM_PERSIST_ON_DISCONNECT decides what happens to the answer text
+    streamed so far: "none" (default) stores nothing, "partial" stores it as
+    the assistant message (never cached, no summary update).
+
+Telemetry:
+  kursbot_turn_cancellations_total{stage,persisted}  where the cancel took effect
+  kursbot_cancel_saved_tokens_total                  estimated completion tokens not generated
+  kursbot_cancel_freed_workers_total{pool}           worker threads released early
+
+Saved tokens are estimated from a moving average of completed answer
+lengths minus what was already streamed.
+"""
+import contextvars
+import threading
+from typing import Callable, Optional
+
+from app import metrics
+
+CANCELLATIONS_TOTAL = "kursbot_turn_cancellations_total"
+SAVED_TOKENS_TOTAL = "kursbot_cancel_saved_tokens_total"
+FREED_WORKERS_TOTAL = "kursbot_cancel_freed_workers_total"
+
+metrics.describe(CANCELLATIONS_TOTAL, "counter",
+                 "Turns abandoned by their client, by stage where the cancel took effect and whether text was stored.")
+metrics.describe(SAVED_TOKENS_TOTAL, "counter", "Estimated LLM completion tokens not generated due to cancellation.")
+metrics.describe(FREED_WORKERS_TOTAL, "counter", "Executor threads released early due to cancellation, by pool.")
+
+_DEFAULT_ANSWER_TOKENS = 300.0  # until the first answer has been observed
+_EWMA_ALPHA = 0.1
+
+
+class TurnCancelled(Exception):
+    """Raised by check() once the turn's client has disconnected."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"turn cancelled before {stage}")
+        self.stage = stage
+
+
+class CancelToken:
+    """Thread-safe one-way flag shared by the event loop and the worker threads of one turn."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "client_disconnect") -> None:
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self, stage: str) -> None:
+        if self._event.is_set():
+            raise TurnCancelled(stage)
+
+
+_current: "contextvars.ContextVar[Optional[CancelToken]]" = contextvars.ContextVar("cancel_token", default=None)
+
+
+def check(stage: str) -> None:
+    """Stage boundary: raise TurnCancelled if the current turn was cancelled (no-op without a token)."""
+    token = _current.get()
+    if token is not None:
+        token.check(stage)
+
+
+def scoped(fn: Callable, token: CancelToken, pool: str) -> Callable:
+    """fn running with token as the current turn's token (for executor submits); records cancels."""
+    def _scoped(*args, **kwargs):
+        ctx_token = _current.set(token)
+        try:
+            return fn(*args, **kwargs)
+        except TurnCancelled as exc:
+            print(f"[CANCEL] {exc} ({token.reason}) → {pool} worker released")
+            record(exc.stage, pool)
+            raise
+        finally:
+            _current.reset(ctx_token)
+    return _scoped
+
+
+# ── Saved-token estimate ──────────────────────────────────────────────
+
+_lock = threading.Lock()
+_expected_answer_tokens = _DEFAULT_ANSWER_TOKENS
+
+
+def observe_answer(tokens: int) -> None:
+    """Feed the length of a completed answer into the saved-token estimate."""
+    global _expected_answer_tokens
+    with _lock:
+        _expected_answer_tokens += _EWMA_ALPHA * (tokens - _expected_answer_tokens)
+
+
+def record(stage: str, pool: str, streamed_tokens: int = 0, persisted: bool = False) -> None:
+    """Count one cancelled turn: stage, freed worker, completion tokens not generated."""
+    with _lock:
+        expected = _expected_answer_tokens
+    metrics.inc(CANCELLATIONS_TOTAL, {"stage": stage, "persisted": "true" if persisted else "false"})
+    metrics.inc(FREED_WORKERS_TOTAL, {"pool": pool})
+    metrics.inc(SAVED_TOKENS_TOTAL, {}, max(0, round(expected) - streamed_tokens))
+
+
+def reset() -> None:
+    """Forget observed answer lengths (tests)."""
+    global _expected_answer_tokens
+    with _lock:
+        _expected_answer_tokens = _DEFAULT_ANSWER_TOKENS
@@ -1,18 +1,24 @@
 import asyncio
+import contextvars
 import json
 import os
 import re
 import time
 import uuid
-from typing import AsyncGenerator, Generator, Optional, List, Dict, Any, Tuple
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
+from typing import AsyncGenerator, Callable, Generator, Optional, List, Dict, Any, Tuple
 
-from app.clients import client, MODEL, LAST_N, SUMMARY_THRESHOLD, DISTANCE_THRESHOLD, DEBUG_RAG
+from app.clients import (
+    client, MODEL, LAST_N, SUMMARY_THRESHOLD, DISTANCE_THRESHOLD, DEBUG_RAG,
+    STREAM_DELTA_MODE, STREAM_DELTA_FLUSH_MS, STREAM_DELTA_FLUSH_CHARS,
+    FUSED_PREPROCESSING_ENABLED, STREAM_PERSIST_ON_DISCONNECT,
+)
 from app.rag_service import (
     retrieve_with_fallback,
     build_context,
     rewrite_standalone_query,
     expand_alias_terms,
+    cached_embedding,
 )
 from app.input_service import (
     normalize_input,
@@ -23,11 +29,18 @@ from app.input_service import (
     llm_call,
 )
 from app.recipe_builder import handle_recipe_from_ingredients, format_recipe_directly
+from app import (
+    answer_cache, async_database as adb, cancellation, circuit_breaker, deadline, executors, faq_cache,
+    fused_preprocessing, metrics, speculative_retrieval,
+)
+from app.stream_deltas import DeltaCoalescer
 
 from app.database import (
     create_conversation,
     get_conversation,
     create_message,
+    delete_conversation,
+    delete_message,
     get_last_n_messages,
     count_messages_since_cursor,
     get_messages_since_cursor,
@@ -64,18 +77,21 @@ from trennkost.analyzer import (
     analyze_text as trennkost_analyze_text,
     analyze_vision as trennkost_analyze_vision,
 )
-from trennkost.formatter import build_rag_query
+from trennkost.formatter import build_rag_query, format_results_without_llm, format_verdict_directly
 from trennkost.models import TrennkostResult
 
 from app.chat_modes import ChatMode, ChatModifiers, detect_chat_mode
+from app.direct_answer_policy import evaluate_direct_answer_policy
 from app.grounding_policy import (
     FALLBACK_SENTENCE,
     evaluate_grounding_policy,
     should_emit_fallback_sentence,
 )
 from app.prompt_builder import (
+    rank_menu_results,
     SYSTEM_INSTRUCTIONS,
-    build_base_context,
+    build_summary_block,
+    build_history_lines,
     build_engine_block,
     build_menu_injection,
     build_vision_failed_block,
@@ -91,6 +107,18 @@ from app.prompt_builder import (
     assemble_prompt,
     build_ui_intent_block,
 )
+from app.token_budget import PromptParts, PromptSection, count_tokens, history_section, summary_section
+
+DIRECT_ANSWERS_TOTAL = "kursbot_direct_verdict_answers_total"
+DEGRADED_ANSWERS_TOTAL = "kursbot_llm_degraded_answers_total"
+
+metrics.describe(DIRECT_ANSWERS_TOTAL, "counter",
+                 "FOOD_ANALYSIS turns by direct-answer decision (direct, or the reason the LLM was used).")
+metrics.describe(DEGRADED_ANSWERS_TOTAL, "counter",
+                 "Turns answered without the LLM because its circuit breaker was open, by answer kind.")
+
+_DEGRADED_NOTE = "_Der KI-Assistent ist gerade nicht erreichbar — hier die regelbasierte Auswertung:_"
+_DEGRADED_SOURCES = 3
 
 _LAST_MENU_RESULTS_BY_CONVERSATION: Dict[str, List[TrennkostResult]] = {}
 _MENU_ANALYSIS_INLINE_SEPARATOR_RE = re.compile(r"\s*(?:/|\||•|·|;)\s*")
@@ -192,15 +220,18 @@ def should_update_summary(conversation_id: str, conv_data: Dict[str, Any]) -> bo
 
 
 def update_conversation_summary(conversation_id: str, conv_data: Dict[str, Any]):
-    """Update the rolling summary for a conversation."""
+    """Update the rolling summary for a conversation (skipped while the LLM breaker is open; retried later)."""
+    if circuit_breaker.skip_stage("summary"):
+        return
     old_summary = conv_data.get("summary_text")
     cursor = conv_data.get("summary_message_cursor", 0)
     new_messages = get_messages_since_cursor(conversation_id, cursor)
     if not new_messages:
         return
-    new_summary = generate_summary(old_summary, new_messages)
-    new_cursor = get_total_message_count(conversation_id)
-    update_summary(conversation_id, new_summary, new_cursor)
+    with metrics.span("summary"):
+        new_summary = generate_summary(old_summary, new_messages)
+        new_cursor = get_total_message_count(conversation_id)
+        update_summary(conversation_id, new_summary, new_cursor)
 
 
 # ── Pipeline steps ────────────────────────────────────────────────────
@@ -234,7 +265,8 @@ def _resolve_trennkost_results(
             print(f"[PIPELINE] MENU_FOLLOWUP reused {len(trennkost_results)} cached menu result(s)")
 
     if trennkost_results is None:
-        trennkost_results = _run_engine(analysis_query, vision_extraction, mode)
+        with metrics.span("engine"):
+            trennkost_results = _run_engine(analysis_query, vision_extraction, mode)
 
     _cache_menu_results(conversation_id, mode, trennkost_results)
     return trennkost_results
@@ -246,8 +278,8 @@ def _setup_conversation(
     guest_id: Optional[str],
     image_path: Optional[str],
     ui_intent: Optional[str] = None,
-) -> Tuple[str, bool, Dict[str, Any]]:
-    """Create/validate conversation, save user message, generate title."""
+) -> Tuple[str, bool, Dict[str, Any], str]:
+    """Create/validate conversation, save user message, generate title (→ ..., user message id)."""
     if not conversation_id:
         conversation_id = create_conversation(guest_id=guest_id)
         is_new = True
@@ -269,13 +301,93 @@ def _setup_conversation(
         set_conversation_start_intent(conversation_id, ui_intent)
         conv_data["start_intent"] = ui_intent  # keep in-memory copy consistent
 
-    create_message(conversation_id, "user", user_message, image_path=image_path, intent=ui_intent)
+    user_message_id = create_message(conversation_id, "user", user_message, image_path=image_path, intent=ui_intent)
 
     if is_new:
         title = generate_title_from_message(user_message, max_words=10)
         update_conversation_title(conversation_id, title)
 
-    return conversation_id, is_new, conv_data
+    return conversation_id, is_new, conv_data, user_message_id
+
+
+def _discard_user_turn(conversation_id: str, user_message_id: str, is_new: bool) -> None:
+    """
+    Undo _setup_conversation for a turn rejected before any work ran
+    (ExecutorSaturated → 503 / SSE error). The client retries with the same
+    message, which must not be stored twice; a conversation created for this
+    turn goes with it (the client never saw its id).
+    """
+    if is_new:
+        delete_conversation(conversation_id)
+    else:
+        delete_message(user_message_id)
+    print(f"[EXECUTOR] Turn rejected → user message {user_message_id} discarded")
+
+
+class _Preprocessing:
+    """Step 2 futures: call to wait for (normalized_message, intent_result), cancel() to drop them."""
+
+    def __init__(self, futures: List[Future], wait: Callable[[], Tuple[str, Optional[Dict]]]):
+        self._futures = futures
+        self._wait = wait
+
+    def __call__(self) -> Tuple[str, Optional[Dict]]:
+        return self._wait()
+
+    def cancel(self) -> None:
+        """Drop the calls still queued (running ones finish; their result is ignored)."""
+        for future in self._futures:
+            future.cancel()
+
+
+def _start_preprocessing(
+    user_message: str,
+    recent: List[Dict[str, Any]],
+    is_new: bool,
+    conv_data: Dict[str, Any],
+) -> _Preprocessing:
+    """
+    Step 2 LLM preprocessing, started on the llm pool. Returns a handle whose
+    call waits for (normalized_message, intent_result); cancel() drops it when
+    the turn is rejected after all.
+
+    Split path: normalize_input and classify_intent in parallel. Fused path
+    (FUSED_PREPROCESSING_ENABLED): one fused_preprocessing call whose fields
+    are activated for this turn, so normalize_input / classify_intent here and
+    the later query rewrite and food classification only call the LLM for
+    fields the fused answer lacked.
+    """
+    if not FUSED_PREPROCESSING_ENABLED:
+        fused_preprocessing.activate(None)
+        nf = executors.llm.submit(deadline.bind(metrics.timed("normalize", normalize_input)), user_message, recent, is_new)
+        try:
+            inf = executors.llm.submit(deadline.bind(metrics.timed("intent", classify_intent)), user_message, recent)
+        except executors.ExecutorSaturated:
+            nf.cancel()
+            raise
+        return _Preprocessing([nf, inf], lambda: (nf.result(), inf.result()))
+
+    pf = executors.llm.submit(
+        deadline.bind(metrics.timed("preprocess", fused_preprocessing.preprocess)),
+        user_message, recent, is_new, (conv_data or {}).get("summary_text"),
+    )
+
+    def _wait() -> Tuple[str, Optional[Dict]]:
+        fused_preprocessing.activate(pf.result())
+        return normalize_input(user_message, recent, is_new), classify_intent(user_message, recent)
+    return _Preprocessing([pf], _wait)
+
+
+def _retrieves_raw_message(user_message: str, is_new: bool, recent: List[Dict[str, Any]]) -> bool:
+    """
+    Raw-message mode guess for speculative retrieval: knowledge and recipe
+    turns retrieve with (a rewrite of) the message itself; food / menu
+    analysis turns retrieve with an engine query, so speculating is wasted.
+    """
+    mode, _ = detect_chat_mode(
+        user_message, is_new_conversation=is_new, recent_message_count=len(recent), last_messages=recent,
+    )
+    return mode in (ChatMode.KNOWLEDGE, ChatMode.RECIPE_REQUEST)
 
 
 def _process_vision(image_path: str, user_message: str) -> Dict[str, Any]:
@@ -379,33 +491,46 @@ def _build_prompt_parts(
     recipe_results: Optional[List[Dict]] = None,
     ui_intent: Optional[str] = None,
 ) -> Tuple[List[str], str]:
-    """Build all prompt parts and answer instructions based on mode."""
-    parts = build_ui_intent_block(ui_intent)  # prepend intent hint (empty list if no intent)
-    parts += build_base_context(summary, last_messages)
+    """
+    Build all prompt parts and answer instructions based on mode.
+
+    parts is a PromptParts list: each block is a named section so assemble_prompt
+    can trim history/summary under the token budget.
+    """
+    sections = [
+        PromptSection(name="intent", units=build_ui_intent_block(ui_intent)),  # empty if no intent
+        summary_section(build_summary_block(summary)),
+        history_section(build_history_lines(last_messages)),
+    ]
+
+    def _add(name: str, lines: List[str]) -> None:
+        sections.append(PromptSection(name=name, units=lines))
 
     if trennkost_results:
-        parts.extend(build_engine_block(trennkost_results, modifiers.is_breakfast))
+        _add("engine", build_engine_block(trennkost_results, modifiers.is_breakfast))
         if vision_data.get("vision_is_menu"):
-            parts.extend(build_menu_injection(trennkost_results))
+            _add("menu", build_menu_injection(trennkost_results))
 
     image_path = bool(vision_data.get("vision_extraction") or vision_data.get("vision_failed"))
     if image_path and vision_data.get("vision_failed") and not trennkost_results:
-        parts.extend(build_vision_failed_block())
+        _add("vision_failed", build_vision_failed_block())
 
     if vision_data.get("vision_analysis") and not trennkost_results and not vision_data.get("vision_failed"):
-        parts.extend(build_vision_legacy_block(vision_data["vision_analysis"]))
+        _add("vision", build_vision_legacy_block(vision_data["vision_analysis"]))
 
     if modifiers.is_breakfast and not trennkost_results:
-        parts.extend(build_breakfast_block())
+        _add("breakfast", build_breakfast_block())
 
     if mode == ChatMode.MENU_FOLLOWUP and not trennkost_results:
-        parts.extend(build_menu_followup_block())
+        _add("menu_followup", build_menu_followup_block())
 
     if modifiers.is_post_analysis_ack:
-        parts.extend(build_post_analysis_ack_block())
+        _add("post_analysis_ack", build_post_analysis_ack_block())
 
     if mode == ChatMode.RECIPE_REQUEST and recipe_results:
-        parts.extend(build_recipe_context_block(recipe_results))
+        _add("recipes", build_recipe_context_block(recipe_results))
+
+    parts = PromptParts(sections)
 
     if trennkost_results:
         answer_instructions = build_prompt_food_analysis(
@@ -432,12 +557,16 @@ def _generate_and_save(
     mode: "ChatMode" = None,
     recipe_results: Optional[List[Dict]] = None,
     ui_intent: Optional[str] = None,
+    cache_key: Optional[str] = None,
+    faq_probe: Optional["faq_cache.FaqProbe"] = None,
 ) -> str:
     """
     Call LLM and save the response.
 
     Special case: For recipe requests with high-score matches (≥7.0),
     bypass LLM and format recipe directly to avoid unwanted follow-up questions.
+    With a cache_key / faq_probe (fresh KNOWLEDGE turn), a cached answer is
+    replayed instead.
     """
     if mode and recipe_results:
         if mode == ChatMode.RECIPE_REQUEST and recipe_results[0].get('score', 0.0) >= 7.0:
@@ -446,19 +575,66 @@ def _generate_and_save(
             print(f"[PIPELINE] High-score recipe (≥7.0) → direct output bypass")
             return assistant_message
 
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_INSTRUCTIONS},
-            {"role": "user", "content": llm_input}
-        ],
-        temperature=0.0,
-    )
+    cached = _cached_answer(cache_key, faq_probe)
+    if cached is not None:
+        create_message(conversation_id, "assistant", cached, intent=ui_intent)
+        print("[ANSWER_CACHE] hit → cached answer replayed")
+        return cached
+
+    with metrics.span("llm_total"):
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_INSTRUCTIONS},
+                {"role": "user", "content": llm_input}
+            ],
+            temperature=0.0,
+            timeout=deadline.answer_timeout(),
+        )
     assistant_message = response.choices[0].message.content.strip()
     create_message(conversation_id, "assistant", assistant_message, intent=ui_intent)
+    _remember_answer(cache_key, faq_probe, assistant_message)
     return assistant_message
 
 
+def _answer_cache_probes(
+    mode: ChatMode,
+    summary: Optional[str],
+    last_messages: List[Dict[str, Any]],
+    trennkost_results: Optional[List[TrennkostResult]],
+    needs_clarification: Optional[str],
+    image_path: Optional[str],
+    normalized_message: str,
+    standalone_query: str,
+    docs: List[str],
+    metas: List[Dict],
+    llm_input: str,
+    ui_intent: Optional[str],
+) -> Tuple[Optional[str], Optional["faq_cache.FaqProbe"]]:
+    """Exact cache key + semantic FAQ probe for a fresh KNOWLEDGE turn, else (None, None)."""
+    if not answer_cache.is_cacheable(mode, summary, last_messages, trennkost_results,
+                                     needs_clarification, image_path):
+        return None, None
+    cache_key = answer_cache.make_key(normalized_message, docs, metas, llm_input)
+    faq_probe = faq_cache.make_probe(
+        normalized_message, cached_embedding(speculative_retrieval.embedded_query(standalone_query)),
+        docs, metas, ui_intent,
+    )
+    return cache_key, faq_probe
+
+
+def _cached_answer(cache_key: Optional[str], faq_probe: Optional["faq_cache.FaqProbe"]) -> Optional[str]:
+    cached = answer_cache.get(cache_key)
+    if cached is None:
+        cached = faq_cache.lookup(faq_probe)
+    return cached
+
+
+def _remember_answer(cache_key: Optional[str], faq_probe: Optional["faq_cache.FaqProbe"], answer: str) -> None:
+    answer_cache.put(cache_key, answer)
+    faq_cache.store(faq_probe, answer)
+
+
 def _prepare_sources(metas: List[Dict], dists: List[float]) -> List[Dict]:
     """Prepare source metadata for response."""
     sources = []
@@ -699,6 +875,88 @@ def _handle_eat_now_session_action(
     }
 
 
+def _direct_verdict_answer(
+    conversation_id: str,
+    mode: ChatMode,
+    modifiers: ChatModifiers,
+    trennkost_results: Optional[List[TrennkostResult]],
+    normalized_message: str,
+    image_path: Optional[str],
+    ui_intent: Optional[str],
+) -> Optional[str]:
+    """
+    Deterministic answer for an unambiguous engine verdict (no RAG, no LLM),
+    persisted like an LLM answer; None when the direct-answer policy says no.
+    Same idea as the high-score format_recipe_directly bypass.
+    """
+    if mode != ChatMode.FOOD_ANALYSIS or not trennkost_results:
+        return None
+    decision = evaluate_direct_answer_policy(trennkost_results, mode, modifiers, normalized_message, image_path)
+    metrics.inc(DIRECT_ANSWERS_TOTAL, {"decision": "direct" if decision.allowed else decision.reason_code})
+    if not decision.allowed:
+        return None
+
+    assistant_message = format_verdict_directly(trennkost_results[0])
+    create_message(conversation_id, "assistant", assistant_message, intent=ui_intent)
+    conv_data_updated = get_conversation(conversation_id)
+    if should_update_summary(conversation_id, conv_data_updated):
+        update_conversation_summary(conversation_id, conv_data_updated)
+    print(f"[PIPELINE] Unambiguous verdict {trennkost_results[0].verdict.value} → direct answer bypass")
+    return assistant_message
+
+
+def _degraded_answer(
+    conversation_id: str,
+    trennkost_results: Optional[List[TrennkostResult]],
+    recipe_results: Optional[List[Dict]],
+    metas: List[Dict],
+    dists: List[float],
+    ui_intent: Optional[str],
+    cache_key: Optional[str] = None,
+    faq_probe: Optional["faq_cache.FaqProbe"] = None,
+    force: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Answer without the LLM while the circuit breaker is open (None otherwise).
+
+    force=True: the answer call itself was refused (LLMUnavailable: the
+    breaker re-opened mid-turn or its half-open probes were taken).
+
+    An exact or FAQ cache hit is served as usual (it needs no LLM). Otherwise
+    engine verdicts are rendered by format_results_without_llm, a recipe
+    search answers with its best match, anything else gets FALLBACK_SENTENCE
+    plus the closest course sources (retrieval still works: embeddings are
+    not behind the breaker). Persisted; the summary waits for the LLM.
+    """
+    if not force and circuit_breaker.available():
+        return None
+    sources = _prepare_sources(metas, dists)[:_DEGRADED_SOURCES]
+    cached = _cached_answer(cache_key, faq_probe)
+    if cached is not None:
+        kind = "cache"
+        answer = cached
+    elif trennkost_results:
+        kind = "engine"
+        answer = f"{_DEGRADED_NOTE}\n\n{format_results_without_llm(trennkost_results)}"
+    elif recipe_results:
+        kind = "recipe"
+        answer = format_recipe_directly(recipe_results[0])
+    else:
+        kind = "fallback"
+        answer = FALLBACK_SENTENCE
+        if sources:
+            labels = [
+                f"- {s.get('module_label') or s.get('source') or s.get('path')}"
+                + (f", S. {s['page']}" if s.get("page") else "")
+                for s in sources
+            ]
+            answer += "\n\nDazu findest du etwas in diesen Kursstellen:\n" + "\n".join(labels)
+    create_message(conversation_id, "assistant", answer, intent=ui_intent)
+    metrics.inc(DEGRADED_ANSWERS_TOTAL, {"kind": kind})
+    print(f"[BREAKER] LLM unavailable → {kind} answer without LLM")
+    return {"answer": answer, "sources": sources}
+
+
 def _handle_food_analysis(
     conversation_id: str,
     normalized_message: str,
@@ -729,6 +987,12 @@ def _handle_food_analysis(
             print(f"[TRENNKOST] {r.dish_name}: {r.verdict.value} | "
                   f"problems={len(r.problems)} | questions={len(r.required_questions)}")
 
+    direct = _direct_verdict_answer(
+        conversation_id, mode, modifiers, trennkost_results, normalized_message, image_path, ui_intent,
+    )
+    if direct is not None:
+        return {"conversationId": conversation_id, "answer": direct, "sources": []}
+
     session_payload = None
     if mode == ChatMode.MENU_ANALYSIS and trennkost_results:
         dish_matrix = build_menu_matrix(trennkost_results)
@@ -788,7 +1052,8 @@ def _handle_recipe_request(
                         search_query = content
                         print(f"[PIPELINE] Short follow-up → previous query: '{search_query[:50]}...'")
                         break
-        recipe_results = search_recipes(search_query, limit=5)
+        with metrics.span("recipe_search"):
+            recipe_results = search_recipes(search_query, limit=5)
         print(f"[PIPELINE] recipe_results={len(recipe_results)} recipes found")
         for r in recipe_results[:3]:
             print(f"  → {r['name']} ({r['trennkost_category']}) score={r.get('score', '?')}")
@@ -823,6 +1088,14 @@ def _handle_knowledge_mode(
     )
 
 
+def _retrieve(standalone_query: str, normalized_message: str) -> Tuple[List[str], List[Dict], List[float], bool]:
+    """Retrieval step: reuse this turn's speculative raw-message retrieval when the query matches."""
+    result = speculative_retrieval.take(standalone_query)
+    if result is not None:
+        return result
+    return retrieve_with_fallback(standalone_query, normalized_message)
+
+
 def _finalize_response(
     conversation_id: str,
     normalized_message: str,
@@ -853,16 +1126,18 @@ def _finalize_response(
     last_messages = get_last_n_messages(conversation_id, LAST_N)
 
     # 6. Build RAG query + retrieve
-    standalone_query = _build_rag_query(
-        trennkost_results, vision_data_for_downstream.get("food_groups"),
-        image_path, summary, last_messages, normalized_message,
-        modifiers.is_breakfast,
-    )
+    with metrics.span("query_rewrite"):
+        standalone_query = _build_rag_query(
+            trennkost_results, vision_data_for_downstream.get("food_groups"),
+            image_path, summary, last_messages, normalized_message,
+            modifiers.is_breakfast,
+        )
 
     needs_clarification = None
     is_followup = not is_new and len(last_messages) >= 2
     if not trennkost_results:
-        food_cls = classify_food_items(normalized_message, standalone_query)
+        with metrics.span("food_classify"):
+            food_cls = classify_food_items(normalized_message, standalone_query)
         if food_cls:
             classification = food_cls.get("classification", "")
             if not is_followup or len(normalized_message) > 80:
@@ -873,14 +1148,16 @@ def _finalize_response(
     if DEBUG_RAG:
         print(f"\n[RAG] Primary query: {standalone_query}")
 
-    docs, metas, dists, is_partial = retrieve_with_fallback(standalone_query, normalized_message)
+    with metrics.span("retrieval"):
+        docs, metas, dists, is_partial = _retrieve(standalone_query, normalized_message)
 
     if DEBUG_RAG:
         print(f"[RAG] Retrieved {len(docs)} chunk(s) | partial={is_partial}")
         for i, (_, meta, dist) in enumerate(list(zip(docs, metas, dists))[:3], 1):
             print(f"  {i}. path={meta.get('path','?')} | page={meta.get('page','?')} | chunk={meta.get('chunk','?')} | dist={dist:.3f}")
 
-    course_context = build_context(docs, metas)
+    with metrics.span("context_build"):
+        course_context = build_context(docs, metas, query=standalone_query)
 
     # 7. Fallback check
     best_dist = min(dists) if dists else 999.0
@@ -907,13 +1184,33 @@ def _finalize_response(
         ui_intent=ui_intent,
     )
     modifiers.needs_clarification = needs_clarification
-    llm_input = assemble_prompt(
-        prompt_parts, course_context, normalized_message,
-        answer_instructions, needs_clarification,
-    )
+    with metrics.span("prompt_assembly"):
+        llm_input = assemble_prompt(
+            prompt_parts, course_context, normalized_message,
+            answer_instructions, needs_clarification,
+        )
 
-    # 9. Generate + save
-    assistant_message = _generate_and_save(conversation_id, llm_input, mode, recipe_results, ui_intent)
+    # 9. Generate + save (fresh KNOWLEDGE turns may be served from the answer cache)
+    cache_key, faq_probe = _answer_cache_probes(
+        mode, summary, last_messages, trennkost_results, needs_clarification, image_path,
+        normalized_message, standalone_query, docs, metas, llm_input, ui_intent,
+    )
+    degraded = _degraded_answer(
+        conversation_id, trennkost_results, recipe_results, metas, dists, ui_intent, cache_key, faq_probe,
+    )
+    if degraded is not None:
+        return {"conversationId": conversation_id, **degraded}
+    try:
+        assistant_message = _generate_and_save(
+            conversation_id, llm_input, mode, recipe_results, ui_intent,
+            cache_key=cache_key, faq_probe=faq_probe,
+        )
+    except circuit_breaker.LLMUnavailable:
+        degraded = _degraded_answer(
+            conversation_id, trennkost_results, recipe_results, metas, dists, ui_intent, cache_key, faq_probe,
+            force=True,
+        )
+        return {"conversationId": conversation_id, **degraded}
 
     # 10. Update summary
     conv_data_updated = get_conversation(conversation_id)
@@ -939,6 +1236,19 @@ def handle_chat(
     image_path: Optional[str] = None,
     intent: Optional[str] = None,
     session: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Chat request dispatcher (see _dispatch_chat), timed as one metrics turn."""
+    with metrics.turn("chat", ui_intent=normalize_ui_intent(intent)), speculative_retrieval.scope(), deadline.scope():
+        return _dispatch_chat(conversation_id, user_message, guest_id, image_path, intent, session)
+
+
+def _dispatch_chat(
+    conversation_id: Optional[str],
+    user_message: str,
+    guest_id: Optional[str] = None,
+    image_path: Optional[str] = None,
+    intent: Optional[str] = None,
+    session: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Chat request dispatcher.
@@ -972,9 +1282,10 @@ def handle_chat(
         create_message(conversation_id, "assistant", question, intent=ui_intent)
         return {"conversationId": conversation_id, "answer": question, "sources": []}
 
-    conversation_id, is_new, conv_data = _setup_conversation(
-        conversation_id, user_message, guest_id, image_path, ui_intent=ui_intent
-    )
+    with metrics.span("setup"):
+        conversation_id, is_new, conv_data, user_message_id = _setup_conversation(
+            conversation_id, user_message, guest_id, image_path, ui_intent=ui_intent
+        )
     recent = get_last_n_messages(conversation_id, 4)
 
     # ── 2. Parallel: normalize + intent (+ vision if image) ───────────
@@ -982,14 +1293,22 @@ def handle_chat(
         "vision_analysis": None, "food_groups": None,
         "vision_extraction": None, "vision_is_menu": False, "vision_failed": False,
     }
-    with ThreadPoolExecutor(max_workers=3 if image_path else 2) as ex:
-        nf  = ex.submit(normalize_input, user_message, recent, is_new)
-        inf = ex.submit(classify_intent, user_message, recent)
-        vf  = ex.submit(_process_vision, image_path, user_message) if image_path else None
-        normalized_message = nf.result()
-        intent_result      = inf.result()
-        if vf:
-            vision_data = vf.result()
+    try:
+        preprocessed = _start_preprocessing(user_message, recent, is_new, conv_data)
+    except executors.ExecutorSaturated:
+        _discard_user_turn(conversation_id, user_message_id, is_new)
+        raise
+    try:
+        vf = executors.vision.submit(metrics.timed("vision", _process_vision), image_path, user_message) if image_path else None
+    except executors.ExecutorSaturated:
+        preprocessed.cancel()
+        _discard_user_turn(conversation_id, user_message_id, is_new)
+        raise
+    speculative_retrieval.start("chat", user_message, retrieve_with_fallback, image_path,
+                                rag_turn=_retrieves_raw_message(user_message, is_new, recent))
+    normalized_message, intent_result = preprocessed()
+    if vf:
+        vision_data = vf.result()
     label = "normalization + intent" + (" + vision" if image_path else "")
     print(f"[PIPELINE] Parallel execution: {label} completed")
 
@@ -1009,6 +1328,7 @@ def handle_chat(
 
     # ── 3c. Intent override ───────────────────────────────────────────
     mode = _apply_intent_override(mode, modifiers, intent_result, image_path)
+    metrics.set_mode(mode)
     print(f"[PIPELINE] mode={mode.value} | is_breakfast={modifiers.is_breakfast} | wants_recipe={modifiers.wants_recipe}")
 
     # ── 4. Dispatch ───────────────────────────────────────────────────
@@ -1028,6 +1348,51 @@ def _sse(event: str, data: Dict[str, Any]) -> str:
     return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
+# Where _prepare_stream sends SSE frames that are ready before it returns
+# (the early "verdict" event); set per call by _with_sse_sink.
+_sse_sink: "contextvars.ContextVar[Optional[Callable[[str], None]]]" = contextvars.ContextVar("sse_sink", default=None)
+
+
+def _with_sse_sink(fn: Callable, sink: Callable[[str], None]) -> Callable:
+    """fn running with sink as the early-frame sink (also inside executor threads)."""
+    def _run(*args, **kwargs):
+        token = _sse_sink.set(sink)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _sse_sink.reset(token)
+    return _run
+
+
+def _emit_early(event: str, data: Dict[str, Any]) -> None:
+    sink = _sse_sink.get()
+    if sink is not None:
+        sink(_sse(event, data))
+
+
+def _verdict_payload(conversation_id: str, mode: ChatMode, trennkost_results: List[TrennkostResult]) -> Dict[str, Any]:
+    """Structured engine decision for the early "verdict" SSE event."""
+    dishes = []
+    for r in trennkost_results:
+        affected = sorted({g for p in r.problems for g in p.affected_groups})
+        dishes.append({
+            "dish": r.dish_name,
+            "verdict": r.verdict.value,
+            "trafficLight": r.traffic_light.value,
+            "affectedGroups": affected,
+            "openQuestions": [q.question for q in r.required_questions],
+            "summary": r.summary,
+        })
+    payload: Dict[str, Any] = {"conversationId": conversation_id, "mode": mode.value, "dishes": dishes}
+    if mode in (ChatMode.MENU_ANALYSIS, ChatMode.MENU_FOLLOWUP):
+        payload["ranking"] = [r.dish_name for r in rank_menu_results(trennkost_results)]
+    return payload
+
+
+def _delta_coalescer() -> DeltaCoalescer:
+    return DeltaCoalescer(STREAM_DELTA_MODE, STREAM_DELTA_FLUSH_MS, STREAM_DELTA_FLUSH_CHARS)
+
+
 def _prepare_stream(
     conversation_id: Optional[str],
     user_message: str,
@@ -1040,18 +1405,25 @@ def _prepare_stream(
     Returns either:
       {"conversation_id": ..., "early_answer": ..., "sources": [...], "ui_intent": ...}
       {"conversation_id": ..., "llm_input": ..., "ui_intent": ..., "mode": ...,
-       "recipe_results": ..., "sources": [...]}
+       "recipe_results": ..., "sources": [...], "cache_key": ..., "faq_probe": ...,
+       "user_message_id": ..., "trennkost_results": ..., "metas": ..., "dists": ...}
+    The last three feed _degraded_stream_answer if the LLM call is refused.
     """
-    conversation_id, is_new, conv_data = _setup_conversation(
-        conversation_id, user_message, guest_id, image_path=None, ui_intent=ui_intent
-    )
+    with metrics.span("setup"):
+        conversation_id, is_new, conv_data, user_message_id = _setup_conversation(
+            conversation_id, user_message, guest_id, image_path=None, ui_intent=ui_intent
+        )
     recent = get_last_n_messages(conversation_id, 4)
 
-    with ThreadPoolExecutor(max_workers=2) as ex:
-        nf = ex.submit(normalize_input, user_message, recent, is_new)
-        inf = ex.submit(classify_intent, user_message, recent)
-        normalized_message = nf.result()
-        intent_result = inf.result()
+    try:
+        preprocessed = _start_preprocessing(user_message, recent, is_new, conv_data)
+    except executors.ExecutorSaturated:
+        _discard_user_turn(conversation_id, user_message_id, is_new)
+        raise
+    speculative_retrieval.start("stream", user_message, retrieve_with_fallback,
+                                rag_turn=_retrieves_raw_message(user_message, is_new, recent))
+    normalized_message, intent_result = preprocessed()
+    cancellation.check("engine")
 
     vision_data: Dict[str, Any] = {
         "vision_analysis": None, "food_groups": None,
@@ -1070,6 +1442,7 @@ def _prepare_stream(
                 "sources": [], "ui_intent": ui_intent}
 
     mode = _apply_intent_override(mode, modifiers, intent_result, image_path=None)
+    metrics.set_mode(mode)
 
     # RECIPE_FROM_INGREDIENTS: run synchronously (no streaming path for this mode)
     if mode == ChatMode.RECIPE_FROM_INGREDIENTS:
@@ -1090,6 +1463,14 @@ def _prepare_stream(
             mode=mode,
             vision_extraction=None,
         )
+        if trennkost_results:
+            _emit_early("verdict", _verdict_payload(conversation_id, mode, trennkost_results))
+        direct = _direct_verdict_answer(
+            conversation_id, mode, modifiers, trennkost_results, normalized_message, None, ui_intent,
+        )
+        if direct is not None:
+            return {"conversation_id": conversation_id, "early_answer": direct,
+                    "sources": [], "ui_intent": ui_intent}
 
     # Recipe search
     recipe_results: Optional[List[Dict]] = None
@@ -1104,7 +1485,8 @@ def _prepare_stream(
                         if len(content) > 20 and content != normalized_message:
                             search_query = content
                             break
-            recipe_results = search_recipes(search_query, limit=5)
+            with metrics.span("recipe_search"):
+                recipe_results = search_recipes(search_query, limit=5)
         except Exception:
             recipe_results = []
         # High-score recipe bypass: format directly, persist, return as early_answer
@@ -1115,17 +1497,21 @@ def _prepare_stream(
                     "sources": [], "ui_intent": ui_intent}
 
     # RAG
+    cancellation.check("query_rewrite")
     summary = conv_data.get("summary_text")
     last_messages = get_last_n_messages(conversation_id, LAST_N)
-    standalone_query = _build_rag_query(
-        trennkost_results, None, None, summary, last_messages, normalized_message,
-        modifiers.is_breakfast,
-    )
+    with metrics.span("query_rewrite"):
+        standalone_query = _build_rag_query(
+            trennkost_results, None, None, summary, last_messages, normalized_message,
+            modifiers.is_breakfast,
+        )
 
     needs_clarification = None
     is_followup = not is_new and len(last_messages) >= 2
     if not trennkost_results:
-        food_cls = classify_food_items(normalized_message, standalone_query)
+        cancellation.check("food_classify")
+        with metrics.span("food_classify"):
+            food_cls = classify_food_items(normalized_message, standalone_query)
         if food_cls:
             classification = food_cls.get("classification", "")
             if not is_followup or len(normalized_message) > 80:
@@ -1133,8 +1519,11 @@ def _prepare_stream(
             if classification:
                 standalone_query += f"\n{classification}"
 
-    docs, metas, dists, is_partial = retrieve_with_fallback(standalone_query, normalized_message)
-    course_context = build_context(docs, metas)
+    cancellation.check("retrieval")
+    with metrics.span("retrieval"):
+        docs, metas, dists, is_partial = _retrieve(standalone_query, normalized_message)
+    with metrics.span("context_build"):
+        course_context = build_context(docs, metas, query=standalone_query)
 
     best_dist = min(dists) if dists else 999.0
     grounding_decision = evaluate_grounding_policy(
@@ -1160,14 +1549,26 @@ def _prepare_stream(
         ui_intent=ui_intent,
     )
     modifiers.needs_clarification = needs_clarification
-    llm_input = assemble_prompt(
-        prompt_parts, course_context, normalized_message,
-        answer_instructions, needs_clarification,
-    )
+    with metrics.span("prompt_assembly"):
+        llm_input = assemble_prompt(
+            prompt_parts, course_context, normalized_message,
+            answer_instructions, needs_clarification,
+        )
 
     start_intent = (conv_data or {}).get("start_intent")
     sources = _prepare_sources(metas, dists) if start_intent == "learn" else []
 
+    cache_key, faq_probe = _answer_cache_probes(
+        mode, summary, last_messages, trennkost_results, needs_clarification, None,
+        normalized_message, standalone_query, docs, metas, llm_input, ui_intent,
+    )
+    degraded = _degraded_answer(
+        conversation_id, trennkost_results, recipe_results, metas, dists, ui_intent, cache_key, faq_probe,
+    )
+    if degraded is not None:
+        return {"conversation_id": conversation_id, "early_answer": degraded["answer"],
+                "sources": degraded["sources"], "ui_intent": ui_intent}
+
     return {
         "conversation_id": conversation_id,
         "llm_input": llm_input,
@@ -1175,9 +1576,115 @@ def _prepare_stream(
         "mode": mode,
         "recipe_results": recipe_results,
         "sources": sources,
+        "cache_key": cache_key,
+        "faq_probe": faq_probe,
+        "user_message_id": user_message_id,
+        "trennkost_results": trennkost_results,
+        "metas": metas,
+        "dists": dists,
     }
 
 
+def _answer_tokens(
+    prep: Dict[str, Any],
+    turn: Optional[metrics.TurnMetrics] = None,
+) -> Generator[str, None, None]:
+    """
+    Text pieces of the answer for a prepared stream.
+
+    A cached answer (exact or FAQ match) is replayed in small pieces so the
+    delta contract is the same as for a live completion. Otherwise the LLM is
+    streamed; empty strings are yielded for chunks without content so callers
+    can still run their status timers. Live completions record llm_first_token
+    and llm_total on `turn`. Closing the generator early (client gone) closes
+    the upstream HTTP stream, so the API stops generating.
+    """
+    cached = _cached_answer(prep.get("cache_key"), prep.get("faq_probe"))
+    if cached is not None:
+        print("[ANSWER_CACHE] hit → cached answer replayed as deltas")
+        yield from answer_cache.replay_chunks(cached)
+        return
+
+    record = turn.record if turn is not None else metrics.record
+    started = time.perf_counter()
+    first_token = False
+    stream = client.chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_INSTRUCTIONS},
+            {"role": "user", "content": prep["llm_input"]},
+        ],
+        temperature=0.0,
+        stream=True,
+        timeout=deadline.answer_timeout(),
+    )
+    completed = False
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                yield ""
+                continue
+            text = chunk.choices[0].delta.content or ""
+            if text and not first_token:
+                first_token = True
+                record("llm_first_token", time.perf_counter() - started)
+            yield text
+        completed = True
+    finally:
+        if not completed:
+            # llm_accounting's stream proxy closes the HTTP response (openai 1.3 Stream has no close())
+            try:
+                stream.close()
+            except Exception as exc:
+                print(f"[CANCEL] closing upstream stream failed (non-fatal): {exc}")
+    record("llm_total", time.perf_counter() - started)
+
+
+def _degraded_stream_answer(prep: Dict[str, Any]) -> Dict[str, Any]:
+    """_degraded_answer for a prepared stream whose LLM call was refused (LLMUnavailable)."""
+    return _degraded_answer(
+        prep["conversation_id"], prep.get("trennkost_results"), prep.get("recipe_results"),
+        prep.get("metas", []), prep.get("dists", []), prep.get("ui_intent"),
+        prep.get("cache_key"), prep.get("faq_probe"), force=True,
+    )
+
+
+def _store_answer(conversation_id: str, prep: Dict[str, Any], assistant_message: str) -> Optional[Dict[str, Any]]:
+    """Save the streamed answer; returns the conversation row if a summary update is due (DB only)."""
+    create_message(conversation_id, "assistant", assistant_message, intent=prep.get("ui_intent"))
+    conv_data_updated = get_conversation(conversation_id)
+    if conv_data_updated and should_update_summary(conversation_id, conv_data_updated):
+        return conv_data_updated
+    return None
+
+
+def _persist_answer(conversation_id: str, prep: Dict[str, Any], assistant_message: str) -> None:
+    """Save the streamed answer exactly once, fill the answer caches, roll the summary."""
+    summary_due = _store_answer(conversation_id, prep, assistant_message)
+    _remember_answer(prep.get("cache_key"), prep.get("faq_probe"), assistant_message)
+    cancellation.observe_answer(count_tokens(assistant_message))
+    if summary_due:
+        update_conversation_summary(conversation_id, summary_due)
+
+
+def _abandon_answer(conversation_id: str, prep: Dict[str, Any], partial_text: str, stage: str, pool: str) -> None:
+    """
+    The client left while the answer was streaming (upstream already closed).
+
+    STREAM_PERSIST_ON_DISCONNECT="partial" stores the text streamed so far as
+    the assistant message; it is never cached and triggers no summary update.
+    Default "none" stores nothing.
+    """
+    text = partial_text.strip()
+    persisted = STREAM_PERSIST_ON_DISCONNECT == "partial" and bool(text)
+    if persisted:
+        create_message(conversation_id, "assistant", text, intent=prep.get("ui_intent"))
+    streamed = count_tokens(text)
+    print(f"[CANCEL] client gone during {stage}: stopped after ~{streamed} tokens, "
+          f"partial answer {'stored' if persisted else 'discarded'}")
+    cancellation.record(stage, pool, streamed_tokens=streamed, persisted=persisted)
+
+
 def handle_chat_stream(
     conversation_id: Optional[str],
     user_message: str,
@@ -1188,8 +1695,8 @@ def handle_chat_stream(
     Sync generator yielding SSE-formatted strings.
 
     Event sequence:
-      meta → delta* → final     (normal LLM path)
-      meta → final              (shortcut / early return)
+      meta → verdict? → delta* → final   (normal LLM path)
+      meta → verdict? → final            (shortcut / early return)
       error                     (on failure before conv_id known)
       meta → error              (on failure after conv_id known)
     """
@@ -1233,21 +1740,44 @@ def handle_chat_stream(
     if ui_intent is not None:
         meta_payload["start_intent"] = ui_intent
     yield _sse("meta", meta_payload)
+    turn = metrics.TurnMetrics("stream", ui_intent)
+    try:
+        yield from _stream_after_meta(turn, conversation_id, user_message, guest_id, ui_intent)
+    finally:
+        turn.finish("aborted")  # no-op if the turn already finished
+
+
+def _stream_after_meta(
+    turn: metrics.TurnMetrics,
+    conversation_id: str,
+    user_message: str,
+    guest_id: Optional[str],
+    ui_intent: Optional[str],
+) -> Generator[str, None, None]:
+    """handle_chat_stream after the meta frame: pipeline, LLM deltas, persist, final."""
     meta_sent_at = time.monotonic()
     status_sent = 0
 
     # ── Normal path: prepare pipeline ─────────────────────────────────
+    early_frames: List[str] = []
     try:
-        prep = _prepare_stream(conversation_id, user_message, guest_id, ui_intent)
+        prepare = _with_sse_sink(
+            deadline.scoped(speculative_retrieval.scoped(turn.bind(_prepare_stream)), deadline.start()),
+            early_frames.append,
+        )
+        prep = prepare(conversation_id, user_message, guest_id, ui_intent)
     except Exception as exc:
         print(f"[STREAM] Prepare failed: {exc}")
+        turn.finish("error")
         yield _sse("error", {"message": "Etwas ist schiefgelaufen."})
         return
 
     conv_id = prep["conversation_id"]
+    yield from early_frames  # sync path: buffered until the pipeline returns
 
     # Early return (temporal, recipe bypass, fallback, recipe-from-ingredients)
     if "early_answer" in prep:
+        turn.finish("ok")
         yield _sse("final", {"conversationId": conv_id,
                               "answer": prep["early_answer"],
                               "sources": prep.get("sources", [])})
@@ -1255,20 +1785,11 @@ def handle_chat_stream(
 
     # ── LLM streaming ────────────────────────────────────────────────
     sources = prep.get("sources", [])
-    full_text = ""
-    first_token_seen = False
+    deltas = _delta_coalescer()
+    tokens = _answer_tokens(prep, turn)
     try:
-        stream = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_INSTRUCTIONS},
-                {"role": "user", "content": prep["llm_input"]},
-            ],
-            temperature=0.0,
-            stream=True,
-        )
-        for chunk in stream:
-            if not first_token_seen and status_sent < 2:
+        for token in tokens:
+            if not deltas.seen_text and status_sent < 2:
                 elapsed = time.monotonic() - meta_sent_at
                 if elapsed >= 6.0:
                     yield _sse("status", {"message": "Formuliere Antwort \u2026"})
@@ -1276,24 +1797,33 @@ def handle_chat_stream(
                 elif elapsed >= 2.5 and status_sent < 1:
                     yield _sse("status", {"message": "Suche passende Kursstellen \u2026"})
                     status_sent = 1
-            if not chunk.choices:
-                continue
-            token = chunk.choices[0].delta.content
-            if token:
-                first_token_seen = True
-                full_text += token
-                yield _sse("delta", {"text": token})
+            frame = deltas.add(token)
+            if frame:
+                yield frame
+        frame = deltas.flush()
+        if frame:
+            yield frame
+        deltas.record_metrics()
+    except GeneratorExit:  # client closed the stream mid-answer
+        tokens.close()
+        _abandon_answer(conv_id, prep, deltas.text(), "llm_stream", "request")
+        turn.finish("aborted")
+        raise
+    except circuit_breaker.LLMUnavailable:  # refused before the first token
+        degraded = _degraded_stream_answer(prep)
+        turn.finish("ok")
+        yield _sse("final", {"conversationId": conv_id, **degraded})
+        return
     except Exception as exc:
         print(f"[STREAM] LLM error: {exc}")
+        turn.finish("error")
         yield _sse("error", {"message": "Antwort konnte nicht generiert werden."})
         return
 
     # ── Persist exactly once ──────────────────────────────────────────
-    assistant_message = full_text.strip()
-    create_message(conv_id, "assistant", assistant_message, intent=prep.get("ui_intent"))
-    conv_data_updated = get_conversation(conv_id)
-    if conv_data_updated and should_update_summary(conv_id, conv_data_updated):
-        update_conversation_summary(conv_id, conv_data_updated)
+    assistant_message = deltas.text().strip()
+    turn.bind(_persist_answer)(conv_id, prep, assistant_message)
+    turn.finish("ok")
 
     yield _sse("final", {"conversationId": conv_id,
                           "answer": assistant_message,
@@ -1308,6 +1838,8 @@ def handle_chat_stream(
 
 _STREAM_TEST_DELAY = float(os.getenv("STREAM_TEST_DELAY_BEFORE_FIRST_TOKEN", "0"))
 
+_OVERLOADED_MESSAGE = "Der Server ist gerade ausgelastet. Bitte versuche es gleich noch einmal."
+
 
 async def handle_chat_stream_async(
     conversation_id: Optional[str],
@@ -1320,10 +1852,17 @@ async def handle_chat_stream_async(
     ticker that is fully independent of OpenAI token chunk arrival.
 
     Event sequence (same contract as the sync version):
-      meta → status* → delta* → final   (normal LLM path)
-      meta → final                       (shortcut / early return)
+      meta → status* → verdict? → status* → delta* → final   (normal LLM path)
+      meta → status* → verdict? → final                      (shortcut / early return)
       error                              (failure before conv_id known)
       meta → error                       (failure after conv_id known)
+
+    The "verdict" event (FOOD_ANALYSIS / MENU_* turns) is sent as soon as
+    the engine has decided, before retrieval and the LLM call.
+
+    If the client disconnects, the turn's CancelToken stops the pipeline at
+    its next stage and the LLM worker closes the upstream stream (see
+    app/cancellation.py).
     """
     ui_intent = normalize_ui_intent(intent)
     loop = asyncio.get_running_loop()
@@ -1332,33 +1871,14 @@ async def handle_chat_stream_async(
     if user_message.strip() == "" and ui_intent in _VALID_INTENTS:
         try:
             if not conversation_id:
-                conversation_id = await loop.run_in_executor(
-                    None, create_conversation, guest_id
-                )
-            if guest_id:
-                belongs = await loop.run_in_executor(
-                    None, conversation_belongs_to_guest, conversation_id, guest_id
-                )
-                if not belongs:
-                    yield _sse("error", {"message": "Zugriff verweigert."})
-                    return
-            await loop.run_in_executor(
-                None, set_conversation_start_intent, conversation_id, ui_intent
-            )
-            await loop.run_in_executor(
-                None,
-                update_conversation_title,
-                conversation_id,
-                _INTENT_TITLES.get(ui_intent, ui_intent),
-            )
+                conversation_id = await adb.create_conversation(guest_id)
+            if guest_id and not await adb.conversation_belongs_to_guest(conversation_id, guest_id):
+                yield _sse("error", {"message": "Zugriff verweigert."})
+                return
+            await adb.set_conversation_start_intent(conversation_id, ui_intent)
+            await adb.update_conversation_title(conversation_id, _INTENT_TITLES.get(ui_intent, ui_intent))
             question = first_question_for_intent(ui_intent)
-            _cid = conversation_id
-            _q = question
-            _ui = ui_intent
-            await loop.run_in_executor(
-                None,
-                lambda: create_message(_cid, "assistant", _q, intent=_ui),
-            )
+            await adb.create_message(conversation_id, "assistant", question, intent=ui_intent)
             yield _sse("meta", {"conversationId": conversation_id})
             yield _sse("final", {
                 "conversationId": conversation_id,
@@ -1373,20 +1893,12 @@ async def handle_chat_stream_async(
     # ── Normal path: ensure conversation ID, yield meta immediately ────────
     try:
         if not conversation_id:
-            conversation_id = await loop.run_in_executor(
-                None, create_conversation, guest_id
-            )
+            conversation_id = await adb.create_conversation(guest_id)
             if ui_intent is not None:
-                await loop.run_in_executor(
-                    None, set_conversation_start_intent, conversation_id, ui_intent
-                )
-        elif guest_id:
-            belongs = await loop.run_in_executor(
-                None, conversation_belongs_to_guest, conversation_id, guest_id
-            )
-            if not belongs:
-                yield _sse("error", {"message": "Zugriff verweigert."})
-                return
+                await adb.set_conversation_start_intent(conversation_id, ui_intent)
+        elif guest_id and not await adb.conversation_belongs_to_guest(conversation_id, guest_id):
+            yield _sse("error", {"message": "Zugriff verweigert."})
+            return
     except Exception as exc:
         print(f"[STREAM] Conversation setup failed: {exc}")
         yield _sse("error", {"message": "Etwas ist schiefgelaufen."})
@@ -1400,6 +1912,9 @@ async def handle_chat_stream_async(
     # ── Concurrent pipeline + time-based status ticker ─────────────────────
     out_q: asyncio.Queue = asyncio.Queue()
     stop_event = asyncio.Event()
+    cancel = cancellation.CancelToken()
+    turn_deadline = deadline.start()
+    turn = metrics.TurnMetrics("stream_async", ui_intent)
 
     async def _ticker() -> None:
         await asyncio.sleep(2.5)
@@ -1411,11 +1926,24 @@ async def handle_chat_stream_async(
 
     async def _pipeline() -> None:
         try:
-            prep = await loop.run_in_executor(
-                None, _prepare_stream, conversation_id, user_message, guest_id, ui_intent
+            prepare = _with_sse_sink(
+                cancellation.scoped(
+                    deadline.scoped(speculative_retrieval.scoped(turn.bind(_prepare_stream)), turn_deadline),
+                    cancel, "cpu",
+                ),
+                lambda frame: loop.call_soon_threadsafe(out_q.put_nowait, frame),
             )
+            prep = await executors.cpu.run_async(prepare, conversation_id, user_message, guest_id, ui_intent)
+        except executors.ExecutorSaturated as exc:
+            print(f"[STREAM] Prepare rejected: {exc}")
+            turn.finish("rejected")
+            stop_event.set()
+            await out_q.put(_sse("error", {"message": _OVERLOADED_MESSAGE}))
+            await out_q.put(None)
+            return
         except Exception as exc:
             print(f"[STREAM] Prepare failed: {exc}")
+            turn.finish("error")
             stop_event.set()
             await out_q.put(_sse("error", {"message": "Etwas ist schiefgelaufen."}))
             await out_q.put(None)
@@ -1424,6 +1952,7 @@ async def handle_chat_stream_async(
         conv_id = prep["conversation_id"]
 
         if "early_answer" in prep:
+            turn.finish("ok")
             stop_event.set()
             await out_q.put(_sse("final", {
                 "conversationId": conv_id,
@@ -1439,69 +1968,83 @@ async def handle_chat_stream_async(
         if _STREAM_TEST_DELAY > 0:
             await asyncio.sleep(_STREAM_TEST_DELAY)
 
-        # Run sync OpenAI stream in a thread; push chunks via thread-safe calls
-        chunk_q: asyncio.Queue = asyncio.Queue()
+        # Run sync OpenAI stream in a thread. Tokens are coalesced there, so
+        # only finished delta frames cross over to the event loop.
+        frame_q: asyncio.Queue = asyncio.Queue()
         _prep = prep
+        deltas = _delta_coalescer()
 
         def _stream_worker() -> None:
+            if cancel.cancelled:  # client left while the worker was queued
+                _abandon_answer(conv_id, _prep, "", "llm_queue", "llm")
+                return
+            tokens = _answer_tokens(_prep, turn)
             try:
-                stream = client.chat.completions.create(
-                    model=MODEL,
-                    messages=[
-                        {"role": "system", "content": SYSTEM_INSTRUCTIONS},
-                        {"role": "user", "content": _prep["llm_input"]},
-                    ],
-                    temperature=0.0,
-                    stream=True,
-                )
-                for chunk in stream:
-                    loop.call_soon_threadsafe(chunk_q.put_nowait, chunk)
-                loop.call_soon_threadsafe(chunk_q.put_nowait, None)
+                for token in tokens:
+                    if cancel.cancelled:
+                        tokens.close()
+                        _abandon_answer(conv_id, _prep, deltas.text(), "llm_stream", "llm")
+                        return
+                    frame = deltas.add(token)
+                    if frame:
+                        loop.call_soon_threadsafe(frame_q.put_nowait, frame)
+                frame = deltas.flush()
+                if frame:
+                    loop.call_soon_threadsafe(frame_q.put_nowait, frame)
+                deltas.record_metrics()
+                loop.call_soon_threadsafe(frame_q.put_nowait, None)
+            except circuit_breaker.LLMUnavailable:  # refused before the first token
+                try:
+                    degraded: Any = _degraded_stream_answer(_prep)
+                except Exception as exc:
+                    degraded = exc
+                loop.call_soon_threadsafe(frame_q.put_nowait, degraded)
             except Exception as exc:
-                loop.call_soon_threadsafe(chunk_q.put_nowait, exc)
+                loop.call_soon_threadsafe(frame_q.put_nowait, exc)
 
-        loop.run_in_executor(None, _stream_worker)
+        try:
+            executors.llm.submit(deadline.scoped(_stream_worker, turn_deadline))
+        except executors.ExecutorSaturated as exc:
+            print(f"[STREAM] LLM stream rejected: {exc}")
+            if prep.get("user_message_id"):
+                await adb.run(_discard_user_turn, conv_id, prep["user_message_id"], False)
+            turn.finish("rejected")
+            stop_event.set()
+            await out_q.put(_sse("error", {"message": _OVERLOADED_MESSAGE}))
+            await out_q.put(None)
+            return
 
-        full_text = ""
-        first_token_seen = False
         while True:
-            chunk = await chunk_q.get()
-            if chunk is None:
+            frame = await frame_q.get()
+            if frame is None:
                 break
-            if isinstance(chunk, Exception):
-                print(f"[STREAM] LLM error: {chunk}")
+            if isinstance(frame, dict):  # degraded answer
+                turn.finish("ok")
+                stop_event.set()
+                await out_q.put(_sse("final", {"conversationId": conv_id, **frame}))
+                await out_q.put(None)
+                return
+            if isinstance(frame, Exception):
+                print(f"[STREAM] LLM error: {frame}")
+                turn.finish("error")
                 stop_event.set()
                 await out_q.put(_sse("error", {"message": "Antwort konnte nicht generiert werden."}))
                 await out_q.put(None)
                 return
-            if not chunk.choices:
-                continue
-            token = chunk.choices[0].delta.content
-            if token:
-                if not first_token_seen:
-                    first_token_seen = True
-                    stop_event.set()
-                full_text += token
-                await out_q.put(_sse("delta", {"text": token}))
-
-        # Persist exactly once
-        assistant_message = full_text.strip()
-        _cid2 = conv_id
-        _am = assistant_message
-        _ui2 = prep.get("ui_intent")
-        await loop.run_in_executor(
-            None,
-            lambda: create_message(_cid2, "assistant", _am, intent=_ui2),
-        )
-        conv_data_updated = await loop.run_in_executor(None, get_conversation, conv_id)
-        if conv_data_updated:
-            should_upd = await loop.run_in_executor(
-                None, should_update_summary, conv_id, conv_data_updated
-            )
-            if should_upd:
-                await loop.run_in_executor(
-                    None, update_conversation_summary, conv_id, conv_data_updated
-                )
+            stop_event.set()
+            await out_q.put(frame)
+
+        # Persist exactly once: DB writes on the DB thread, the summary LLM call off it
+        assistant_message = deltas.text().strip()
+        summary_due = await adb.run(turn.bind(_store_answer), conv_id, prep, assistant_message)
+        _remember_answer(prep.get("cache_key"), prep.get("faq_probe"), assistant_message)
+        cancellation.observe_answer(count_tokens(assistant_message))
+        if summary_due:
+            try:
+                await executors.llm.run_async(turn.bind(update_conversation_summary), conv_id, summary_due)
+            except executors.ExecutorSaturated:
+                print("[STREAM] Summary skipped (llm pool saturated); retried on a later turn")
+        turn.finish("ok")
 
         await out_q.put(_sse("final", {
             "conversationId": conv_id,
@@ -1512,13 +2055,20 @@ async def handle_chat_stream_async(
 
     ticker_task = asyncio.create_task(_ticker())
     pipeline_task = asyncio.create_task(_pipeline())
+    finished = False
     try:
         while True:
             item = await out_q.get()
             if item is None:
+                finished = True
                 break
             yield item
     finally:
+        # Reached early when the client disconnects (Starlette cancels the
+        # response): the token stops the worker threads still on this turn.
+        if not finished:
+            cancel.cancel()
         stop_event.set()
         ticker_task.cancel()
         pipeline_task.cancel()
+        turn.finish("aborted")  # no-op if the turn already finished
@@ -0,0 +1,304 @@
+"""
+Circuit breaker for the chat completions API.
+
+app.clients wraps the (accounted) OpenAI client with wrap(). Every
+chat.completions.create call goes through the breaker `llm`:
+
+  closed     calls pass; outcomes of the last LLM_BREAKER_WINDOW_S are kept
+  open       tripped: calls fail immediately with LLMUnavailable for
+             LLM_BREAKER_OPEN_S instead of each waiting for its timeout
+  half_open  after the open period up to LLM_BREAKER_PROBES calls go through
+             as probes; a success closes the breaker, a failure re-opens it
+
+The breaker trips (closed → open) once the window holds at least
+LLM_BREAKER_MIN_CALLS calls and either
+  failures / calls >= LLM_BREAKER_ERROR_RATE   (timeouts, connection errors,
+                                                429 and 5xx responses)
+  slow calls / calls >= LLM_BREAKER_SLOW_RATE  (see below)
+A call is slow when it takes longer than
+  streaming       LLM_BREAKER_SLOW_CALL_S until the first chunk (time to first
+                  token; the answer's length says nothing about the backend)
+  non-streaming   LLM_BREAKER_SLOW_CALL_S + max_tokens / LLM_BREAKER_SLOW_TOKENS_PER_S
+                  for the whole call. Calls without max_tokens (the main
+                  answer) are open-ended and never count as slow; their
+                  failures still count.
+Other errors (bad requests, parsing) say nothing about the backend and are
+not counted. Embeddings are not guarded: retrieval keeps working, so degraded
+knowledge answers can still name their sources.
+
+available() is the per-turn question "plan with the LLM?": False while open
+(and while a half-open probe is out). The pipeline then skips the optional
+LLM stages (deadline.allows) and the summary update, serves answer / FAQ
+cache hits as usual and otherwise answers without the LLM
+(chat_service._degraded_answer). The first turn after the open period runs
+normally and its calls are the probes.
+
+Telemetry:
+  kursbot_llm_breaker_state                   0 closed, 1 half_open, 2 open (gauge)
+  kursbot_llm_breaker_transitions_total{to}   state changes
+  kursbot_llm_breaker_rejected_total          calls failed fast while open
+  kursbot_llm_breaker_skipped_stages_total{stage}  optional stages skipped while open
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Iterator, Optional, Tuple
+
+from app import metrics
+
+STATE = "kursbot_llm_breaker_state"
+TRANSITIONS_TOTAL = "kursbot_llm_breaker_transitions_total"
+REJECTED_TOTAL = "kursbot_llm_breaker_rejected_total"
+SKIPPED_STAGES_TOTAL = "kursbot_llm_breaker_skipped_stages_total"
+
+metrics.describe(STATE, "gauge", "LLM circuit breaker state: 0 closed, 1 half_open, 2 open.")
+metrics.describe(TRANSITIONS_TOTAL, "counter", "LLM circuit breaker state changes by target state.")
+metrics.describe(REJECTED_TOTAL, "counter", "Chat completion calls failed fast by the open circuit breaker.")
+metrics.describe(SKIPPED_STAGES_TOTAL, "counter", "Optional LLM stages skipped because the circuit breaker was open.")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class LLMUnavailable(RuntimeError):
+    """Raised instead of calling the API while the breaker is open."""
+
+
+def is_backend_failure(exc: BaseException) -> bool:
+    """Errors that indicate a slow / failing backend (not a bad request)."""
+    import openai
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class CircuitBreaker:
+    """Error-rate / slow-call-rate breaker with half-open probing."""
+
+    def __init__(
+        self,
+        window_s: float = 30.0,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_rate: float = 0.5,
+        slow_call_s: float = 8.0,
+        slow_tokens_per_s: float = 50.0,
+        open_s: float = 30.0,
+        probes: int = 1,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window_s = window_s
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_call_s = slow_call_s
+        self.slow_tokens_per_s = slow_tokens_per_s
+        self.open_s = open_s
+        self.probes = max(1, probes)
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_out = 0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (at, failed, slow)
+        metrics.set_gauge(STATE, 0, {})
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def available(self) -> bool:
+        """Whether a new turn should plan with the LLM."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._maybe_half_open()
+            return self._state == CLOSED or (self._state == HALF_OPEN and self._probes_out < self.probes)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """fn(*args, **kwargs) through the breaker."""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        probe = self._admit()
+        started = self._clock()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self._record(probe, failed=is_backend_failure(exc), slow=False, counted=is_backend_failure(exc))
+            raise
+        if kwargs.get("stream"):
+            return _TimedStream(result, self, probe, started)
+        limit = self.slow_limit(kwargs.get("max_tokens"))
+        self._record(probe, failed=False, slow=limit is not None and self._clock() - started > limit, counted=True)
+        return result
+
+    def slow_limit(self, max_tokens: Optional[int]) -> Optional[float]:
+        """Seconds after which a non-streaming call counts as slow (None: never, for open-ended calls)."""
+        if not max_tokens:
+            return None
+        return self.slow_call_s + max_tokens / self.slow_tokens_per_s
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            self._probes_out = 0
+            self._transition(CLOSED)
+
+    # ── internals (caller holds the lock unless noted) ────────────────
+
+    def _admit(self) -> bool:
+        """Let a call through (returns True for a half-open probe) or raise LLMUnavailable."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and self._probes_out < self.probes:
+                self._probes_out += 1
+                return True
+        metrics.inc(REJECTED_TOTAL, {})
+        raise LLMUnavailable("LLM circuit breaker open")
+
+    def _record(self, probe: bool, failed: bool, slow: bool, counted: bool) -> None:
+        with self._lock:
+            if probe:
+                self._probes_out = max(0, self._probes_out - 1)
+                if self._state == HALF_OPEN:
+                    if failed or slow:
+                        self._open()
+                    elif counted:
+                        self._calls.clear()
+                        self._transition(CLOSED)
+                return
+            if not counted or self._state != CLOSED:
+                return
+            now = self._clock()
+            self._calls.append((now, failed, slow))
+            while self._calls and self._calls[0][0] < now - self.window_s:
+                self._calls.popleft()
+            n = len(self._calls)
+            if n < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slow_calls = sum(1 for _, _, s in self._calls if s)
+            if failures / n >= self.error_rate or slow_calls / n >= self.slow_rate:
+                print(f"[BREAKER] open: {failures}/{n} failed, {slow_calls}/{n} slow in {self.window_s:.0f}s")
+                self._open()
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._calls.clear()
+        self._transition(OPEN)
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_s:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        print(f"[BREAKER] {self._state} → {state}")
+        self._state = state
+        metrics.set_gauge(STATE, _STATE_VALUES[state], {})
+        metrics.inc(TRANSITIONS_TOTAL, {"to": state})
+
+
+class _TimedStream:
+    """Records a streaming call once its first chunk arrives (or it ends before one)."""
+
+    def __init__(self, inner, breaker: CircuitBreaker, probe: bool, started: float):
+        self._inner = inner
+        self._breaker = breaker
+        self._probe = probe
+        self._started = started
+        self._done = False
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for chunk in self._inner:
+                if not self._done:
+                    slow = self._breaker._clock() - self._started > self._breaker.slow_call_s
+                    self._finish(failed=False, slow=slow, counted=True)
+                yield chunk
+        except Exception as exc:
+            self._finish(failed=is_backend_failure(exc), slow=False, counted=is_backend_failure(exc))
+            raise
+        finally:
+            self._finish(failed=False, slow=False, counted=False)  # ended without a chunk: no verdict
+
+    def _finish(self, failed: bool, slow: bool, counted: bool) -> None:
+        if self._done:
+            return
+        self._done = True
+        self._breaker._record(self._probe, failed=failed, slow=slow, counted=counted)
+
+    def close(self) -> None:
+        try:
+            self._inner.close()
+        finally:
+            self._finish(failed=False, slow=False, counted=False)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+llm: Optional[CircuitBreaker] = None
+
+
+def available() -> bool:
+    """Whether the current turn should plan with the LLM (True without a breaker)."""
+    return llm is None or llm.available()
+
+
+def skip_stage(stage: str) -> bool:
+    """True (and counted) if an optional LLM stage should be skipped because the breaker is open."""
+    if available():
+        return False
+    metrics.inc(SKIPPED_STAGES_TOTAL, {"stage": stage})
+    return True
+
+
+# ── Client proxy ──────────────────────────────────────────────────────
+
+class _GuardedCompletions:
+    def __init__(self, inner, breaker: CircuitBreaker):
+        self._inner = inner
+        self._breaker = breaker
+
+    def create(self, *args, **kwargs):
+        return self._breaker.call(self._inner.create, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class _GuardedChat:
+    def __init__(self, inner, breaker: CircuitBreaker):
+        self._inner = inner
+        self.completions = _GuardedCompletions(inner.completions, breaker)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class GuardedClient:
+    """OpenAI client whose chat completions go through a CircuitBreaker."""
+
+    def __init__(self, inner, breaker: CircuitBreaker):
+        self._inner = inner
+        self.breaker = breaker
+        self.chat = _GuardedChat(inner.chat, breaker)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+def wrap(inner, **config) -> GuardedClient:
+    """Guard inner's chat completions with the process-wide breaker `llm` (config: CircuitBreaker kwargs)."""
+    global llm
+    llm = CircuitBreaker(**config)
+    return GuardedClient(inner, llm)
@@ -10,6 +10,8 @@ from openai import OpenAI
 import chromadb
 from chromadb.config import Settings
 
+from app import circuit_breaker, llm_accounting
+
 load_dotenv()
 
 # ── Model config ──────────────────────────────────────────────────────
@@ -22,6 +24,95 @@ LAST_N = int(os.getenv("LAST_N", "8"))
 MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", "9000"))
 SUMMARY_THRESHOLD = int(os.getenv("SUMMARY_THRESHOLD", "6"))
 DISTANCE_THRESHOLD = float(os.getenv("DISTANCE_THRESHOLD", "1.0"))
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "1").lower() in ("1", "true", "yes")
+
+# ── Prompt token budget (0 disables a limit) ──────────────────────────
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "8000"))
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "2600"))
+MAX_HISTORY_TOKENS = int(os.getenv("MAX_HISTORY_TOKENS", "2000"))
+
+# ── Answer cache (fresh KNOWLEDGE turns) ──────────────────────────────
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_TTL_S = int(os.getenv("ANSWER_CACHE_TTL_S", "86400"))
+
+# ── Semantic FAQ cache (paraphrased fresh learn questions) ────────────
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+FAQ_CACHE_THRESHOLD = float(os.getenv("FAQ_CACHE_THRESHOLD", "0.94"))
+FAQ_CACHE_MATCH_TOP = int(os.getenv("FAQ_CACHE_MATCH_TOP", "4"))
+FAQ_CACHE_MAX_ENTRIES = int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "200"))
+FAQ_CACHE_INTENTS = {i.strip() for i in os.getenv("FAQ_CACHE_INTENTS", "learn").split(",")}
+
+# ── Recipe search (local shortlist before LLM rerank) ────────────────
+RECIPE_SHORTLIST_K = int(os.getenv("RECIPE_SHORTLIST_K", "20"))
+RECIPE_INDEX_EMBEDDINGS = os.getenv("RECIPE_INDEX_EMBEDDINGS", "0").lower() in ("1", "true", "yes")
+
+# ── LLM call accounting (per call site) ───────────────────────────────
+LLM_CALLS_WINDOW_S = int(os.getenv("LLM_CALLS_WINDOW_S", "900"))
+LLM_CALLS_LOG_INTERVAL_S = int(os.getenv("LLM_CALLS_LOG_INTERVAL_S", "300"))
+
+# ── SSE delta coalescing ("coalesce" | "token" = one frame per chunk) ─
+STREAM_DELTA_MODE = os.getenv("STREAM_DELTA_MODE", "coalesce").strip().lower()
+STREAM_DELTA_FLUSH_MS = float(os.getenv("STREAM_DELTA_FLUSH_MS", "100"))
+STREAM_DELTA_FLUSH_CHARS = int(os.getenv("STREAM_DELTA_FLUSH_CHARS", "120"))
+
+# ── Per-turn deadline (0 = off) and hedged preprocessing calls ─────
+TURN_DEADLINE_S = float(os.getenv("TURN_DEADLINE_S", "20"))
+DEADLINE_ANSWER_RESERVE_S = float(os.getenv("DEADLINE_ANSWER_RESERVE_S", "8"))
+DEADLINE_ANSWER_MIN_S = float(os.getenv("DEADLINE_ANSWER_MIN_S", "10"))
+HEDGED_REQUESTS_ENABLED = os.getenv("HEDGED_REQUESTS_ENABLED", "0").lower() in ("1", "true", "yes")
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "300"))
+
+# ── LLM circuit breaker (error / slow-call rate → engine-only answers) ──
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "1").lower() in ("1", "true", "yes")
+LLM_BREAKER_WINDOW_S = float(os.getenv("LLM_BREAKER_WINDOW_S", "30"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_S = float(os.getenv("LLM_BREAKER_SLOW_CALL_S", "8"))
+LLM_BREAKER_SLOW_TOKENS_PER_S = float(os.getenv("LLM_BREAKER_SLOW_TOKENS_PER_S", "50"))
+LLM_BREAKER_OPEN_S = float(os.getenv("LLM_BREAKER_OPEN_S", "30"))
+LLM_BREAKER_PROBES = int(os.getenv("LLM_BREAKER_PROBES", "1"))
+
+# ── Client disconnect: keep the answer streamed so far? ("none" | "partial") ──
+STREAM_PERSIST_ON_DISCONNECT = os.getenv("STREAM_PERSIST_ON_DISCONNECT", "none").strip().lower()
+
+# ── Shared executors (workers + bounded queue; beyond that → 503) ────
+EXECUTOR_LLM_WORKERS = int(os.getenv("EXECUTOR_LLM_WORKERS", "32"))
+EXECUTOR_LLM_QUEUE = int(os.getenv("EXECUTOR_LLM_QUEUE", "64"))
+EXECUTOR_VISION_WORKERS = int(os.getenv("EXECUTOR_VISION_WORKERS", "4"))
+EXECUTOR_VISION_QUEUE = int(os.getenv("EXECUTOR_VISION_QUEUE", "8"))
+EXECUTOR_CPU_WORKERS = int(os.getenv("EXECUTOR_CPU_WORKERS", "8"))
+EXECUTOR_CPU_QUEUE = int(os.getenv("EXECUTOR_CPU_QUEUE", "32"))
+EXECUTOR_HEDGE_WORKERS = int(os.getenv("EXECUTOR_HEDGE_WORKERS", "16"))
+
+# ── Single-flight: identical concurrent LLM/embedding calls share one request ──
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1").lower() in ("1", "true", "yes")
+
+# ── Skip the LLM query rewrite for self-contained messages ──────────
+QUERY_REWRITE_SKIP_SELF_CONTAINED = os.getenv("QUERY_REWRITE_SKIP_SELF_CONTAINED", "1").lower() in ("1", "true", "yes")
+
+# ── Fused preprocessing: one JSON call for normalize/intent/food/rewrite ──
+FUSED_PREPROCESSING_ENABLED = os.getenv("FUSED_PREPROCESSING_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# ── Direct (LLM-free) answers for unambiguous OK / NOT_OK engine verdicts ──
+DIRECT_VERDICT_ANSWERS = os.getenv("DIRECT_VERDICT_ANSWERS", "0").lower() in ("1", "true", "yes")
+
+# ── Speculative retrieval on the raw message (parallel to normalization) ──
+SPECULATIVE_RETRIEVAL_ENABLED = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "1").lower() in ("1", "true", "yes")
+SPECULATIVE_RETRIEVAL_MIN_SIMILARITY = float(os.getenv("SPECULATIVE_RETRIEVAL_MIN_SIMILARITY", "0.9"))
+
+# ── Admission control for the chat endpoints (429 per guest, 503 global) ──
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").lower() in ("1", "true", "yes")
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "24"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "48"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "5000"))
+ADMISSION_RATE_PER_S = float(os.getenv("ADMISSION_RATE_PER_S", "20"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "40"))
+ADMISSION_GUEST_MAX_INFLIGHT = int(os.getenv("ADMISSION_GUEST_MAX_INFLIGHT", "3"))
+ADMISSION_GUEST_RATE_PER_S = float(os.getenv("ADMISSION_GUEST_RATE_PER_S", "1"))
+ADMISSION_GUEST_BURST = float(os.getenv("ADMISSION_GUEST_BURST", "20"))
 
 # ── ChromaDB config ───────────────────────────────────────────────────
 CHROMA_DIR = os.getenv("CHROMA_DIR", "storage/chroma")
@@ -29,6 +120,21 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME", "kursmaterial_v1")
 DEBUG_RAG = os.getenv("DEBUG_RAG", "0").lower() in ("1", "true", "yes")
 
 # ── Singleton clients ─────────────────────────────────────────────────
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = circuit_breaker.wrap(
+    llm_accounting.wrap(
+        OpenAI(api_key=os.getenv("OPENAI_API_KEY")),
+        window_s=LLM_CALLS_WINDOW_S,
+        log_interval_s=LLM_CALLS_LOG_INTERVAL_S,
+    ),
+    window_s=LLM_BREAKER_WINDOW_S,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    error_rate=LLM_BREAKER_ERROR_RATE,
+    slow_rate=LLM_BREAKER_SLOW_RATE,
+    slow_call_s=LLM_BREAKER_SLOW_CALL_S,
+    slow_tokens_per_s=LLM_BREAKER_SLOW_TOKENS_PER_S,
+    open_s=LLM_BREAKER_OPEN_S,
+    probes=LLM_BREAKER_PROBES,
+    enabled=LLM_BREAKER_ENABLED,
+)
 chroma = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False))
 col = chroma.get_or_create_collection(name=COLLECTION_NAME)
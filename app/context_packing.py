@@ -0,0 +1,145 @@
+"""
+Sentence-window packing of retrieved course chunks.
+
+Ingest chunks are ~1200 chars with ~200 chars of block overlap, and build_context
+used to paste them whole. Packing runs after retrieval instead:
+
+1. Overlap removal: blocks already emitted for the same path (higher-ranked
+   chunk) are dropped from later chunks of that path.
+2. Sentence scoring: each sentence is scored lexically against the query terms
+   (prefix/compound match, so "Kohlenhydrate" hits "Kohlenhydraten").
+3. Windows: the best sentences per chunk are kept with ±PACK_WINDOW neighbours;
+   chunks without any lexical hit keep their leading sentences (the vector
+   search found them relevant, so they still ground the answer). If no chunk
+   has a hit at all, chunks are kept whole (overlap removal only).
+
+The output keeps the build_context format ("[path#chunk]" label + text), so
+grounding checks and prompt budgeting work unchanged.
+"""
+import os
+import re
+from typing import Dict, List, Set, Tuple
+
+PACK_WINDOW = int(os.getenv("PACK_WINDOW", "1"))
+PACK_MAX_WINDOWS = int(os.getenv("PACK_MAX_WINDOWS", "3"))
+PACK_FALLBACK_SENTENCES = int(os.getenv("PACK_FALLBACK_SENTENCES", "2"))
+
+GAP_MARKER = "[…]"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?:])\s+(?=[\"„(»A-ZÄÖÜ0-9])")
+_WORD = re.compile(r"[a-zäöüß0-9]+")
+
+_STOPWORDS = {
+    "aber", "alle", "alles", "als", "also", "auch", "auf", "aus", "bei", "bin", "bis",
+    "bitte", "da", "das", "dass", "dein", "deine", "dem", "den", "der", "des", "die",
+    "dir", "doch", "du", "ein", "eine", "einem", "einen", "einer", "es", "etwas", "für",
+    "gibt", "gut", "hat", "hier", "ich", "ihr", "im", "in", "ist", "ja", "kann", "kein",
+    "mal", "man", "mein", "meine", "mich", "mir", "mit", "nach", "nicht", "noch", "nur",
+    "oder", "sich", "sie", "sind", "so", "soll", "und", "uns", "vom", "von", "vor", "was",
+    "welche", "welcher", "wenn", "wer", "wie", "wir", "wird", "zu", "zum", "zur",
+    "brauch", "brauche", "nenne", "nenn", "steht", "warum", "wieso", "weshalb", "zusammen",
+}
+
+
+def query_terms(query: str) -> Set[str]:
+    """Lower-cased content words of the query, trimmed to a stem for prefix matching."""
+    terms = set()
+    for word in _WORD.findall((query or "").lower()):
+        if len(word) < 3 or word in _STOPWORDS:
+            continue
+        terms.add(word[:7] if len(word) > 7 else word)
+    return terms
+
+
+def score_sentence(sentence: str, terms: Set[str]) -> float:
+    """Distinct query terms contained in the sentence (+ small bonus per extra hit)."""
+    if not terms:
+        return 0.0
+    words = _WORD.findall(sentence.lower())
+    matched = set()
+    hits = 0
+    for w in words:
+        for t in terms:
+            if t in w:
+                matched.add(t)
+                hits += 1
+    return len(matched) + 0.1 * (hits - len(matched))
+
+
+def split_sentences(block: str) -> List[str]:
+    """Split a markdown block into sentences; headings and list items stay whole lines."""
+    sentences = []
+    for line in block.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#") or line.startswith(("-", "*", "•")) or re.match(r"^\d+[.)]\s", line):
+            sentences.append(line)
+            continue
+        sentences.extend(s.strip() for s in _SENTENCE_END.split(line) if s.strip())
+    return sentences
+
+
+def remove_overlap(docs: List[str], metas: List[Dict]) -> List[List[str]]:
+    """Blocks per chunk, minus blocks already seen in a higher-ranked chunk of the same path."""
+    seen: Dict[str, Set[str]] = {}
+    out = []
+    for doc, meta in zip(docs, metas):
+        path_seen = seen.setdefault(meta.get("path", "?"), set())
+        blocks = []
+        for block in (doc or "").split("\n\n"):
+            key = block.strip()
+            if not key or key in path_seen:
+                continue
+            path_seen.add(key)
+            blocks.append(key)
+        out.append(blocks)
+    return out
+
+
+def _select_windows(scores: List[float]) -> List[int]:
+    """Indices of sentences to keep for one chunk (sorted, original order)."""
+    if not scores:
+        return []
+    ranked = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: (-scores[i], i))
+    if not ranked:
+        return list(range(min(PACK_FALLBACK_SENTENCES, len(scores))))
+    keep = set()
+    for center in ranked[:PACK_MAX_WINDOWS]:
+        lo = max(0, center - PACK_WINDOW)
+        hi = min(len(scores), center + PACK_WINDOW + 1)
+        keep.update(range(lo, hi))
+    return sorted(keep)
+
+
+def pack_chunk(blocks: List[str], terms: Set[str]) -> str:
+    """Top sentence windows of one chunk, with GAP_MARKER between non-adjacent windows."""
+    sentences = [s for block in blocks for s in split_sentences(block)]
+    keep = _select_windows([score_sentence(s, terms) for s in sentences])
+    lines: List[str] = []
+    prev = None
+    for i in keep:
+        if prev is not None and i != prev + 1:
+            lines.append(GAP_MARKER)
+        lines.append(sentences[i])
+        prev = i
+    return "\n".join(lines)
+
+
+def pack_pieces(docs: List[str], metas: List[Dict], query: str) -> List[Tuple[str, str]]:
+    """
+    [(label, packed_text)] in retrieval rank order; empty chunks are skipped.
+
+    If the query has no lexical hit in any chunk (e.g. "Burger und Pommes"
+    before classification), there is nothing to select on: chunks are returned
+    whole, only with the same-path overlap removed.
+    """
+    terms = query_terms(query)
+    deduped = remove_overlap(docs, metas)
+    has_signal = any(score_sentence(block, terms) > 0 for blocks in deduped for block in blocks)
+    pieces = []
+    for blocks, meta in zip(deduped, metas):
+        text = pack_chunk(blocks, terms) if has_signal else "\n\n".join(blocks)
+        if text:
+            pieces.append((f"[{meta.get('path','?')}#{meta.get('chunk','?')}]", text))
+    return pieces
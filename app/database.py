@@ -1,11 +1,14 @@
 import json
 import sqlite3
+import threading
 import uuid
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from contextlib import contextmanager
 import os
 
+from app import metrics
+
 DB_PATH = os.getenv("DB_PATH", "storage/chat.db")
 
 def init_db():
@@ -87,19 +90,60 @@ def init_db():
     conn.commit()
     conn.close()
 
-@contextmanager
-def get_db():
-    """Context manager for database connections."""
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    return conn
+
+
+def use_persistent_connection() -> None:
+    """Make get_db() on the calling thread reuse one connection (app.async_database's DB thread)."""
+    _local.persistent = True
+    _local.conn = None
+    _local.path = None
+    _local.depth = 0
+
+
+def close_persistent_connection() -> None:
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+    _local.conn = None
+
+
+def _thread_connection() -> sqlite3.Connection:
+    if _local.conn is None or _local.path != DB_PATH:  # (re)open lazily, follows DB_PATH changes
+        close_persistent_connection()
+        _local.conn = _connect()
+        _local.path = DB_PATH
+    return _local.conn
+
+
+@contextmanager
+def get_db():
+    """Context manager for database connections (commit on success, rollback on error)."""
+    persistent = getattr(_local, "persistent", False)
+    if persistent:
+        conn = _thread_connection()
+        _local.depth += 1
+    else:
+        conn = _connect()
     try:
         yield conn
-        conn.commit()
+        if not persistent or _local.depth == 1:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if not persistent or _local.depth == 1:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        if persistent:
+            _local.depth -= 1
+        else:
+            conn.close()
 
 
 def _conversation_columns(conn: sqlite3.Connection) -> set:
@@ -160,15 +204,22 @@ def create_message(
     message_id = str(uuid.uuid4())
     now = datetime.utcnow().isoformat()
 
-    with get_db() as conn:
-        conn.execute("""
-            INSERT INTO messages (id, conversation_id, role, content, created_at, image_path, intent)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (message_id, conversation_id, role, content, now, image_path, intent))
+    with metrics.span("db_write"):
+        with get_db() as conn:
+            conn.execute("""
+                INSERT INTO messages (id, conversation_id, role, content, created_at, image_path, intent)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (message_id, conversation_id, role, content, now, image_path, intent))
 
-    update_conversation_timestamp(conversation_id)
+        update_conversation_timestamp(conversation_id)
     return message_id
 
+def delete_message(message_id: str):
+    """Delete a single message."""
+    with get_db() as conn:
+        conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+
+
 def get_messages(conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
     """Get messages for a conversation, ordered by created_at."""
     with get_db() as conn:
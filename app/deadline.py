@@ -0,0 +1,253 @@
+"""
+Per-turn deadline carried through the pipeline, plus hedged LLM calls.
+
+Every chat turn starts a Deadline of TURN_DEADLINE_S (0 = off). It lives in
+a ContextVar, so stages read it without extra parameters; scoped() sets it
+for an executor submit and bind() carries the current one into the llm pool.
+Without an active deadline every helper behaves as before (fixed timeouts,
+nothing skipped).
+
+  timeout(cap_s)     an LLM call's timeout: its own cap, but never more than
+                     the budget left (applied by bounded())
+  answer_timeout()   the main completion: the budget left, but at least
+                     DEADLINE_ANSWER_MIN_S (the answer is never skipped)
+  allows(stage, site, cap_s)
+                     degradation gate for optional LLM stages: False once
+                     the budget left minus DEADLINE_ANSWER_RESERVE_S (kept
+                     for retrieval + answer) is below the stage's expected
+                     cost (observed p90 of its call site, else cap_s). The
+                     stage then takes its no-LLM fallback:
+                       normalize      raw message
+                       intent         None (regex mode detection only)
+                       query_rewrite  message as-is (+ expand_alias_terms)
+                       food_classify  None
+                     While the LLM circuit breaker is open every optional
+                     stage takes its fallback (circuit_breaker.skip_stage).
+
+bounded(site, fn, cap_s, hedge) wraps an LLM call for single_flight.run():
+the timeout is added at call time, so it is not part of the coalescing key.
+With hedge=True and HEDGED_REQUESTS_ENABLED, a call that has not answered
+after its site's observed p90 latency (at least HEDGE_MIN_DELAY_MS, once
+HEDGE_MIN_SAMPLES calls were seen) gets a duplicate request on the hedge
+pool; the first answer wins. The loser is not cancelled (the sync client
+cannot), so hedging trades a few extra tokens for the latency tail.
+
+Telemetry:
+  kursbot_deadline_remaining_seconds{stage}     budget left when an optional stage starts
+  kursbot_deadline_degraded_total{stage}        optional stage skipped for lack of budget
+  kursbot_hedged_requests_total{site,outcome}   sent | primary_won | hedge_won | skipped_saturated
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from app import circuit_breaker, executors, llm_accounting, metrics
+from app.clients import (
+    DEADLINE_ANSWER_MIN_S,
+    DEADLINE_ANSWER_RESERVE_S,
+    HEDGE_MIN_DELAY_MS,
+    HEDGE_MIN_SAMPLES,
+    HEDGED_REQUESTS_ENABLED,
+    TURN_DEADLINE_S,
+)
+
+REMAINING_SECONDS = "kursbot_deadline_remaining_seconds"
+DEGRADED_TOTAL = "kursbot_deadline_degraded_total"
+HEDGED_TOTAL = "kursbot_hedged_requests_total"
+
+metrics.describe(REMAINING_SECONDS, "histogram", "Turn budget left when an optional LLM stage starts.",
+                 buckets=(1.0, 2.5, 5.0, 7.5, 10.0, 12.5, 15.0, 20.0, 30.0))
+metrics.describe(DEGRADED_TOTAL, "counter", "Optional LLM stages skipped because the turn deadline was near.")
+metrics.describe(HEDGED_TOTAL, "counter", "Hedged LLM calls: duplicates sent and which attempt answered first.")
+
+_MIN_TIMEOUT_S = 0.5
+_LATENCY_WINDOW = 200
+
+
+class Deadline:
+    """Absolute end of one turn's time budget."""
+
+    def __init__(self, budget_s: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.budget_s = budget_s
+        self.expires_at = clock() + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("turn_deadline", default=None)
+
+
+def start() -> Optional[Deadline]:
+    """A fresh deadline for a new turn (None when TURN_DEADLINE_S is 0)."""
+    return Deadline(TURN_DEADLINE_S) if TURN_DEADLINE_S > 0 else None
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def scope(deadline: Optional[Deadline] = None) -> Iterator[Optional[Deadline]]:
+    """Run a turn under deadline (default: a fresh one)."""
+    token = _current.set(deadline if deadline is not None else start())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def scoped(fn: Callable, deadline: Optional[Deadline]) -> Callable:
+    """fn running under deadline (for executor submits)."""
+    def _scoped(*args, **kwargs):
+        token = _current.set(deadline)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return _scoped
+
+
+def bind(fn: Callable) -> Callable:
+    """fn running under the current deadline, wherever it is called (llm pool submits)."""
+    return scoped(fn, _current.get())
+
+
+# ── Stage budgets ─────────────────────────────────────────────────────
+
+def timeout(cap_s: float) -> float:
+    """Timeout for an LLM call: cap_s, shortened to the budget left."""
+    deadline = _current.get()
+    if deadline is None:
+        return cap_s
+    return max(_MIN_TIMEOUT_S, min(cap_s, deadline.remaining()))
+
+
+def answer_timeout(default_s: float = 600.0) -> float:
+    """Timeout for the main completion (default_s = the SDK default without a deadline)."""
+    deadline = _current.get()
+    if deadline is None:
+        return default_s
+    return max(DEADLINE_ANSWER_MIN_S, deadline.remaining())
+
+
+def allows(stage: str, site: str, cap_s: float) -> bool:
+    """Whether an optional LLM stage still fits into the turn's budget (never while the LLM breaker is open)."""
+    if circuit_breaker.skip_stage(stage):
+        return False
+    deadline = _current.get()
+    if deadline is None:
+        return True
+    remaining = deadline.remaining()
+    metrics.observe(REMAINING_SECONDS, remaining, {"stage": stage})
+    observed = p90(site)
+    cost = min(cap_s, observed) if observed is not None else cap_s
+    if remaining - DEADLINE_ANSWER_RESERVE_S >= cost:
+        return True
+    metrics.inc(DEGRADED_TOTAL, {"stage": stage})
+    print(f"[DEADLINE] {stage} skipped: {remaining:.1f}s left, needs ~{cost:.1f}s "
+          f"+ {DEADLINE_ANSWER_RESERVE_S:.0f}s reserve")
+    return False
+
+
+# ── Observed latency per call site ────────────────────────────────────
+
+_latency_lock = threading.Lock()
+_latencies: Dict[str, Deque[float]] = {}
+
+
+def observe_latency(site: str, seconds: float) -> None:
+    with _latency_lock:
+        _latencies.setdefault(site, deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+
+
+def p90(site: str) -> Optional[float]:
+    """p90 of the site's recent successful calls (None below HEDGE_MIN_SAMPLES)."""
+    with _latency_lock:
+        values = sorted(_latencies.get(site, ()))
+    if len(values) < max(1, HEDGE_MIN_SAMPLES):
+        return None
+    return values[min(len(values) - 1, int(round(0.9 * (len(values) - 1))))]
+
+
+def reset() -> None:
+    """Forget observed latencies (tests)."""
+    with _latency_lock:
+        _latencies.clear()
+
+
+# ── Bounded / hedged calls ────────────────────────────────────────────
+
+def bounded(site: str, fn: Callable[..., Any], cap_s: float, hedge: bool = False) -> Callable[..., Any]:
+    """fn(**params) with timeout=timeout(cap_s) added at call time; hedged if asked and enabled."""
+    def _call(**params):
+        params["timeout"] = timeout(cap_s)
+        if hedge and HEDGED_REQUESTS_ENABLED:
+            return _hedged(site, fn, params)
+        return _timed(site, fn, params)
+    return _call
+
+
+def _timed(site: str, fn: Callable[..., Any], params: Dict[str, Any]) -> Any:
+    started = time.perf_counter()
+    with llm_accounting.attributed_to(site):
+        result = fn(**params)
+    observe_latency(site, time.perf_counter() - started)
+    return result
+
+
+def _hedge_delay(site: str, timeout_s: float) -> Optional[float]:
+    observed = p90(site)
+    if observed is None:
+        return None
+    delay = max(HEDGE_MIN_DELAY_MS / 1000, observed)
+    return delay if delay < timeout_s else None
+
+
+def _submit(site: str, fn: Callable[..., Any], params: Dict[str, Any]):
+    try:
+        return executors.hedge.submit(_timed, site, fn, params)
+    except executors.ExecutorSaturated:
+        metrics.inc(HEDGED_TOTAL, {"site": site, "outcome": "skipped_saturated"})
+        return None
+
+
+def _hedged(site: str, fn: Callable[..., Any], params: Dict[str, Any]) -> Any:
+    """
+    Primary attempt on the hedge pool; after the hedge delay a duplicate, first
+    answer wins. Both attempts run on the hedge pool (not the caller's thread)
+    so the caller can stop waiting for a slow primary.
+    """
+    delay = _hedge_delay(site, params["timeout"])
+    if delay is None:
+        return _timed(site, fn, params)
+    primary = _submit(site, fn, params)
+    if primary is None:
+        return _timed(site, fn, params)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeout:
+        pass
+
+    backup = _submit(site, fn, params)
+    if backup is None:
+        return primary.result()
+    metrics.inc(HEDGED_TOTAL, {"site": site, "outcome": "sent"})
+    print(f"[HEDGE] {site}: no answer after {delay * 1000:.0f}ms → duplicate request sent")
+
+    pending = {primary: "primary_won", backup: "hedge_won"}
+    error: Optional[BaseException] = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            outcome = pending.pop(future)
+            if future.exception() is None:
+                metrics.inc(HEDGED_TOTAL, {"site": site, "outcome": outcome})
+                return future.result()
+            error = future.exception()
+    raise error
@@ -0,0 +1,54 @@
+"""Policy for answering unambiguous engine verdicts without the LLM."""
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.chat_modes import ChatMode, ChatModifiers
+from app.clients import DIRECT_VERDICT_ANSWERS
+from trennkost.models import TrafficLight, TrennkostResult, Verdict
+
+
+_EXPLANATION_RE = re.compile(r"\b(warum|wieso|weshalb|erkl[äa]r\w*|begründ\w*)\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DirectAnswerDecision:
+    allowed: bool
+    reason_code: Optional[str] = None
+
+
+def evaluate_direct_answer_policy(
+    trennkost_results: Optional[List[TrennkostResult]],
+    mode: ChatMode,
+    modifiers: ChatModifiers,
+    user_message: str,
+    image_path: Optional[str],
+) -> DirectAnswerDecision:
+    """
+    Whether a FOOD_ANALYSIS turn can be answered with
+    trennkost.formatter.format_verdict_directly instead of RAG + LLM.
+
+    Only a single text-analysed dish with a definitive Trennkost verdict
+    (OK / NOT_OK), no open questions, no unknown items and a green traffic
+    light qualifies. Breakfast, pasted-recipe compliance checks and
+    "warum …?" questions keep the LLM, which explains from course snippets.
+    """
+    if not DIRECT_VERDICT_ANSWERS:
+        return DirectAnswerDecision(False, "disabled")
+    if mode != ChatMode.FOOD_ANALYSIS or image_path:
+        return DirectAnswerDecision(False, "mode")
+    if not trennkost_results or len(trennkost_results) != 1:
+        return DirectAnswerDecision(False, "multiple_results")
+
+    result = trennkost_results[0]
+    if result.verdict not in (Verdict.OK, Verdict.NOT_OK) or result.verdict_basis != "trennkost":
+        return DirectAnswerDecision(False, "verdict")
+    if result.required_questions:
+        return DirectAnswerDecision(False, "open_questions")
+    if result.groups_found.get("UNKNOWN") or result.traffic_light != TrafficLight.GREEN:
+        return DirectAnswerDecision(False, "uncertain")
+    if modifiers.is_breakfast or modifiers.is_compliance_check or modifiers.is_post_analysis_ack:
+        return DirectAnswerDecision(False, "context")
+    if _EXPLANATION_RE.search(user_message):
+        return DirectAnswerDecision(False, "explanation")
+    return DirectAnswerDecision(True)
@@ -0,0 +1,156 @@
+"""
+Shared, sized thread pools with backpressure.
+
+Three application-level pools replace the per-request ThreadPoolExecutors
+and the loop's unbounded default executor:
+
+  llm     LLM / embedding I/O (normalize, intent, answer streams, summaries)
+  vision  image analysis
+  cpu     pipeline + engine work (the streaming path's _prepare_stream)
+  hedge   attempts of hedged preprocessing calls (app/deadline.py); no queue,
+          a full pool means "call without hedging"
+
+Each pool admits at most `workers + queue` tasks (running + waiting). A
+submit beyond that raises ExecutorSaturated, which the API turns into a 503
+with Retry-After instead of letting threads and latency pile up. Work only
+ever flows cpu → llm/vision → hedge, so a full pool cannot deadlock on itself.
+
+Metrics (GET /api/v1/metrics):
+  kursbot_executor_wait_seconds{pool}      submit → start
+  kursbot_executor_queue_depth{pool}       waiting tasks (gauge)
+  kursbot_executor_active{pool}            running tasks (gauge)
+  kursbot_executor_rejected_total{pool}    submits refused when saturated
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app import metrics
+from app.clients import (
+    EXECUTOR_CPU_QUEUE,
+    EXECUTOR_CPU_WORKERS,
+    EXECUTOR_HEDGE_WORKERS,
+    EXECUTOR_LLM_QUEUE,
+    EXECUTOR_LLM_WORKERS,
+    EXECUTOR_VISION_QUEUE,
+    EXECUTOR_VISION_WORKERS,
+)
+
+WAIT_SECONDS = "kursbot_executor_wait_seconds"
+QUEUE_DEPTH = "kursbot_executor_queue_depth"
+ACTIVE = "kursbot_executor_active"
+REJECTED_TOTAL = "kursbot_executor_rejected_total"
+
+metrics.describe(WAIT_SECONDS, "histogram", "Time a task waited for a pool thread.",
+                 buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+metrics.describe(QUEUE_DEPTH, "gauge", "Tasks waiting for a pool thread.")
+metrics.describe(ACTIVE, "gauge", "Tasks running on a pool thread.")
+metrics.describe(REJECTED_TOTAL, "counter", "Submits refused because the pool was saturated.")
+
+
+class ExecutorSaturated(RuntimeError):
+    """A pool is at workers + queue capacity; callers answer 503."""
+
+    def __init__(self, pool: str, retry_after_s: int = 2):
+        super().__init__(f"executor '{pool}' saturated")
+        self.pool = pool
+        self.retry_after_s = retry_after_s
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor with an admission limit and queue/wait metrics."""
+
+    def __init__(self, name: str, workers: int, queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue)
+        self._pool: Optional[ThreadPoolExecutor] = None  # created on first submit, again after shutdown
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+
+    def saturated(self) -> bool:
+        with self._lock:
+            return self._admitted >= self.capacity
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"admitted": self._admitted, "running": self._running,
+                    "queued": self._admitted - self._running, "capacity": self.capacity}
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._admitted >= self.capacity:
+                rejected = True
+            else:
+                rejected = False
+                self._admitted += 1
+                self._publish()
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix=f"{self.name}-pool")
+                pool = self._pool
+        if rejected:
+            metrics.inc(REJECTED_TOTAL, {"pool": self.name})
+            print(f"[EXECUTOR] {self.name} saturated ({self.capacity} admitted) → rejecting")
+            raise ExecutorSaturated(self.name)
+
+        submitted = time.perf_counter()
+
+        def _run():
+            metrics.observe(WAIT_SECONDS, time.perf_counter() - submitted, {"pool": self.name})
+            with self._lock:
+                self._running += 1
+                self._publish()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._admitted -= 1
+                    self._publish()
+
+        try:
+            future = pool.submit(_run)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda f: f.cancelled() and self._release())  # cancelled while queued
+        return future
+
+    def _release(self) -> None:
+        """Give back the admission of a task that never ran."""
+        with self._lock:
+            self._admitted -= 1
+            self._publish()
+
+    def run_async(self, fn: Callable, *args) -> "asyncio.Future":
+        """Awaitable submit for the async path (replaces loop.run_in_executor(None, ...))."""
+        return asyncio.wrap_future(self.submit(fn, *args))
+
+    def _publish(self) -> None:  # caller holds the lock
+        metrics.set_gauge(QUEUE_DEPTH, self._admitted - self._running, {"pool": self.name})
+        metrics.set_gauge(ACTIVE, self._running, {"pool": self.name})
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+llm = BoundedExecutor("llm", EXECUTOR_LLM_WORKERS, EXECUTOR_LLM_QUEUE)
+vision = BoundedExecutor("vision", EXECUTOR_VISION_WORKERS, EXECUTOR_VISION_QUEUE)
+cpu = BoundedExecutor("cpu", EXECUTOR_CPU_WORKERS, EXECUTOR_CPU_QUEUE)
+hedge = BoundedExecutor("hedge", EXECUTOR_HEDGE_WORKERS, 0)
+
+
+def shutdown() -> None:
+    for pool in (llm, vision, cpu, hedge):
+        pool.shutdown()
+
+
+def stats() -> Dict[str, Any]:
+    return {pool.name: pool.stats() for pool in (llm, vision, cpu, hedge)}
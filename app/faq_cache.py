@@ -0,0 +1,191 @@
+"""
+Semantic FAQ cache: reuse answers for paraphrased learn-intent questions.
+
+Complements the exact-match answer cache (app.answer_cache). Answers to fresh
+KNOWLEDGE turns are stored with the embedding of their retrieval query; a new
+question reuses an answer when
+
+  - its retrieval embedding has cosine similarity >= FAQ_CACHE_THRESHOLD, and
+  - the same top FAQ_CACHE_MATCH_TOP source chunks (ids + text) were retrieved, and
+  - ui_intent, model and prompt template version match.
+
+The embedding is the one retrieval already computed (embed_one is memoized),
+so a lookup costs no extra API call. The index is a small in-process numpy
+matrix with LRU eviction; admins can list and purge entries via /api/v1/admin.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.clients import (
+    MODEL,
+    FAQ_CACHE_ENABLED,
+    FAQ_CACHE_INTENTS,
+    FAQ_CACHE_MATCH_TOP,
+    FAQ_CACHE_MAX_ENTRIES,
+    FAQ_CACHE_THRESHOLD,
+)
+from app.answer_cache import PROMPT_TEMPLATE_VERSION, normalize_message
+
+
+@dataclass
+class FaqProbe:
+    """Everything needed to look up or store one turn."""
+    question: str
+    vector: np.ndarray
+    sources: Tuple[str, ...]  # top chunk ids + text hash, order-insensitive
+    ui_intent: Optional[str]
+
+
+@dataclass
+class FaqEntry:
+    id: str
+    question: str
+    vector: np.ndarray
+    sources: Tuple[str, ...]
+    ui_intent: Optional[str]
+    answer: str
+    version: str
+    created_at: float = field(default_factory=time.time)
+    last_hit_at: Optional[float] = None
+    hits: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "question": self.question,
+            "ui_intent": self.ui_intent,
+            "sources": [s.split("@", 1)[0] for s in self.sources],
+            "answer_preview": self.answer[:200],
+            "hits": self.hits,
+            "created_at": self.created_at,
+            "last_hit_at": self.last_hit_at,
+        }
+
+
+_lock = threading.Lock()
+_entries: List[FaqEntry] = []
+_matrix: Optional[np.ndarray] = None  # rows = unit vectors of _entries
+_stats = {"lookups": 0, "hits": 0, "stores": 0}
+
+
+def _version() -> str:
+    return f"{MODEL}:{PROMPT_TEMPLATE_VERSION}"
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+def source_signature(docs: List[str], metas: List[Dict], top: int = None) -> Tuple[str, ...]:
+    """Sorted 'path#chunk@texthash' of the top retrieved chunks."""
+    top = FAQ_CACHE_MATCH_TOP if top is None else top
+    sig = []
+    for doc, meta in list(zip(docs, metas))[:top]:
+        digest = hashlib.sha1((doc or "").encode("utf-8")).hexdigest()[:12]
+        sig.append(f"{meta.get('path', '?')}#{meta.get('chunk', '?')}@{digest}")
+    return tuple(sorted(sig))
+
+
+def make_probe(
+    question: str,
+    vector: Optional[List[float]],
+    docs: List[str],
+    metas: List[Dict],
+    ui_intent: Optional[str],
+) -> Optional[FaqProbe]:
+    """Probe for an answer-cache-eligible turn, or None if the FAQ cache does not apply."""
+    if not FAQ_CACHE_ENABLED or vector is None or not docs:
+        return None
+    if (ui_intent or "") not in FAQ_CACHE_INTENTS:
+        return None
+    return FaqProbe(
+        question=normalize_message(question),
+        vector=_unit(vector),
+        sources=source_signature(docs, metas),
+        ui_intent=ui_intent,
+    )
+
+
+def _rebuild_matrix() -> None:
+    global _matrix
+    _matrix = np.vstack([e.vector for e in _entries]) if _entries else None
+
+
+def lookup(probe: Optional[FaqProbe]) -> Optional[str]:
+    """Answer of the most similar compatible entry above the threshold, else None."""
+    if probe is None:
+        return None
+    with _lock:
+        _stats["lookups"] += 1
+        if _matrix is None:
+            return None
+        sims = _matrix @ probe.vector
+        version = _version()
+        for idx in np.argsort(-sims):
+            if sims[idx] < FAQ_CACHE_THRESHOLD:
+                break
+            entry = _entries[idx]
+            if entry.sources == probe.sources and entry.ui_intent == probe.ui_intent and entry.version == version:
+                entry.hits += 1
+                entry.last_hit_at = time.time()
+                _stats["hits"] += 1
+                print(f"[FAQ_CACHE] hit sim={float(sims[idx]):.3f} entry={entry.id} q='{entry.question[:60]}'")
+                return entry.answer
+    return None
+
+
+def store(probe: Optional[FaqProbe], answer: str) -> None:
+    if probe is None or not answer:
+        return
+    version = _version()
+    with _lock:
+        # Same question + sources: replace instead of duplicating.
+        _entries[:] = [
+            e for e in _entries
+            if not (e.question == probe.question and e.sources == probe.sources and e.ui_intent == probe.ui_intent)
+        ]
+        _entries.append(FaqEntry(
+            id=uuid.uuid4().hex[:12],
+            question=probe.question,
+            vector=probe.vector,
+            sources=probe.sources,
+            ui_intent=probe.ui_intent,
+            answer=answer,
+            version=version,
+        ))
+        if len(_entries) > FAQ_CACHE_MAX_ENTRIES:
+            # Evict least recently used (last hit, else creation time).
+            _entries.sort(key=lambda e: e.last_hit_at or e.created_at)
+            del _entries[: len(_entries) - FAQ_CACHE_MAX_ENTRIES]
+        _stats["stores"] += 1
+        _rebuild_matrix()
+
+
+def list_entries() -> List[Dict[str, Any]]:
+    with _lock:
+        return [e.to_dict() for e in sorted(_entries, key=lambda e: -e.hits)]
+
+
+def purge(entry_id: Optional[str] = None) -> int:
+    """Remove one entry (by id) or all entries. Returns the number removed."""
+    with _lock:
+        before = len(_entries)
+        if entry_id is None:
+            _entries.clear()
+        else:
+            _entries[:] = [e for e in _entries if e.id != entry_id]
+        _rebuild_matrix()
+        return before - len(_entries)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, "entries": len(_entries), "threshold": FAQ_CACHE_THRESHOLD}
@@ -0,0 +1,200 @@
+"""
+Fused preprocessing: one JSON-mode LLM call instead of four round trips.
+
+A knowledge turn otherwise calls the LLM for normalize_input,
+classify_intent, rewrite_standalone_query and classify_food_items, each
+re-sending overlapping context. With FUSED_PREPROCESSING_ENABLED=1 the
+pipeline issues preprocess() once (on the llm pool, parallel to vision and
+speculative retrieval) and gets all four back:
+
+    {"normalized": "...", "intent": "recipe_from_ingredients" | null,
+     "intent_confidence": "high" | "low", "foods": "...",
+     "needs_clarification": "..." | null, "standalone_query": "..."}
+
+Each field is validated on its own (parse()); a missing or malformed field
+is simply absent. activate() makes the result visible to the current turn
+(ContextVar) and every consumer asks field(name, message) first: it gets
+the fused value, or None and then calls its own LLM prompt as before. A
+failed call therefore degrades to the split path field by field. Values
+are keyed on the raw and normalized message, so a consumer never picks up
+fields computed for a different message.
+
+Telemetry:
+  kursbot_fused_preprocessing_total{outcome}        ok | partial | failed
+  kursbot_fused_preprocessing_fields_total{field,source}  fused | fallback
+
+scripts/bench_preprocessing.py compares latency and tokens of both paths.
+"""
+import contextvars
+import json
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from app import deadline, metrics, single_flight
+from app.clients import client, MODEL
+
+CALLS_TOTAL = "kursbot_fused_preprocessing_total"
+FIELDS_TOTAL = "kursbot_fused_preprocessing_fields_total"
+
+metrics.describe(CALLS_TOTAL, "counter", "Fused preprocessing calls by outcome (ok, partial, failed).")
+metrics.describe(FIELDS_TOTAL, "counter",
+                 "Preprocessing fields consumed from the fused call (source=fused) or recomputed (source=fallback).")
+
+FIELDS = ("normalized_message", "intent", "food", "standalone_query")
+
+_NORMALIZE_MAX_LEN = 200  # longer messages are used as-is (same as normalize_input)
+_INTENTS = (None, "recipe_from_ingredients")
+
+
+class FusedResult:
+    """Validated fields of one fused call and the messages they belong to."""
+
+    def __init__(self, user_message: str, fields: Dict[str, Any]):
+        self.fields = fields
+        messages = {user_message}
+        if fields.get("normalized_message"):
+            messages.add(fields["normalized_message"])
+        self.messages: FrozenSet[str] = frozenset(messages)
+
+
+_active: "contextvars.ContextVar[Optional[FusedResult]]" = contextvars.ContextVar("fused_preprocessing", default=None)
+
+
+def _context_block(recent_messages: List[Dict[str, Any]], summary: Optional[str]) -> str:
+    parts = []
+    if summary:
+        parts.append(f"ZUSAMMENFASSUNG:\n{summary}")
+    if recent_messages:
+        lines = []
+        for msg in recent_messages[-4:]:
+            role = "User" if msg.get("role") == "user" else "Assistant"
+            lines.append(f"{role}: {msg.get('content', '')[:200]}")
+        parts.append("LETZTE NACHRICHTEN:\n" + "\n".join(lines))
+    return "\n\n".join(parts) if parts else "(keine Vorgeschichte)"
+
+
+def build_prompt(
+    user_message: str,
+    recent_messages: List[Dict[str, Any]],
+    is_new_conversation: bool,
+    summary: Optional[str] = None,
+) -> str:
+    """One prompt covering normalization, intent, food classification and query rewrite."""
+    context = _context_block([] if is_new_conversation else recent_messages, summary)
+    return f"""Du bereitest eine Nutzernachricht für einen Trennkost-Ernährungsberatungs-Bot vor.
+
+KONTEXT:
+{context}
+
+AKTUELLE NACHRICHT:
+{user_message}
+
+Erledige vier Aufgaben und antworte NUR mit JSON:
+
+1. "normalized": die Nachricht auf Deutsch, Tippfehler korrigiert, Zeitangaben als "X min",
+   deutsche Standardnamen für Lebensmittel ("chicken" → "Hähnchen"), Interpunktion bereinigt.
+   Kurze Follow-ups ("den Fisch", "ok", "egal") NICHT erweitern, nur Tippfehler korrigieren.
+
+2. "intent": "recipe_from_ingredients" NUR wenn der Nutzer ein Rezept aus vorhandenen Zutaten möchte
+   ("ich hab nur", "im Kühlschrank", "mach daraus", "was kann ich damit machen") UND mindestens ein
+   konkretes Lebensmittel genannt ist. Sonst null – insbesondere bei Compliance-Fragen ("Ist X ok?",
+   "Darf ich X?"), zeitlicher Trennung ("X vor Y"), Erklärungsfragen, Rezeptwünschen ohne Einschränkung,
+   Modifikations- oder Kombinationsfragen ("was passt dazu", "kann ich X dazu essen?").
+   "intent_confidence": "high" oder "low".
+
+3. "foods": erkannte Lebensmittel mit Kurskategorie (Protein, Komplexe Kohlenhydrate, Obst,
+   Gemüse / Salat, Fette / Öle, Zucker / Süßes); zusammengesetzte Gerichte in Standard-Komponenten
+   zerlegen (Pizza → Teig, Käse, Sauce). Bei Wartezeit-Fragen "Wartedauer", "zeitlicher Abstand" ergänzen.
+   Leerer String, wenn keine Lebensmittel vorkommen.
+   "needs_clarification": konkrete Rückfrage, falls ein Lebensmittel mehrdeutig ist und das die
+   Kombination ändert (z.B. "Burger – vegan oder mit Fleisch?"), sonst null.
+
+4. "standalone_query": die normalisierte Nachricht als eigenständige Suchanfrage, Bezüge auf den Kontext
+   aufgelöst. Falls sie bereits eigenständig ist, unverändert. Kurs-Begriffe als Synonyme ergänzen
+   (z.B. "Lebensmittelkombinationen", "Kohlenhydrate", "Protein", "Milieu", "Verdauung").
+
+{{"normalized": "...", "intent": "recipe_from_ingredients" | null, "intent_confidence": "high" | "low",
+ "foods": "...", "needs_clarification": "..." | null, "standalone_query": "..."}}"""
+
+
+def _text(value: Any) -> Optional[str]:
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def parse(raw: str, user_message: str) -> Dict[str, Any]:
+    """Validate each field of the JSON answer on its own; invalid fields are left out."""
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    fields: Dict[str, Any] = {}
+    normalized = _text(data.get("normalized"))
+    if len(user_message) > _NORMALIZE_MAX_LEN:
+        fields["normalized_message"] = user_message
+    elif normalized and len(normalized) <= len(user_message) * 3:
+        fields["normalized_message"] = normalized
+
+    if "intent" in data and data["intent"] in _INTENTS:
+        confidence = data.get("intent_confidence")
+        fields["intent"] = {
+            "intent": data["intent"],
+            "confidence": confidence if confidence in ("high", "low") else "low",
+        }
+
+    if isinstance(data.get("foods"), str):
+        fields["food"] = {
+            "classification": data["foods"].strip(),
+            "needs_clarification": _text(data.get("needs_clarification")),
+        }
+
+    query = _text(data.get("standalone_query"))
+    if query:
+        fields["standalone_query"] = query
+    return fields
+
+
+def preprocess(
+    user_message: str,
+    recent_messages: List[Dict[str, Any]],
+    is_new_conversation: bool,
+    summary: Optional[str] = None,
+) -> FusedResult:
+    """The fused call; never raises (a failed call yields an empty result → split path)."""
+    try:
+        response = single_flight.run(
+            "fused_preprocessing.preprocess",
+            deadline.bounded("fused_preprocessing.preprocess", client.chat.completions.create, 6),
+            model=MODEL,
+            messages=[{"role": "user", "content": build_prompt(
+                user_message, recent_messages, is_new_conversation, summary)}],
+            temperature=0.0,
+            max_tokens=400,
+            response_format={"type": "json_object"},
+        )
+        fields = parse(response.choices[0].message.content, user_message)
+    except Exception as e:
+        print(f"[PREPROCESS] fused call failed (non-fatal): {e}")
+        fields = {}
+
+    outcome = "ok" if len(fields) == len(FIELDS) else ("partial" if fields else "failed")
+    metrics.inc(CALLS_TOTAL, {"outcome": outcome})
+    if outcome != "ok":
+        print(f"[PREPROCESS] fused call {outcome}: missing {[f for f in FIELDS if f not in fields]}")
+    return FusedResult(user_message, fields)
+
+
+def activate(result: Optional[FusedResult]) -> None:
+    """Make result the current turn's fused fields (None: split path)."""
+    _active.set(result)
+
+
+def field(name: str, message: str) -> Any:
+    """The current turn's fused value for name if it was computed for message, else None."""
+    result = _active.get()
+    if result is None or message not in result.messages:
+        return None
+    value = result.fields.get(name)
+    metrics.inc(FIELDS_TOTAL, {"field": name, "source": "fused" if value is not None else "fallback"})
+    return value
@@ -8,6 +8,7 @@ import re
 import json
 from typing import List, Dict, Optional, Any
 
+from app import deadline, fused_preprocessing, single_flight
 from app.clients import client, MODEL
 
 
@@ -52,10 +53,19 @@ def normalize_input(
     - Short messages (<5 words) with recent context are marked as potential follow-ups
     - LLM preserves or minimally expands follow-ups with context reference
     - Prevents incorrect expansion of context-dependent messages like "den Fisch"
+
+    With fused preprocessing active, the fused call's value is used instead.
+    Skipped (message as-is) when the turn deadline is too close.
     """
+    fused = fused_preprocessing.field("normalized_message", user_message)
+    if fused is not None:
+        return fused
+
     # Skip normalization for very long messages (already well-formed)
     if len(user_message) > 200:
         return user_message
+    if not deadline.allows("normalize", "input_service.normalize_input", 5):
+        return user_message
 
     # Detect potential follow-up context
     is_potential_followup = False
@@ -109,12 +119,13 @@ Die aktuelle Nachricht ist wahrscheinlich eine Follow-up-Antwort. Bewahre ihre B
 **Normalisierte Nachricht:**"""
 
     try:
-        response = client.chat.completions.create(
+        response = single_flight.run(
+            "input_service.normalize_input",
+            deadline.bounded("input_service.normalize_input", client.chat.completions.create, 5, hedge=True),
             model=MODEL,
             messages=[{"role": "user", "content": normalization_prompt}],
             temperature=0.0,
             max_tokens=150,
-            timeout=5,
         )
         normalized = response.choices[0].message.content.strip()
 
@@ -140,7 +151,15 @@ def classify_food_items(user_message: str, standalone_query: str) -> Optional[Di
     """
     LLM-basierte Analyse von Lebensmitteln in der Frage.
     Extrahiert und klassifiziert automatisch in Kurskategorien.
+    Bei aktivem Fused Preprocessing wird dessen Ergebnis übernommen.
+    Wird übersprungen (None), wenn die Turn-Deadline zu knapp ist.
     """
+    fused = fused_preprocessing.field("food", user_message)
+    if fused is not None:
+        return fused
+    if not deadline.allows("food_classify", "input_service.classify_food_items", 5):
+        return None
+
     classification_prompt = f"""Analysiere die folgende Frage über Lebensmittel und klassifiziere die Komponenten
 in diese Kategorien aus unserem Ernährungskurs:
 - Protein (Fleisch, Fisch, Eier, Käse, Hülsenfrüchte)
@@ -176,12 +195,11 @@ Antworte im Format:
 """
 
     try:
-        response = client.chat.completions.create(
+        response = deadline.bounded("input_service.classify_food_items", client.chat.completions.create, 5)(
             model=MODEL,
             messages=[{"role": "user", "content": classification_prompt}],
             temperature=0.1,
             max_tokens=200,
-            timeout=5,
         )
         result = response.choices[0].message.content.strip()
 
@@ -209,9 +227,17 @@ def classify_intent(
 ) -> Optional[Dict]:
     """
     Parallel intent classifier. Recognizes cases that regex misses.
-    Timeout: 4s. On error: None (graceful degradation).
+    Timeout: 4s (less if the turn deadline is closer). On error or when the
+    deadline is too close: None (graceful degradation).
     Returns: {"intent": "recipe_from_ingredients" | null, "confidence": "high"|"low"}
+    Uses the fused preprocessing result when one is active for this message.
     """
+    fused = fused_preprocessing.field("intent", user_message)
+    if fused is not None:
+        return fused
+    if not deadline.allows("intent", "input_service.classify_intent", 4):
+        return None
+
     ctx_parts = []
     for msg in context_messages[-3:]:
         role = "User" if msg.get("role") == "user" else "Bot"
@@ -253,12 +279,13 @@ Antworte NUR mit JSON, kein Kommentar:
 {{"intent": "recipe_from_ingredients" | null, "confidence": "high" | "low"}}"""
 
     try:
-        response = client.chat.completions.create(
+        response = single_flight.run(
+            "input_service.classify_intent",
+            deadline.bounded("input_service.classify_intent", client.chat.completions.create, 4, hedge=True),
             model=MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
             max_tokens=40,
-            timeout=4,
             response_format={"type": "json_object"},
         )
         raw = response.choices[0].message.content.strip()
@@ -279,6 +306,76 @@ _REF_PATTERN = re.compile(
 )
 
 
+# Deterministic "does this message lean on the conversation?" check, used to
+# skip the LLM query rewrite for self-contained messages. Errs on the side of
+# rewriting: a needless rewrite costs latency, a missed one costs retrieval.
+_SHORT_FOLLOWUP_WORDS = 3
+_WORD_RE = re.compile(r"[A-Za-zÄÖÜäöüß][\w\-]*")
+_ELLIPSIS_START = re.compile(
+    r'^\s*(und|aber|oder|auch|also|sondern|statt|stattdessen|lieber|noch|'
+    r'was\s+(ist\s+)?mit|wie\s+(ist\s+es|wäre\s+es|sieht\s+es)\s+mit|und\s+wenn|was\s+wenn)\b',
+    re.IGNORECASE,
+)
+_CONTEXT_MARKERS = re.compile(
+    r'\b(auch|ebenfalls|stattdessen|genauso|trotzdem|vorhin|vorher|oben|eben|'
+    r'davon|dafür|dagegen|darin|darauf|daraus|darüber|dabei|danach|davor|dort|'
+    r'(genannt|erwähnt|empfohlen)\w*|(erste|zweite|dritte|letzte|vorherige)[nrsm]?|'
+    r'(nummer|option|variante)\s*\d)\b',
+    re.IGNORECASE,
+)
+_PRONOUNS = {"es", "ihn", "ihm", "ihr", "ihnen", "sie", "dasselbe", "derselbe", "dieselbe"}
+_DEMONSTRATIVES = {"das", "dies", "diese", "dieser", "dieses", "diesem", "diesen",
+                   "jene", "jener", "jenes", "jenem", "jenen", "solche", "solches", "solchen"}
+_ARTICLES = {"der", "die", "das", "den", "dem", "des"} | _DEMONSTRATIVES
+
+
+def context_reference_reason(user_message: str, last_messages: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Why user_message needs the conversation to be understood, or None if it
+    is self-contained (no LLM involved).
+
+    Signals: very short follow-up, elliptical start ("und Reis?", "was ist mit…"),
+    _REF_PATTERN words (dazu/damit/zusammen), context markers (auch, davon,
+    die erste, Option 2, …), free-standing pronouns/demonstratives ("ist das ok?")
+    and definite noun phrases naming something from the last messages ("den Fisch").
+    """
+    text = user_message.strip()
+    words = _WORD_RE.findall(text)
+    if len(words) <= _SHORT_FOLLOWUP_WORDS:
+        return "short"
+    if _ELLIPSIS_START.search(text):
+        return "ellipsis"
+    if _REF_PATTERN.search(text):
+        return "reference"
+    if _CONTEXT_MARKERS.search(text):
+        return "marker"
+
+    history = " ".join(m.get("content", "") for m in last_messages[-4:]).lower()
+    for i, word in enumerate(words):
+        lower = word.lower()
+        nxt = words[i + 1] if i + 1 < len(words) else ""
+        if lower in _PRONOUNS:
+            if lower == "sie" and word == "Sie" and i > 0:
+                continue  # formal address
+            if lower == "es" and ("gibt" in (words[i - 1].lower() if i else "", nxt.lower())):
+                continue  # "gibt es" / "es gibt"
+            return "pronoun"
+        if lower in _ARTICLES:
+            if nxt[:1].isupper():                  # article + noun
+                if nxt.lower() in history:
+                    return "anaphora"              # "den Fisch" after a fish dish
+                if lower in _DEMONSTRATIVES and lower != "das":
+                    return "demonstrative"         # "diese Variante"
+                continue                           # "das Zwei-Stufen-Frühstück"
+            if lower in _DEMONSTRATIVES:
+                return "demonstrative"             # "ist das ok?"
+    return None
+
+
+def is_self_contained(user_message: str, last_messages: List[Dict[str, Any]]) -> bool:
+    return context_reference_reason(user_message, last_messages) is None
+
+
 def _extract_foods_ontology(text: str) -> List[str]:
     """
     Fast ontology-based food extraction from text.
@@ -377,7 +474,7 @@ Falls keine Zutaten erwähnt: leere Antwort."""
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
             max_tokens=80,
-            timeout=4,
+            timeout=deadline.timeout(4),
         )
         raw = response.choices[0].message.content.strip()
         if not raw:
@@ -0,0 +1,354 @@
+"""
+LLM call accounting.
+
+app.clients wraps the OpenAI client in AccountingClient. Every
+chat.completions.create / embeddings.create call is attributed to its call
+site (the calling function, e.g. "input_service.normalize_input") and
+recorded with latency, prompt/completion tokens and outcome (ok, timeout,
+error, aborted).
+
+Streams are wrapped too: time to first chunk and total time are recorded
+when the stream is exhausted or closed. openai 1.3 streams carry no usage,
+so their tokens are estimated with token_budget.count_tokens.
+
+Data goes to three places:
+  - rolling per-site windows (LLM_CALLS_WINDOW_S) → GET /api/v1/admin/llm-calls
+  - app.metrics histograms/counters → GET /api/v1/metrics
+  - a periodic "[LLM_CALLS]" summary log (LLM_CALLS_LOG_INTERVAL_S, 0 = off)
+"""
+import contextvars
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from app import metrics
+
+CALL_SECONDS = "kursbot_llm_call_duration_seconds"
+FIRST_CHUNK_SECONDS = "kursbot_llm_first_chunk_seconds"
+CALLS_TOTAL = "kursbot_llm_calls_total"
+TOKENS_TOTAL = "kursbot_llm_tokens_total"
+
+metrics.describe(CALL_SECONDS, "histogram", "Latency of one LLM/embedding API call by call site.")
+metrics.describe(FIRST_CHUNK_SECONDS, "histogram", "Time to first streamed chunk by call site.")
+metrics.describe(CALLS_TOTAL, "counter", "LLM/embedding API calls by call site and outcome.")
+metrics.describe(TOKENS_TOTAL, "counter", "Prompt/completion tokens by call site (streams: estimated).")
+
+_SKIP_MODULES = ("app.llm_accounting", "app.single_flight", "app.circuit_breaker", "app.deadline", "openai", "httpx",
+                 "contextlib")
+_WINDOW_MAXLEN = 5000
+
+
+@dataclass
+class CallRecord:
+    at: float
+    site: str
+    kind: str
+    model: str
+    seconds: float
+    outcome: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    first_chunk_seconds: Optional[float] = None
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class CallLedger:
+    """Rolling per-site call records plus lifetime totals."""
+
+    def __init__(self, window_s: float = 900.0):
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        self._windows: Dict[str, Deque[CallRecord]] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._since_log = 0
+
+    def record(self, rec: CallRecord) -> None:
+        with self._lock:
+            window = self._windows.setdefault(rec.site, deque(maxlen=_WINDOW_MAXLEN))
+            window.append(rec)
+            totals = self._totals.setdefault(rec.site, {
+                "calls": 0, "errors": 0, "timeouts": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0,
+            })
+            totals["calls"] += 1
+            totals["errors"] += rec.outcome == "error"
+            totals["timeouts"] += rec.outcome == "timeout"
+            totals["prompt_tokens"] += rec.prompt_tokens
+            totals["completion_tokens"] += rec.completion_tokens
+            totals["seconds"] += rec.seconds
+            self._since_log += 1
+
+        labels = {"site": rec.site, "kind": rec.kind}
+        metrics.observe(CALL_SECONDS, rec.seconds, labels)
+        if rec.first_chunk_seconds is not None:
+            metrics.observe(FIRST_CHUNK_SECONDS, rec.first_chunk_seconds, labels)
+        metrics.inc(CALLS_TOTAL, {**labels, "outcome": rec.outcome})
+        if rec.prompt_tokens:
+            metrics.inc(TOKENS_TOTAL, {**labels, "type": "prompt"}, rec.prompt_tokens)
+        if rec.completion_tokens:
+            metrics.inc(TOKENS_TOTAL, {**labels, "type": "completion"}, rec.completion_tokens)
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_s
+        for window in self._windows.values():
+            while window and window[0].at < cutoff:
+                window.popleft()
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-site stats for the rolling window (sorted by total latency) + lifetime totals."""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            windows = {site: list(w) for site, w in self._windows.items()}
+            totals = {site: dict(t) for site, t in self._totals.items()}
+
+        sites = []
+        for site, recs in windows.items():
+            latencies = sorted(r.seconds for r in recs)
+            first_chunks = sorted(r.first_chunk_seconds for r in recs if r.first_chunk_seconds is not None)
+            sites.append({
+                "site": site,
+                "kind": recs[-1].kind if recs else None,
+                "calls": len(recs),
+                "errors": sum(r.outcome == "error" for r in recs),
+                "timeouts": sum(r.outcome == "timeout" for r in recs),
+                "total_seconds": round(sum(latencies), 3),
+                "p50_ms": _ms(_percentile(latencies, 0.5)),
+                "p95_ms": _ms(_percentile(latencies, 0.95)),
+                "first_chunk_p50_ms": _ms(_percentile(first_chunks, 0.5)),
+                "prompt_tokens": sum(r.prompt_tokens for r in recs),
+                "completion_tokens": sum(r.completion_tokens for r in recs),
+            })
+        sites.sort(key=lambda s: -s["total_seconds"])
+        return {"window_s": self.window_s, "sites": sites, "lifetime": totals}
+
+    def log_summary(self) -> None:
+        with self._lock:
+            if not self._since_log:
+                return
+            self._since_log = 0
+        data = self.summary()
+        print(f"[LLM_CALLS] last {int(data['window_s'])}s:")
+        for s in data["sites"]:
+            if not s["calls"]:
+                continue
+            print(f"  {s['site']:45} calls={s['calls']:4d} p50={s['p50_ms']}ms p95={s['p95_ms']}ms "
+                  f"tok={s['prompt_tokens']}+{s['completion_tokens']} "
+                  f"err={s['errors']} timeout={s['timeouts']}")
+
+    def reset(self) -> int:
+        with self._lock:
+            n = sum(len(w) for w in self._windows.values())
+            self._windows.clear()
+            self._totals.clear()
+            self._since_log = 0
+            return n
+
+
+def _ms(seconds: Optional[float]) -> Optional[int]:
+    return None if seconds is None else int(round(seconds * 1000))
+
+
+ledger = CallLedger()
+_log_thread: Optional[threading.Thread] = None
+_log_interval_s = 0.0
+
+
+def _start_log_thread() -> None:
+    global _log_thread
+    if _log_thread is not None or _log_interval_s <= 0:
+        return
+
+    def _loop() -> None:
+        while True:
+            time.sleep(_log_interval_s)
+            try:
+                ledger.log_summary()
+            except Exception as exc:  # never let logging kill the thread
+                print(f"[LLM_CALLS] summary failed: {exc}")
+
+    _log_thread = threading.Thread(target=_loop, name="llm-calls-log", daemon=True)
+    _log_thread.start()
+
+
+# ── Call-site detection + token helpers ───────────────────────────────
+
+_attributed_site: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("llm_call_site", default=None)
+
+
+@contextmanager
+def attributed_to(site: str) -> Iterator[None]:
+    """Attribute calls made inside to site (for calls issued from pool threads)."""
+    token = _attributed_site.set(site)
+    try:
+        yield
+    finally:
+        _attributed_site.reset(token)
+
+
+def call_site() -> str:
+    """'module.function' of the first caller outside this module / the SDK."""
+    site = _attributed_site.get()
+    if site is not None:
+        return site
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_SKIP_MODULES):
+            name = module[4:] if module.startswith("app.") else module
+            return f"{name}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _estimate_tokens(text: str) -> int:
+    from app.token_budget import count_tokens
+    return count_tokens(text)
+
+
+def _prompt_text(kwargs: Dict[str, Any]) -> str:
+    if "messages" in kwargs:
+        parts = []
+        for m in kwargs.get("messages") or []:
+            content = m.get("content") if isinstance(m, dict) else None
+            if isinstance(content, str):
+                parts.append(content)
+            elif isinstance(content, list):  # vision: text parts only
+                parts.extend(p.get("text", "") for p in content if isinstance(p, dict))
+        return "\n".join(parts)
+    inp = kwargs.get("input")
+    return "\n".join(inp) if isinstance(inp, list) else str(inp or "")
+
+
+def _outcome(exc: BaseException) -> str:
+    import openai
+    return "timeout" if isinstance(exc, openai.APITimeoutError) else "error"
+
+
+# ── Proxy ─────────────────────────────────────────────────────────────
+
+class _AccountedStream:
+    """Iterates the wrapped stream and records the call when it ends."""
+
+    def __init__(self, inner, site: str, model: str, started: float, prompt_tokens: int):
+        self._inner = inner
+        self._site = site
+        self._model = model
+        self._started = started
+        self._prompt_tokens = prompt_tokens
+        self._first_chunk: Optional[float] = None
+        self._chars: List[str] = []
+        self._done = False
+
+    def __iter__(self) -> Iterator[Any]:
+        outcome = "aborted"
+        try:
+            for chunk in self._inner:
+                if self._first_chunk is None:
+                    self._first_chunk = time.perf_counter() - self._started
+                for choice in getattr(chunk, "choices", None) or []:
+                    text = getattr(getattr(choice, "delta", None), "content", None)
+                    if text:
+                        self._chars.append(text)
+                yield chunk
+            outcome = "ok"
+        except Exception as exc:
+            outcome = _outcome(exc)
+            raise
+        finally:
+            self._finish(outcome)
+
+    def _finish(self, outcome: str) -> None:
+        if self._done:
+            return
+        self._done = True
+        ledger.record(CallRecord(
+            at=time.time(), site=self._site, kind="chat_stream", model=self._model,
+            seconds=time.perf_counter() - self._started, outcome=outcome,
+            prompt_tokens=self._prompt_tokens,
+            completion_tokens=_estimate_tokens("".join(self._chars)) if self._chars else 0,
+            first_chunk_seconds=self._first_chunk,
+        ))
+
+    def close(self) -> None:
+        # openai 1.3 Stream has no close(); closing its HTTP response aborts the generation
+        close = getattr(self._inner, "close", None) or getattr(getattr(self._inner, "response", None), "close", None)
+        if close:
+            close()
+        self._finish("aborted")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class _AccountedEndpoint:
+    def __init__(self, inner, kind: str):
+        self._inner = inner
+        self._kind = kind
+
+    def create(self, *args, **kwargs):
+        site = call_site()
+        model = kwargs.get("model", "")
+        started = time.perf_counter()
+        _start_log_thread()
+        try:
+            result = self._inner.create(*args, **kwargs)
+        except Exception as exc:
+            ledger.record(CallRecord(
+                at=time.time(), site=site, kind=self._kind, model=model,
+                seconds=time.perf_counter() - started, outcome=_outcome(exc),
+            ))
+            raise
+
+        if kwargs.get("stream"):
+            return _AccountedStream(result, site, model, started, _estimate_tokens(_prompt_text(kwargs)))
+
+        usage = getattr(result, "usage", None)
+        ledger.record(CallRecord(
+            at=time.time(), site=site, kind=self._kind, model=model,
+            seconds=time.perf_counter() - started, outcome="ok",
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        ))
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class _Namespace:
+    def __init__(self, inner, **endpoints):
+        self._inner = inner
+        self.__dict__.update(endpoints)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class AccountingClient:
+    """OpenAI client proxy: chat.completions.create and embeddings.create are accounted."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self.chat = _Namespace(inner.chat, completions=_AccountedEndpoint(inner.chat.completions, "chat"))
+        self.embeddings = _AccountedEndpoint(inner.embeddings, "embedding")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+def wrap(inner, window_s: float = 900.0, log_interval_s: float = 0.0) -> AccountingClient:
+    """Wrap an OpenAI client and configure the shared ledger."""
+    global _log_interval_s
+    ledger.window_s = window_s
+    _log_interval_s = log_interval_s
+    return AccountingClient(inner)
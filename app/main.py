@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.requests import Request
 from pydantic import BaseModel
@@ -19,6 +19,9 @@ from app.database import (
 from app.migrations import run_migrations
 from app.auth import router as auth_router
 from app.entitlements import router as entitlements_router
+from app.admin import router as admin_router
+from app import async_database, executors, metrics
+from app.admission import AdmissionMiddleware
 from app.clients import MODEL, TOP_K, LAST_N, SUMMARY_THRESHOLD
 from app.chat_service import handle_chat, handle_chat_stream_async, normalize_ui_intent
 from app.eat_now_session import EatNowSessionClientError, build_session_payload
@@ -35,6 +38,12 @@ async def startup_event():
     init_db()
     run_migrations()
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    async_database.shutdown()
+    executors.shutdown()
+
 origins = [
     "http://localhost:4321",   # Astro dev
     "http://localhost:5173",   # Vite dev (RicsSite)
@@ -44,16 +53,21 @@ origins = [
     "https://lebensessenz.de", # production
 ]
 
+# inside CORS so rejections still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 app.include_router(auth_router)
 app.include_router(entitlements_router)
+app.include_router(admin_router)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -103,6 +117,19 @@ async def eat_now_session_client_error_handler(request: Request, exc: EatNowSess
         },
     )
 
+@app.exception_handler(executors.ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: executors.ExecutorSaturated):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after_s)},
+        content={
+            "error": {
+                "code": "OVERLOADED",
+                "message": "Server is busy, please retry shortly.",
+            }
+        },
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
@@ -208,6 +235,11 @@ class ConfigResponse(BaseModel):
 def health():
     return {"ok": True}
 
+@app.get("/api/v1/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition: per-stage and per-turn latency histograms."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/config", response_model=ConfigResponse)
 @app.get("/api/v1/config", response_model=ConfigResponse)
 def get_config():
@@ -262,16 +294,26 @@ async def chat_stream(request: ChatRequest):
     Yields Server-Sent Events:
       event: meta   data: {"conversationId":"..."}
       event: status data: {"message":"..."}      (optional, before first delta)
-      event: delta  data: {"text":"..."}         (one per token)
+      event: verdict data: {"conversationId":"...","mode":"...","dishes":[...],"ranking":[...]}
+                                                 (FOOD_ANALYSIS / MENU_* only, as soon as the engine decided)
+      event: delta  data: {"text":"..."}         (answer text; concatenate in order)
       event: final  data: {"conversationId":"...","answer":"...","sources":[...]}
       event: error  data: {"message":"..."}      (on failure)
 
+    Deltas are coalesced (app/stream_deltas.py): the first token is sent
+    immediately, then one delta per STREAM_DELTA_FLUSH_MS or per
+    STREAM_DELTA_FLUSH_CHARS buffered characters, whichever comes first; the
+    rest is flushed before final. A delta may hold several tokens, and with
+    STREAM_DELTA_MODE=token it is one per LLM chunk again.
+
     For the intent-start shortcut (message=="" + valid intent):
     emits meta + final only (no deltas or status events).
     """
     message = request.message.strip()
     if not message and not request.intent:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
+    if executors.cpu.saturated():
+        raise executors.ExecutorSaturated(executors.cpu.name)
 
     gen = handle_chat_stream_async(
         request.conversationId,
@@ -0,0 +1,274 @@
+"""
+In-process metrics: per-stage latency spans, counters and gauges.
+
+A chat turn opens a TurnMetrics (handle_chat, the stream handlers). Pipeline
+code wraps steps in `with span("retrieval"):`; durations are buffered on the
+turn and flushed into histograms when the turn ends, so every stage carries
+the final chat mode and ui intent as labels even if it ran before mode
+detection. Spans outside a turn are recorded immediately with mode="none".
+
+The current turn lives in a ContextVar. Thread pools do not inherit it, so
+work submitted to an executor is wrapped with bind(fn) (or turn.bind(fn)).
+
+render_prometheus() exposes everything in Prometheus text format
+(GET /api/v1/metrics); no client library required.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = "kursbot_stage_duration_seconds"
+TURN_SECONDS = "kursbot_turn_duration_seconds"
+TURNS_TOTAL = "kursbot_turns_total"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}  # name → (type, help)
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: Sequence[float] = None) -> None:
+        with self._lock:
+            self._help[name] = (kind, help_text)
+            if buckets is not None:
+                self._buckets[name] = tuple(buckets)
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            hist.observe(value)
+
+    def inc(self, name: str, labels: Dict[str, Any], value: float = 1.0) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain-dict copy (tests, admin views)."""
+        with self._lock:
+            return {
+                "histograms": {
+                    name: {key: {"count": h.count, "sum": h.total, "buckets": list(zip(h.buckets, h.counts))}
+                           for key, h in series.items()}
+                    for name, series in self._histograms.items()
+                },
+                "counters": {name: dict(series) for name, series in self._counters.items()},
+                "gauges": {name: dict(series) for name, series in self._gauges.items()},
+            }
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            names = sorted(set(self._histograms) | set(self._counters) | set(self._gauges))
+            for name in names:
+                if name in self._histograms:
+                    kind = "histogram"
+                elif name in self._counters:
+                    kind = "counter"
+                else:
+                    kind = "gauge"
+                help_text = self._help.get(name, (kind, ""))[1]
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "histogram":
+                    for key, hist in sorted(self._histograms[name].items()):
+                        cumulative = 0
+                        for bound, count in zip(hist.buckets, hist.counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{_fmt_labels(key, le=_fmt_float(bound))} {cumulative}")
+                        lines.append(f"{name}_bucket{_fmt_labels(key, le='+Inf')} {hist.count}")
+                        lines.append(f"{name}_sum{_fmt_labels(key)} {_fmt_float(hist.total)}")
+                        lines.append(f"{name}_count{_fmt_labels(key)} {hist.count}")
+                else:
+                    series = self._counters[name] if kind == "counter" else self._gauges[name]
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{_fmt_labels(key)} {_fmt_float(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, "none" if v is None else str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_float(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+_registry = _Registry()
+_registry.describe(STAGE_SECONDS, "histogram", "Duration of one chat pipeline stage.")
+_registry.describe(TURN_SECONDS, "histogram", "Wall time of a whole chat turn.")
+_registry.describe(TURNS_TOTAL, "counter", "Chat turns by outcome.")
+
+describe = _registry.describe
+observe = _registry.observe
+inc = _registry.inc
+set_gauge = _registry.set_gauge
+snapshot = _registry.snapshot
+render_prometheus = _registry.render
+reset = _registry.reset
+
+
+# ── Turn + spans ──────────────────────────────────────────────────────
+
+class TurnMetrics:
+    """Stage timings of one chat turn; labels are resolved at finish()."""
+
+    def __init__(self, path: str, ui_intent: Optional[str] = None):
+        self.path = path
+        self.ui_intent = ui_intent
+        self.mode: Optional[str] = None
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            if self._finished:
+                _observe_stage(stage, seconds, self.mode, self.ui_intent)
+                return
+            self.stages.append((stage, seconds))
+
+    def set_mode(self, mode: Any) -> None:
+        self.mode = getattr(mode, "value", mode)
+
+    def bind(self, fn: Callable) -> Callable:
+        """fn wrapped so it runs with this turn as the current turn (for executors)."""
+        def _bound(*args, **kwargs):
+            token = _current.set(self)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current.reset(token)
+        return _bound
+
+    def finish(self, outcome: str = "ok") -> None:
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            stages = list(self.stages)
+        labels = {"path": self.path, "mode": self.mode, "ui_intent": self.ui_intent}
+        for stage, seconds in stages:
+            _observe_stage(stage, seconds, self.mode, self.ui_intent)
+        observe(TURN_SECONDS, time.perf_counter() - self.started, labels)
+        inc(TURNS_TOTAL, {**labels, "outcome": outcome})
+
+
+_current: "contextvars.ContextVar[Optional[TurnMetrics]]" = contextvars.ContextVar("turn_metrics", default=None)
+
+
+def _observe_stage(stage: str, seconds: float, mode: Optional[str], ui_intent: Optional[str]) -> None:
+    observe(STAGE_SECONDS, seconds, {"stage": stage, "mode": mode, "ui_intent": ui_intent})
+
+
+def current_turn() -> Optional[TurnMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def turn(path: str, ui_intent: Optional[str] = None) -> Iterator[TurnMetrics]:
+    """Current-turn scope for synchronous handlers (handle_chat)."""
+    t = TurnMetrics(path, ui_intent)
+    token = _current.set(t)
+    outcome = "ok"
+    try:
+        yield t
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _current.reset(token)
+        t.finish(outcome)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add a measured duration to the current turn (or record it directly)."""
+    t = _current.get()
+    if t is not None:
+        t.record(stage, seconds)
+    else:
+        _observe_stage(stage, seconds, None, None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block as `stage` (monotonic clock)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0)
+
+
+def set_mode(mode: Any) -> None:
+    t = _current.get()
+    if t is not None:
+        t.set_mode(mode)
+
+
+def bind(fn: Callable) -> Callable:
+    """fn bound to the current turn (no-op wrapper outside a turn)."""
+    t = _current.get()
+    return t.bind(fn) if t is not None else fn
+
+
+def timed(stage: str, fn: Callable) -> Callable:
+    """fn bound to the current turn and timed as `stage` (for executor submits)."""
+    def _timed(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+    return bind(_timed)
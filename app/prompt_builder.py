@@ -4,7 +4,7 @@ Prompt builder for the chat service.
 All prompt templates and assembly logic extracted from the monolithic handle_chat().
 SYSTEM_INSTRUCTIONS lives here; mode-specific builders compose the user-side prompt.
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 from app.breakfast_policy import (
     build_breakfast_block_lines,
@@ -16,6 +16,14 @@ from app.breakfast_policy import (
 from app.grounding_policy import FALLBACK_SENTENCE
 from trennkost.models import AnalysisMode, TrennkostResult, Verdict, TrafficLight
 from trennkost.formatter import format_results_for_llm
+from app.token_budget import (
+    BudgetReport,
+    PromptParts,
+    PromptSection,
+    count_tokens,
+    course_section,
+    fit_to_budget,
+)
 
 SYSTEM_INSTRUCTIONS = f"""Du bist ein kurs-assistierender Bot.
 
@@ -95,22 +103,33 @@ def build_base_context(
     last_messages: List[Dict[str, Any]],
 ) -> List[str]:
     """Build conversation context block (summary + recent messages)."""
-    parts = []
-    if summary:
-        parts.append(f"KONVERSATIONS-ZUSAMMENFASSUNG:\n{summary}\n")
-
-    # Exclude the current message (last one) from history
-    history = last_messages[:-1] if last_messages else []
+    parts = build_summary_block(summary)
+    history = build_history_lines(last_messages)
     if history:
         parts.append("LETZTE NACHRICHTEN:")
-        for msg in history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            parts.append(f"{role}: {msg['content']}")
+        parts.extend(history)
         parts.append("")
 
     return parts
 
 
+def build_summary_block(summary: Optional[str]) -> List[str]:
+    """Rolling summary block, or [] if there is no summary yet."""
+    if not summary:
+        return []
+    return [f"KONVERSATIONS-ZUSAMMENFASSUNG:\n{summary}\n"]
+
+
+def build_history_lines(last_messages: List[Dict[str, Any]]) -> List[str]:
+    """One line per previous message (oldest first), without header."""
+    # Exclude the current message (last one) from history
+    history = last_messages[:-1] if last_messages else []
+    return [
+        f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+        for msg in history
+    ]
+
+
 def build_engine_block(
     trennkost_results: List[TrennkostResult],
     is_breakfast: bool = False,
@@ -594,22 +613,65 @@ def build_prompt_recipe_request(
 
 # ── Full prompt assembly ──────────────────────────────────────────────
 
+_SYSTEM_TOKENS: Optional[int] = None
+
+
+def _system_tokens() -> int:
+    """Token count of SYSTEM_INSTRUCTIONS (constant, counted once)."""
+    global _SYSTEM_TOKENS
+    if _SYSTEM_TOKENS is None:
+        _SYSTEM_TOKENS = count_tokens(SYSTEM_INSTRUCTIONS)
+    return _SYSTEM_TOKENS
+
+
 def assemble_prompt(
     parts: List[str],
     course_context: str,
     user_message: str,
     answer_instructions: str,
     needs_clarification: Optional[str] = None,
+    max_tokens: Optional[int] = None,
 ) -> str:
-    """Assemble the complete user-side prompt from all blocks."""
-    all_parts = list(parts)
+    """Assemble the complete user-side prompt from all blocks (token-budgeted)."""
+    prompt, report = assemble_prompt_with_report(
+        parts, course_context, user_message, answer_instructions,
+        needs_clarification, max_tokens,
+    )
+    trimmed = f" trimmed={','.join(report.trimmed)}" if report.trimmed else ""
+    print(f"[PROMPT_BUDGET] {report.format()}{trimmed}")
+    return prompt
 
-    all_parts.append(f"KURS-SNIPPETS (FAKTENBASIS):\n{course_context}\n")
-    all_parts.append(f"AKTUELLE FRAGE:\n{user_message}\n")
 
+def assemble_prompt_with_report(
+    parts: List[str],
+    course_context: str,
+    user_message: str,
+    answer_instructions: str,
+    needs_clarification: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+) -> Tuple[str, BudgetReport]:
+    """
+    Assemble the prompt and return it with per-section token counts.
+
+    parts built by _build_prompt_parts carry their sections (PromptParts), so
+    history/summary can be trimmed; a plain list is kept as one fixed block.
+    Course snippets are trimmed by whole chunks from the lowest rank upwards.
+    Question, clarification and answer instructions are never trimmed.
+    SYSTEM_INSTRUCTIONS go with every completion, so they count against the
+    budget as the fixed "system" section (not part of the returned prompt).
+    """
+    sections = [s.copy() for s in getattr(parts, "sections", None) or []]
+    if not sections and parts:
+        sections = [PromptSection(name="context", units=list(parts))]
+
+    sections.append(course_section(course_context))
+    sections.append(PromptSection(name="question", units=[f"AKTUELLE FRAGE:\n{user_message}\n"]))
     if needs_clarification:
-        all_parts.extend(build_clarification_block(needs_clarification))
-
-    all_parts.append(answer_instructions)
-
-    return "\n".join(all_parts)
+        sections.append(PromptSection(
+            name="clarification", units=build_clarification_block(needs_clarification),
+        ))
+    sections.append(PromptSection(name="instructions", units=[answer_instructions]))
+
+    report = fit_to_budget(sections, max_tokens, fixed={"system": _system_tokens()})
+    all_parts = [line for s in sections for line in s.lines()]
+    return "\n".join(all_parts), report
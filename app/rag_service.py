@@ -5,6 +5,8 @@ Handles vector search, context building, query rewriting and alias expansion.
 """
 import json
 import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Any
@@ -12,27 +14,88 @@ from typing import List, Dict, Tuple, Optional, Any
 from app.clients import (
     client, col,
     MODEL, EMBED_MODEL,
-    TOP_K, MAX_CONTEXT_CHARS, DISTANCE_THRESHOLD, DEBUG_RAG,
+    TOP_K, MAX_CONTEXT_CHARS, MAX_CONTEXT_TOKENS, DISTANCE_THRESHOLD, DEBUG_RAG,
+    CONTEXT_PACKING, QUERY_REWRITE_SKIP_SELF_CONTAINED,
 )
+from app import deadline, fused_preprocessing, metrics, single_flight
+from app.input_service import context_reference_reason
+from app.context_packing import pack_pieces
+from app.token_budget import count_tokens
+
+
+REWRITES_TOTAL = "kursbot_query_rewrite_total"
+
+metrics.describe(REWRITES_TOTAL, "counter",
+                 "rewrite_standalone_query decisions (rewritten, fused, skipped_no_context, skipped_self_contained, "
+                 "skipped_deadline, failed).")
+
+_EMBED_MEMO_SIZE = 256
+_embed_memo: "OrderedDict[str, List[float]]" = OrderedDict()
+_embed_memo_lock = threading.Lock()
 
 
 def embed_one(text: str) -> List[float]:
-    """Generate embedding for text."""
-    resp = client.embeddings.create(model=EMBED_MODEL, input=[text])
-    return resp.data[0].embedding
+    """
+    Generate embedding for text.
+
+    The last few query embeddings are memoized so later pipeline steps (e.g.
+    the FAQ cache) can reuse the vector retrieval already computed.
+    """
+    with _embed_memo_lock:
+        vec = _embed_memo.get(text)
+        if vec is not None:
+            _embed_memo.move_to_end(text)
+            return vec
+    with metrics.span("embedding"):
+        resp = single_flight.run("rag_service.embed_one", client.embeddings.create,
+                                 model=EMBED_MODEL, input=[text])
+    vec = resp.data[0].embedding
+    with _embed_memo_lock:
+        _embed_memo[text] = vec
+        while len(_embed_memo) > _EMBED_MEMO_SIZE:
+            _embed_memo.popitem(last=False)
+    return vec
+
+
+def cached_embedding(text: str) -> Optional[List[float]]:
+    """Embedding of text if embed_one computed it recently; never calls the API."""
+    with _embed_memo_lock:
+        return _embed_memo.get(text)
+
+
+def build_context(
+    docs: List[str],
+    metas: List[Dict],
+    max_tokens: Optional[int] = None,
+    query: Optional[str] = None,
+) -> str:
+    """
+    Build context string from retrieved documents.
 
+    With a query (and CONTEXT_PACKING on), chunks are first packed to their
+    best sentence windows with same-path overlap removed (app.context_packing).
+    Pieces are added in rank order until either MAX_CONTEXT_CHARS or the
+    token cap (max_tokens, default MAX_CONTEXT_TOKENS; 0 = no token cap) is hit.
+    """
+    max_tokens = MAX_CONTEXT_TOKENS if max_tokens is None else max_tokens
+    if query and CONTEXT_PACKING:
+        labelled = pack_pieces(docs, metas, query)
+    else:
+        labelled = [(f"[{meta.get('path','?')}#{meta.get('chunk','?')}]", doc) for doc, meta in zip(docs, metas)]
 
-def build_context(docs: List[str], metas: List[Dict]) -> str:
-    """Build context string from retrieved documents."""
     parts = []
     total = 0
-    for doc, meta in zip(docs, metas):
-        label = f"[{meta.get('path','?')}#{meta.get('chunk','?')}]"
+    total_tokens = 0
+    for label, doc in labelled:
         piece = f"{label}\n{doc}\n"
         if total + len(piece) > MAX_CONTEXT_CHARS:
             break
+        piece_tokens = count_tokens(piece) if max_tokens else 0
+        if max_tokens and total_tokens + piece_tokens > max_tokens:
+            break
         parts.append(piece)
         total += len(piece)
+        total_tokens += piece_tokens
     return "\n".join(parts).strip()
 
 
@@ -106,11 +169,12 @@ def generalize_query(query: str) -> str:
 def retrieve_course_snippets(query: str) -> Tuple[List[str], List[Dict], List[float]]:
     """Retrieve relevant course snippets using vector search."""
     qvec = embed_one(query)
-    res = col.query(
-        query_embeddings=[qvec],
-        n_results=TOP_K,
-        include=["documents", "metadatas", "distances"],
-    )
+    with metrics.span("chroma"):
+        res = col.query(
+            query_embeddings=[qvec],
+            n_results=TOP_K,
+            include=["documents", "metadatas", "distances"],
+        )
 
     docs = res.get("documents", [[]])[0]
     metas = res.get("metadatas", [[]])[0]
@@ -245,10 +309,34 @@ def rewrite_standalone_query(
     """
     Rewrite user message into a standalone query for retrieval.
     Uses summary + last messages to resolve references.
+
+    Self-contained messages (input_service.context_reference_reason is None)
+    are returned unchanged without an LLM call; course synonyms are still
+    added afterwards by expand_alias_terms. Messages that do need a rewrite
+    take the fused preprocessing query when one is active; without one, the
+    rewrite is skipped too when the turn deadline is too close. A rewrite
+    that fails (timeout, LLM unavailable) falls back to the message as-is.
     """
     if not summary and not last_messages:
+        metrics.inc(REWRITES_TOTAL, {"decision": "skipped_no_context"})
         return user_message
 
+    if QUERY_REWRITE_SKIP_SELF_CONTAINED:
+        reason = context_reference_reason(user_message, last_messages)
+        if reason is None:
+            metrics.inc(REWRITES_TOTAL, {"decision": "skipped_self_contained"})
+            print(f"[RAG] Query rewrite skipped (self-contained): '{user_message[:60]}'")
+            return user_message
+        print(f"[RAG] Query rewrite needed ({reason}): '{user_message[:60]}'")
+    fused = fused_preprocessing.field("standalone_query", user_message)
+    if fused is not None:
+        metrics.inc(REWRITES_TOTAL, {"decision": "fused"})
+        return fused
+    if not deadline.allows("query_rewrite", "rag_service.rewrite_standalone_query", 5):
+        metrics.inc(REWRITES_TOTAL, {"decision": "skipped_deadline"})
+        return user_message
+    metrics.inc(REWRITES_TOTAL, {"decision": "rewritten"})
+
     context_parts = []
     if summary:
         context_parts.append(f"ZUSAMMENFASSUNG:\n{summary}\n")
@@ -271,11 +359,17 @@ Antworte NUR mit der umgeschriebenen Anfrage, ohne Erklärung.
 
 STANDALONE QUERY:"""
 
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0,
-        max_tokens=200,
-    )
-
-    return response.choices[0].message.content.strip()
+    try:
+        response = single_flight.run(
+            "rag_service.rewrite_standalone_query",
+            deadline.bounded("rag_service.rewrite_standalone_query", client.chat.completions.create, 5, hedge=True),
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+            max_tokens=200,
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:  # timeout, exhausted hedge, LLMUnavailable, API error
+        metrics.inc(REWRITES_TOTAL, {"decision": "failed"})
+        print(f"[RAG] Query rewrite failed (non-fatal, using message as-is): {e}")
+        return user_message
@@ -9,6 +9,7 @@ Handles the RECIPE_FROM_INGREDIENTS flow:
 import json
 from typing import List, Dict, Optional
 
+from app import deadline
 from app.clients import client, MODEL
 from app.recipe_service import find_recipes_by_ingredient_overlap
 from app.prompt_builder import SYSTEM_INSTRUCTIONS
@@ -79,7 +80,7 @@ Antworte NUR mit JSON:
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
             max_tokens=200,
-            timeout=5,
+            timeout=deadline.timeout(5),
             response_format={"type": "json_object"},
         )
         raw = response.choices[0].message.content.strip()
@@ -170,7 +171,7 @@ Halte die Antwort kompakt und praktisch."""
             ],
             temperature=0.3,
             max_tokens=800,
-            timeout=15,
+            timeout=deadline.timeout(15),
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
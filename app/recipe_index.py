@@ -0,0 +1,276 @@
+"""
+Local recipe retrieval index.
+
+Built once when recipe_service.load_recipes() loads recipes.json. Scores each
+recipe against a query over name, section, tags and ingredients so that only a
+shortlist (RECIPE_SHORTLIST_K, default 20) is sent to the LLM for reranking
+instead of the whole catalogue.
+
+Lexical score: BM25-style over weighted fields with prefix/compound matching
+("kartoffel" hits "Kartoffelsuppe", "italienisches" hits "italienisch").
+Optional embedding score (RECIPE_INDEX_EMBEDDINGS=1): cosine between the query
+and a one-line recipe description, embedded once per process.
+
+IngredientIndex: inverted index canonical ontology item → recipe ingredient
+slots, used for ingredient-overlap scoring without per-pair ontology lookups.
+"""
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.clients import client, EMBED_MODEL, RECIPE_SHORTLIST_K, RECIPE_INDEX_EMBEDDINGS
+
+EMBEDDING_WEIGHT = 4.0
+
+_FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "section": 1.5, "ingredients": 1.0, "optional": 0.5}
+_WORD = re.compile(r"[a-zäöüß]+")
+_STEM_LEN = 6
+_K1 = 1.2
+_B = 0.5
+
+_STOPWORDS = {
+    "aber", "alle", "auch", "auf", "aus", "bitte", "das", "dem", "den", "der", "die", "ein",
+    "eine", "einen", "etwas", "für", "gib", "gibt", "habe", "hast", "heute", "ich", "kannst",
+    "mal", "mich", "mir", "mit", "oder", "ohne", "rezept", "rezepte", "sich", "und", "von",
+    "was", "welche", "wie", "zum", "zur", "möchte", "hätte", "gern", "gerne", "lust", "essen", "machen",
+    "kochen", "brauche", "suche", "vorschlag", "idee",
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return [w for w in _WORD.findall((text or "").lower()) if len(w) >= 3]
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct query stems (stopwords removed), in query order."""
+    terms: List[str] = []
+    for word in _tokens(query):
+        if word in _STOPWORDS:
+            continue
+        stem = word[:_STEM_LEN] if len(word) > _STEM_LEN else word
+        if stem not in terms:
+            terms.append(stem)
+    return terms
+
+
+def recipe_text(recipe: Dict) -> str:
+    """One-line description used for embeddings and debugging."""
+    return " | ".join([
+        recipe.get("name", ""),
+        recipe.get("section", ""),
+        ", ".join(recipe.get("tags", [])),
+        ", ".join(recipe.get("ingredients", [])),
+    ])
+
+
+class RecipeIndex:
+    """Field-weighted lexical index (+ optional embeddings) over a recipe list."""
+
+    def __init__(self, recipes: Sequence[Dict]):
+        self.recipes = list(recipes)
+        self.ids = [r["id"] for r in self.recipes]
+        self._pos = {rid: i for i, rid in enumerate(self.ids)}
+        self._fields: List[Dict[str, List[str]]] = []
+        for r in self.recipes:
+            self._fields.append({
+                "name": _tokens(r.get("name", "")),
+                "tags": _tokens(" ".join(r.get("tags", []))),
+                "section": _tokens(r.get("section", "")),
+                "ingredients": _tokens(" ".join(r.get("ingredients", []))),
+                "optional": _tokens(" ".join(r.get("optional_ingredients", []))),
+            })
+        self._avg_len = {
+            f: (sum(len(fields[f]) for fields in self._fields) / len(self._fields)) or 1.0
+            for f in _FIELD_WEIGHTS
+        } if self._fields else {f: 1.0 for f in _FIELD_WEIGHTS}
+        self._vectors: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    # ── Lexical ────────────────────────────────────────────────────────
+
+    def _term_freqs(self, term: str) -> List[Dict[str, int]]:
+        return [
+            {f: sum(1 for tok in toks if term in tok) for f, toks in fields.items()}
+            for fields in self._fields
+        ]
+
+    def lexical_scores(self, query: str) -> np.ndarray:
+        """BM25-style score per recipe (catalogue order)."""
+        scores = np.zeros(len(self.recipes), dtype=np.float32)
+        n = len(self.recipes)
+        for term in query_terms(query):
+            tfs = self._term_freqs(term)
+            df = sum(1 for tf in tfs if any(tf.values()))
+            if df == 0:
+                continue
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            for i, tf in enumerate(tfs):
+                for field, count in tf.items():
+                    if not count:
+                        continue
+                    length = len(self._fields[i][field])
+                    norm = count * (_K1 + 1) / (count + _K1 * (1 - _B + _B * length / self._avg_len[field]))
+                    scores[i] += _FIELD_WEIGHTS[field] * idf * norm
+        return scores
+
+    # ── Embeddings (optional) ──────────────────────────────────────────
+
+    def _ensure_vectors(self) -> bool:
+        if self._vectors is not None:
+            return True
+        try:
+            resp = client.embeddings.create(model=EMBED_MODEL, input=[recipe_text(r) for r in self.recipes])
+            vecs = np.asarray([d.embedding for d in resp.data], dtype=np.float32)
+            vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-9
+            self._vectors = vecs
+            print(f"[RECIPE_INDEX] embedded {len(self.recipes)} recipes")
+            return True
+        except Exception as e:
+            print(f"[RECIPE_INDEX] embedding disabled (lexical only): {e}")
+            return False
+
+    def embedding_scores(self, query: str) -> Optional[np.ndarray]:
+        if not RECIPE_INDEX_EMBEDDINGS or not self.recipes or not self._ensure_vectors():
+            return None
+        try:
+            from app.rag_service import embed_one
+            q = np.asarray(embed_one(query), dtype=np.float32)
+        except Exception as e:
+            print(f"[RECIPE_INDEX] query embedding failed: {e}")
+            return None
+        q /= np.linalg.norm(q) + 1e-9
+        return self._vectors @ q
+
+    # ── Shortlist ──────────────────────────────────────────────────────
+
+    def rank(self, query: str, candidates: Optional[Sequence[Dict]] = None) -> List[Tuple[float, Dict]]:
+        """(score, recipe) for candidates (default: all), best first, catalogue order on ties."""
+        scores = self.lexical_scores(query)
+        emb = self.embedding_scores(query)
+        if emb is not None:
+            scores = scores + EMBEDDING_WEIGHT * emb
+        pool = self.recipes if candidates is None else candidates
+        ranked = [(float(scores[self._pos[r["id"]]]), r) for r in pool if r["id"] in self._pos]
+        ranked.sort(key=lambda x: (-x[0], self._pos[x[1]["id"]]))
+        return ranked
+
+    def shortlist(self, query: str, candidates: Optional[Sequence[Dict]] = None, k: int = None) -> List[Dict]:
+        """
+        Top-k candidates for LLM reranking.
+
+        Without any signal (no lexical hit and no embeddings, e.g. "etwas
+        Traditionelles"), the full candidate list is returned so the LLM can
+        still match concepts the index does not know.
+        """
+        k = RECIPE_SHORTLIST_K if k is None else k
+        pool = list(self.recipes if candidates is None else candidates)
+        if len(pool) <= k:
+            return pool
+        ranked = self.rank(query, pool)
+        if not ranked or ranked[0][0] <= 0.0:
+            return pool
+        return [r for _, r in ranked[:k]]
+
+
+class IngredientIndex:
+    """
+    Inverted ingredient index for overlap scoring.
+
+    Every distinct (normalized) recipe ingredient gets a vocabulary id and its
+    ontology canonical is resolved once at build time. A user item is resolved
+    to a boolean vocabulary mask (substring match in either direction, or same
+    canonical — the semantics of recipe_service._ingredient_matches), and
+    overlap is one matrix product against the recipe × vocabulary incidence
+    matrices.
+    """
+
+    _TERM_CACHE_MAX = 2048
+
+    def __init__(self, recipes: Sequence[Dict], lookup: Callable[[str], Any]):
+        self.recipes = list(recipes)
+        self._lookup = lookup
+        self.vocab: List[str] = []
+        self._vocab_ids: Dict[str, int] = {}
+        self.required_ids: List[List[int]] = []
+        self.optional_ids: List[List[int]] = []
+        self._canonical_vocab: Dict[str, List[int]] = {}
+
+        for r in self.recipes:
+            req = [self._vocab_id(item) for item in r.get("ingredients", [])]
+            opt = [self._vocab_id(item) for item in r.get("optional_ingredients", [])]
+            self.required_ids.append(req)
+            self.optional_ids.append(opt)
+
+        n, v = len(self.recipes), len(self.vocab)
+        self.required_counts = np.zeros((n, v), dtype=np.float64)
+        self.contains = np.zeros((n, v), dtype=bool)
+        for pos, (req, opt) in enumerate(zip(self.required_ids, self.optional_ids)):
+            for vid in req:
+                self.required_counts[pos, vid] += 1.0
+            self.contains[pos, req + opt] = True
+        self.required_len = np.asarray([len(req) for req in self.required_ids], dtype=np.float64)
+        names = [r.get("name", "") for r in self.recipes]
+        self._name_rank = np.empty(n, dtype=np.int64)
+        self._name_rank[sorted(range(n), key=lambda i: names[i])] = np.arange(n)
+        self._pos = {r["id"]: i for i, r in enumerate(self.recipes)}
+        self._term_cache: Dict[str, np.ndarray] = {}
+
+    def _vocab_id(self, item: str) -> int:
+        key = item.strip().lower()
+        vid = self._vocab_ids.get(key)
+        if vid is None:
+            vid = len(self.vocab)
+            self.vocab.append(key)
+            self._vocab_ids[key] = vid
+            entry = self._lookup(item)
+            canonical = entry.canonical if entry else None
+            if canonical is not None:
+                self._canonical_vocab.setdefault(canonical, []).append(vid)
+        return vid
+
+    def position(self, recipe_id: str) -> Optional[int]:
+        return self._pos.get(recipe_id)
+
+    def term_mask(self, term: str) -> np.ndarray:
+        """Vocabulary ids matching one user item (substring either way, or same canonical)."""
+        cached = self._term_cache.get(term)
+        if cached is not None:
+            return cached
+        st = term.strip().lower()
+        mask = np.fromiter((st in v or v in st for v in self.vocab), dtype=bool, count=len(self.vocab))
+        entry = self._lookup(term)
+        if entry:
+            mask[self._canonical_vocab.get(entry.canonical, [])] = True
+        if len(self._term_cache) >= self._TERM_CACHE_MAX:
+            self._term_cache.clear()
+        self._term_cache[term] = mask
+        return mask
+
+    def available_mask(self, terms: Sequence[str]) -> np.ndarray:
+        mask = np.zeros(len(self.vocab), dtype=bool)
+        for term in terms:
+            mask |= self.term_mask(term)
+        return mask
+
+    def recipes_containing(self, term: str) -> np.ndarray:
+        """Per recipe: does any required/optional ingredient match `term`?"""
+        return self.contains[:, self.term_mask(term)].any(axis=1)
+
+    def overlap(self, terms: Sequence[str], limit: int) -> List[Tuple[int, float, np.ndarray]]:
+        """
+        Top recipes by share of required ingredients covered by `terms`.
+
+        Returns (recipe position, overlap score, vocabulary mask), sorted by
+        score DESC then name; recipes without required ingredients are skipped.
+        """
+        mask = self.available_mask(terms)
+        matched = self.required_counts @ mask.astype(np.float64)
+        eligible = self.required_len > 0
+        scores = np.zeros(len(self.recipes), dtype=np.float64)
+        scores[eligible] = matched[eligible] / self.required_len[eligible]
+        order = [i for i in np.lexsort((self._name_rank, -scores)) if eligible[i]]
+        return [(int(i), float(scores[i]), mask) for i in order[:limit]]
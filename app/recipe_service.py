@@ -10,26 +10,47 @@ from pathlib import Path
 from typing import List, Dict, Optional
 
 from trennkost.ontology import get_ontology
+from app import deadline
 from app.clients import client as _openai_client, MODEL
+from app.recipe_index import IngredientIndex, RecipeIndex
 
 DATA_PATH = Path(__file__).parent / "data" / "recipes.json"
 
 _recipes_cache: Optional[List[Dict]] = None
+_recipe_index: Optional[RecipeIndex] = None
+_ingredient_index: Optional[IngredientIndex] = None
 
 
 def load_recipes() -> List[Dict]:
-    """Load recipes from JSON (cached in memory)."""
-    global _recipes_cache
+    """Load recipes from JSON (cached in memory) and build the local search index."""
+    global _recipes_cache, _recipe_index, _ingredient_index
     if _recipes_cache is not None:
         return _recipes_cache
     if not DATA_PATH.exists():
         _recipes_cache = []
-        return _recipes_cache
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        _recipes_cache = json.load(f)
+    else:
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            _recipes_cache = json.load(f)
+    _recipe_index = RecipeIndex(_recipes_cache)
+    _ingredient_index = None  # built lazily, needs the ontology
     return _recipes_cache
 
 
+def get_recipe_index() -> RecipeIndex:
+    """Local recipe index (built by load_recipes)."""
+    load_recipes()
+    return _recipe_index
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """Inverted ingredient index (built on first use; resolves each recipe ingredient once)."""
+    global _ingredient_index
+    recipes = load_recipes()
+    if _ingredient_index is None:
+        _ingredient_index = IngredientIndex(recipes, get_ontology().lookup)
+    return _ingredient_index
+
+
 def get_recipe_by_id(recipe_id: str) -> Optional[Dict]:
     """Look up a single recipe by its slug ID."""
     for r in load_recipes():
@@ -78,21 +99,8 @@ def _ingredient_matches(recipe_ingredient: str, search_term: str) -> bool:
     return False
 
 
-def _llm_select_recipe_ids(
-    query: str,
-    recipes: List[Dict],
-    limit: int = 3,
-) -> List[str]:
-    """
-    LLM-based recipe selection: show all recipe names to the model,
-    get back a ranked list of IDs that best match the query.
-
-    Works for up to ~300 recipes (fits easily in mini's 128k context).
-    Handles inflections, synonyms and concepts that keyword matching misses.
-
-    Returns: ordered list of recipe IDs (empty if nothing matches).
-    On error: returns [] and falls back to keyword scoring.
-    """
+def _build_recipe_selection_prompt(query: str, recipes: List[Dict], limit: int = 3) -> str:
+    """Prompt for _llm_select_recipe_ids: one compact line per candidate recipe."""
     # Build compact recipe list: "id — Name (Section) [tag1, tag2]"
     lines = []
     for r in recipes:
@@ -101,7 +109,7 @@ def _llm_select_recipe_ids(
         lines.append(f"{r['id']} — {r['name']} ({r.get('section', '')}){tags_part}")
     recipe_list = "\n".join(lines)
 
-    prompt = f"""Du bist ein Rezept-Suchassistent für eine Trennkost-App.
+    return f"""Du bist ein Rezept-Suchassistent für eine Trennkost-App.
 
 NUTZER-ANFRAGE: {query}
 
@@ -117,13 +125,32 @@ Wenn KEIN Rezept zur Anfrage passt: leere ids-Liste zurückgeben.
 Antworte NUR mit JSON, kein Kommentar:
 {{"ids": ["id1", "id2", "id3"]}}"""
 
+
+def _llm_select_recipe_ids(
+    query: str,
+    recipes: List[Dict],
+    limit: int = 3,
+) -> List[str]:
+    """
+    LLM-based recipe selection: show candidate recipe names to the model,
+    get back a ranked list of IDs that best match the query.
+
+    search_recipes() passes the local index shortlist (~20 recipes), so the
+    LLM only reranks. Handles inflections, synonyms and concepts that keyword
+    matching misses.
+
+    Returns: ordered list of recipe IDs (empty if nothing matches).
+    On error: returns [] and falls back to keyword scoring.
+    """
+    prompt = _build_recipe_selection_prompt(query, recipes, limit)
+
     try:
         response = _openai_client.chat.completions.create(
             model=MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
             max_tokens=100,
-            timeout=5,
+            timeout=deadline.timeout(5),
             response_format={"type": "json_object"},
         )
         raw = response.choices[0].message.content.strip()
@@ -152,7 +179,8 @@ def search_recipes(
     """
     Search curated recipes with LLM-based selection (primary) + keyword scoring (fallback).
 
-    Primary path: _llm_select_recipe_ids() — handles inflections, synonyms, cuisine names.
+    Primary path: local index shortlist (app.recipe_index) reranked by
+    _llm_select_recipe_ids() — handles inflections, synonyms, cuisine names.
     Fallback path: keyword + ingredient + tag scoring (used when LLM call fails).
 
     Args:
@@ -191,8 +219,10 @@ def search_recipes(
     if not candidates:
         return []
 
-    # ── Primary: LLM selection ────────────────────────────────────────
-    selected_ids = _llm_select_recipe_ids(query, candidates, limit=limit)
+    # ── Primary: local shortlist → LLM rerank ─────────────────────────
+    shortlist = get_recipe_index().shortlist(query, candidates)
+    print(f"[RECIPE_INDEX] query='{query[:50]}' → shortlist {len(shortlist)}/{len(candidates)}")
+    selected_ids = _llm_select_recipe_ids(query, shortlist, limit=limit)
 
     if selected_ids:
         # Build results in LLM-ranked order, assign descending scores
@@ -217,6 +247,8 @@ def search_recipes(
         tags = _detect_tags_from_query(query_lower)
 
     query_words = set(re.split(r'[\s,;]+', query_lower))
+    ing_index = get_ingredient_index()
+    ingredient_hits = [ing_index.recipes_containing(ing) for ing in ingredients or []]
     scored = []
     for recipe in candidates:
         score = 0.0
@@ -224,10 +256,10 @@ def search_recipes(
         all_items_lower = " ".join(all_recipe_items).lower()
         recipe_name_lower = recipe["name"].lower()
 
-        if ingredients:
-            for ing in ingredients:
-                if any(_ingredient_matches(ri, ing) for ri in all_recipe_items):
-                    score += 3.0
+        pos = ing_index.position(recipe["id"])
+        for hits in ingredient_hits:
+            if pos is not None and hits[pos]:
+                score += 3.0
         if tags:
             for tag in tags:
                 if tag in recipe.get("tags", []):
@@ -327,7 +359,9 @@ def find_recipes_by_ingredient_overlap(
     Find recipes by ingredient overlap — NOT semantic similarity.
 
     For each recipe, counts how many required ingredients the user has.
-    Uses _ingredient_matches() for ontology-aware fuzzy matching.
+    Matching follows _ingredient_matches() (substring or same ontology
+    canonical), evaluated for the whole catalogue at once via the inverted
+    IngredientIndex.
 
     Returns: recipes sorted by overlap DESC, enriched with:
       overlap_score: float (0.0–1.0)
@@ -339,30 +373,17 @@ def find_recipes_by_ingredient_overlap(
     if not all_recipes or not available_ingredients:
         return []
 
-    scored = []
-    for recipe in all_recipes:
+    index = get_ingredient_index()
+    results = []
+    for pos, overlap_score, mask in index.overlap(available_ingredients, limit):
+        recipe = index.recipes[pos]
         required = recipe.get("ingredients", [])
         optional = recipe.get("optional_ingredients", [])
+        matched = [ing for ing, vid in zip(required, index.required_ids[pos]) if mask[vid]]
+        missing_required = [ing for ing, vid in zip(required, index.required_ids[pos]) if not mask[vid]]
+        missing_optional = [opt for opt, vid in zip(optional, index.optional_ids[pos]) if not mask[vid]]
 
-        if not required:
-            continue
-
-        matched = []
-        missing_required = []
-        for req_ing in required:
-            if any(_ingredient_matches(req_ing, avail) for avail in available_ingredients):
-                matched.append(req_ing)
-            else:
-                missing_required.append(req_ing)
-
-        missing_optional = [
-            opt for opt in optional
-            if not any(_ingredient_matches(opt, avail) for avail in available_ingredients)
-        ]
-
-        overlap_score = len(matched) / len(required) if required else 0.0
-
-        scored.append((overlap_score, {
+        results.append({
             "id": recipe["id"],
             "name": recipe["name"],
             "section": recipe["section"],
@@ -378,10 +399,8 @@ def find_recipes_by_ingredient_overlap(
             "matched_ingredients": matched,
             "missing_required": missing_required,
             "missing_optional": missing_optional,
-        }))
-
-    scored.sort(key=lambda x: (-x[0], x[1]["name"]))
-    return [r for _, r in scored[:limit]]
+        })
+    return results
 
 
 def _detect_tags_from_query(query_lower: str) -> List[str]:
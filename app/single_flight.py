@@ -0,0 +1,103 @@
+"""
+Single-flight coalescing for identical in-flight LLM / embedding calls.
+
+A double-submitted message, or many guests sending the same popular prompt
+at once, would otherwise issue the same request several times concurrently.
+run() keys a call on its call site plus the exact request parameters (model,
+messages/input, temperature, ...). The first caller (leader) makes the
+request; callers arriving while it is in flight (followers) wait for the
+same future and get the same response object, or the same exception.
+Nothing is cached: once the leader finishes the key is gone.
+
+    response = single_flight.run("input_service.classify_intent",
+                                 client.chat.completions.create,
+                                 model=MODEL, messages=[...], temperature=0.0)
+
+Thread callers block on the shared concurrent.futures.Future; asyncio
+callers use run_async() (async callable) and await it without blocking the
+loop. Both share one table, so a coroutine can follow a thread leader and
+vice versa. SINGLE_FLIGHT_ENABLED=0 calls straight through.
+
+Metric: kursbot_single_flight_calls_total{site,role}, role leader|follower
+(followers are the coalesced calls that never reached the API).
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app import metrics
+from app.clients import SINGLE_FLIGHT_ENABLED
+
+CALLS_TOTAL = "kursbot_single_flight_calls_total"
+
+metrics.describe(CALLS_TOTAL, "counter",
+                 "Calls through the single-flight layer; role=follower were coalesced into an in-flight call.")
+
+_inflight: Dict[Hashable, Future] = {}
+_lock = threading.Lock()
+
+
+def _key(site: str, params: Dict[str, Any]) -> Tuple[str, str]:
+    return site, json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _join_or_lead(key: Tuple[str, str]) -> Tuple[Future, bool]:
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def _finish(key: Tuple[str, str], future: Future) -> None:
+    with _lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def run(site: str, fn: Callable[..., Any], **params) -> Any:
+    """fn(**params), shared with concurrent callers passing the same site + params."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return fn(**params)
+    key = _key(site, params)
+    future, leader = _join_or_lead(key)
+    metrics.inc(CALLS_TOTAL, {"site": site, "role": "leader" if leader else "follower"})
+    if not leader:
+        return future.result()
+    try:
+        result = fn(**params)
+    except BaseException as exc:
+        _finish(key, future)
+        future.set_exception(exc)
+        raise
+    _finish(key, future)
+    future.set_result(result)
+    return result
+
+
+async def run_async(site: str, fn: Callable[..., Awaitable[Any]], **params) -> Any:
+    """Awaitable twin of run() for async callables."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return await fn(**params)
+    key = _key(site, params)
+    future, leader = _join_or_lead(key)
+    metrics.inc(CALLS_TOTAL, {"site": site, "role": "leader" if leader else "follower"})
+    if not leader:
+        return await asyncio.wrap_future(future)
+    try:
+        result = await fn(**params)
+    except BaseException as exc:
+        _finish(key, future)
+        future.set_exception(exc)
+        raise
+    _finish(key, future)
+    future.set_result(result)
+    return result
+
+
+def inflight() -> int:
+    with _lock:
+        return len(_inflight)
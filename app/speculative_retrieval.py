@@ -0,0 +1,164 @@
+"""
+Speculative retrieval on the raw message.
+
+Retrieval normally waits for normalize_input + classify_intent, then
+rewrites the query and embeds it. For most fresh questions normalization is
+a no-op or only fixes punctuation/case, so the final retrieval query is (close
+to) the raw message. start() therefore launches
+
+    retrieve_with_fallback(expand_alias_terms(raw_message), raw_message)
+
+on the llm pool in parallel with normalization (the caller passes its
+retrieve_with_fallback). The speculation is remembered for the current turn
+(a ContextVar, cleared by scope()/scoped() around the turn), so the
+retrieval step can call take(final_query) without threading it through every
+mode handler. take() reuses the speculative result if the two queries are
+similar enough (token Jaccard after lowercasing, stripping
+punctuation and whitespace, >= SPECULATIVE_RETRIEVAL_MIN_SIMILARITY);
+otherwise it returns None and the normal path retrieves as before. After a
+hit, embedded_query() names the speculative query, whose embedding is the
+one retrieval computed (the FAQ cache probe reuses it). Engine
+queries (build_rag_query) never match the raw message, so the caller passes
+rag_turn=False for turns whose raw-message mode guess is an engine mode
+(food / menu analysis) and no speculation is started for them. Appended
+food classifications rarely match either: those turns pay one wasted
+embedding.
+
+Telemetry: kursbot_speculative_retrieval_total{path,outcome}
+  started  speculative retrieval launched
+  hit      result reused
+  miss     final query too different → normal retrieval
+  skipped  not started (disabled, image turn, engine turn, pool saturated)
+Hit rate = hit / started; started - hit - miss turns never reached the
+retrieval step (early answers, recipe bypass, ...).
+"""
+import contextvars
+import re
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app import executors, metrics
+from app.clients import SPECULATIVE_RETRIEVAL_ENABLED, SPECULATIVE_RETRIEVAL_MIN_SIMILARITY
+
+RetrievalResult = Tuple[List[str], List[Dict[str, Any]], List[float], bool]
+
+OUTCOMES_TOTAL = "kursbot_speculative_retrieval_total"
+
+metrics.describe(OUTCOMES_TOTAL, "counter", "Speculative retrieval on the raw message by outcome.")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_active: "contextvars.ContextVar[Optional[Speculation]]" = contextvars.ContextVar("speculation", default=None)
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+def similarity(a: str, b: str) -> float:
+    """Cheap query similarity: 1.0 if equal up to case/punctuation, else token Jaccard."""
+    ta, tb = _tokens(a), _tokens(b)
+    if ta == tb:
+        return 1.0
+    sa, sb = set(ta), set(tb)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
+
+
+class Speculation:
+    """One in-flight speculative retrieval, consumed at the turn's retrieval step."""
+
+    def __init__(self, path: str, query: str, future: Future):
+        self.path = path
+        self.query = query
+        self._future = future
+        self._settled = False
+        self.hit = False
+
+    def take(self, final_query: str) -> Optional[RetrievalResult]:
+        """Speculative result if final_query is close enough to the raw query, else None."""
+        if self._settled:
+            return None
+        self._settled = True
+        score = similarity(self.query, final_query)
+        if score < SPECULATIVE_RETRIEVAL_MIN_SIMILARITY:
+            self._record("miss")
+            print(f"[SPECULATIVE] miss (similarity {score:.2f})")
+            return None
+        try:
+            result = self._future.result()
+        except Exception as e:
+            self._record("miss")
+            print(f"[SPECULATIVE] speculative retrieval failed ({e}), retrieving normally")
+            return None
+        self.hit = True
+        self._record("hit")
+        print(f"[SPECULATIVE] hit (similarity {score:.2f})")
+        return result
+
+    def _record(self, outcome: str) -> None:
+        metrics.inc(OUTCOMES_TOTAL, {"path": self.path, "outcome": outcome})
+
+
+def start(
+    path: str,
+    raw_message: str,
+    retrieve: Callable[[str, str], RetrievalResult],
+    image_path: Optional[str] = None,
+    rag_turn: bool = True,
+) -> Optional[Speculation]:
+    """Kick off retrieve(expanded raw message, raw message); None if speculation does not apply."""
+    if not SPECULATIVE_RETRIEVAL_ENABLED or image_path or not rag_turn or not raw_message.strip():
+        metrics.inc(OUTCOMES_TOTAL, {"path": path, "outcome": "skipped"})
+        return None
+    from app.rag_service import expand_alias_terms
+
+    query = expand_alias_terms(raw_message)
+    try:
+        future = executors.llm.submit(metrics.timed("speculative_retrieval", retrieve), query, raw_message)
+    except executors.ExecutorSaturated:
+        metrics.inc(OUTCOMES_TOTAL, {"path": path, "outcome": "skipped"})
+        return None
+    metrics.inc(OUTCOMES_TOTAL, {"path": path, "outcome": "started"})
+    speculation = Speculation(path, query, future)
+    _active.set(speculation)
+    return speculation
+
+
+def take(final_query: str) -> Optional[RetrievalResult]:
+    """The current turn's speculative result if it matches final_query (consumes it)."""
+    speculation = _active.get()
+    if speculation is None:
+        return None
+    return speculation.take(final_query)
+
+
+def embedded_query(final_query: str) -> str:
+    """
+    The query this turn's retrieval actually embedded: the speculative query
+    after a hit (similar, but not necessarily equal to final_query), else
+    final_query. Later steps look its vector up (FAQ cache probe).
+    """
+    speculation = _active.get()
+    if speculation is not None and speculation.hit:
+        return speculation.query
+    return final_query
+
+
+@contextmanager
+def scope() -> Iterator[None]:
+    """Turn boundary: a speculation started inside never leaks into later work on this thread."""
+    token = _active.set(None)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def scoped(fn: Callable) -> Callable:
+    """fn wrapped in scope() (for executor submits)."""
+    def _scoped(*args, **kwargs):
+        with scope():
+            return fn(*args, **kwargs)
+    return _scoped
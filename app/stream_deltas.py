@@ -0,0 +1,99 @@
+"""
+Delta coalescing for the SSE streams.
+
+The LLM streams roughly one token (3-5 characters) per chunk. Sending one
+`delta` frame per chunk means one json.dumps, one queue hand-off and one
+network write per token. DeltaCoalescer buffers tokens and emits a single
+frame when either `flush_ms` have passed since the last frame or `max_chars`
+are buffered; the first token of an answer always goes out immediately so
+time-to-first-delta is unchanged. The remainder is flushed at the end.
+
+Mode "token" (STREAM_DELTA_MODE=token) restores one frame per chunk.
+
+Flushing is driven by incoming chunks (add/poll); a stalled upstream holds
+at most one buffer until its next chunk or the end of the stream.
+"""
+import json
+import time
+from typing import List, Optional
+
+from app import metrics
+
+COALESCE = "coalesce"
+TOKEN = "token"
+
+FRAMES_TOTAL = "kursbot_stream_delta_frames_total"
+CHUNKS_TOTAL = "kursbot_stream_delta_chunks_total"
+
+metrics.describe(FRAMES_TOTAL, "counter", "SSE delta frames sent (after coalescing).")
+metrics.describe(CHUNKS_TOTAL, "counter", "Non-empty LLM chunks received by the SSE streams.")
+
+_DELTA_PREFIX = 'event: delta\ndata: {"text": '
+_DELTA_SUFFIX = "}\n\n"
+
+
+def delta_frame(text: str) -> str:
+    """SSE delta frame; same bytes as _sse("delta", {"text": text}) without the dict round trip."""
+    return _DELTA_PREFIX + json.dumps(text, ensure_ascii=False) + _DELTA_SUFFIX
+
+
+class DeltaCoalescer:
+    """Accumulates answer text (list buffer) and decides when to emit a delta frame."""
+
+    def __init__(self, mode: str = COALESCE, flush_ms: float = 100.0, max_chars: int = 120):
+        self.per_token = mode == TOKEN or (flush_ms <= 0 and max_chars <= 0)
+        self.flush_s = max(flush_ms, 0.0) / 1000
+        self.max_chars = max_chars
+        self._parts: List[str] = []   # whole answer
+        self._pending: List[str] = []  # not yet sent
+        self._pending_chars = 0
+        self._last_flush: Optional[float] = None
+        self.frames = 0
+        self.tokens = 0
+
+    def add(self, token: str, now: Optional[float] = None) -> Optional[str]:
+        """Buffer a token; returns a frame if it is time to flush."""
+        if not token:
+            return self.poll(now)
+        self.tokens += 1
+        self._parts.append(token)
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        if self.per_token or self._last_flush is None:
+            return self._flush(now)
+        if self.max_chars > 0 and self._pending_chars >= self.max_chars:
+            return self._flush(now)
+        return self.poll(now)
+
+    def poll(self, now: Optional[float] = None) -> Optional[str]:
+        """Frame for the pending text if the flush interval has elapsed, else None."""
+        if not self._pending or self._last_flush is None or self.flush_s <= 0:
+            return None
+        now = time.monotonic() if now is None else now
+        if now - self._last_flush >= self.flush_s:
+            return self._flush(now)
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Frame for whatever is still buffered (end of stream)."""
+        return self._flush(None) if self._pending else None
+
+    def _flush(self, now: Optional[float]) -> str:
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        self._last_flush = time.monotonic() if now is None else now
+        self.frames += 1
+        return delta_frame(text)
+
+    def record_metrics(self) -> None:
+        mode = TOKEN if self.per_token else COALESCE
+        metrics.inc(FRAMES_TOTAL, {"mode": mode}, self.frames)
+        metrics.inc(CHUNKS_TOTAL, {"mode": mode}, self.tokens)
+
+    @property
+    def seen_text(self) -> bool:
+        return bool(self._parts)
+
+    def text(self) -> str:
+        return "".join(self._parts)
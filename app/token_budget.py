@@ -0,0 +1,254 @@
+"""
+Token budgeting for the user-side prompt.
+
+The prompt is assembled from named sections (intent hint, summary, history,
+engine/menu blocks, course snippets, question, answer instructions). Each section
+has a priority and an optional token cap. When the whole prompt (plus the
+system message sent with it) exceeds MAX_PROMPT_TOKENS, trimmable sections are shortened lowest-priority first:
+old history turns, then the summary, then the lowest-ranked course chunks.
+The question and the answer instructions are never trimmed.
+
+Token counts use tiktoken when it is installed; otherwise a chars-per-token
+estimate (PROMPT_CHARS_PER_TOKEN) is used.
+"""
+import math
+import os
+import re
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+from app.clients import MODEL, MAX_PROMPT_TOKENS, MAX_CONTEXT_TOKENS, MAX_HISTORY_TOKENS
+
+CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "3.5"))
+
+# Higher priority = trimmed later. Sections with drop=None are never trimmed.
+PRIORITY_HISTORY = 10
+PRIORITY_SUMMARY = 20
+PRIORITY_COURSE = 30
+PRIORITY_FIXED = 100
+
+_COURSE_LABEL = re.compile(r"(?m)^(?=\[[^\]\n]+#[^\]\n]+\]$)")
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.encoding_for_model(MODEL)
+        except Exception:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for text (tiktoken if available, else chars/CHARS_PER_TOKEN)."""
+    if not text:
+        return 0
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+@dataclass
+class PromptSection:
+    """
+    One named block of the prompt.
+
+    units are the smallest removable pieces (history lines, course chunks).
+    drop is "head" (oldest first), "tail" (lowest-ranked first) or None (fixed).
+    """
+    name: str
+    units: List[str]
+    priority: int = PRIORITY_FIXED
+    drop: Optional[str] = None
+    max_tokens: Optional[int] = None
+    header: Optional[str] = None
+    footer: Optional[str] = None
+    sep: str = "\n"
+    keep_header_when_empty: bool = False
+
+    def lines(self) -> List[str]:
+        if not self.units and not self.keep_header_when_empty:
+            return []
+        out = []
+        if self.header is not None:
+            out.append(self.header)
+        if self.sep == "\n":
+            out.extend(self.units)
+        else:
+            out.append(self.sep.join(self.units))
+        if self.footer is not None:
+            out.append(self.footer)
+        return out
+
+    def render(self) -> str:
+        return "\n".join(self.lines())
+
+    def tokens(self) -> int:
+        return count_tokens(self.render())
+
+    def copy(self) -> "PromptSection":
+        return replace(self, units=list(self.units))
+
+    def _drop_one(self) -> bool:
+        if not self.drop or not self.units:
+            return False
+        if self.drop == "head":
+            self.units.pop(0)
+        else:
+            self.units.pop()
+        return True
+
+
+class PromptParts(list):
+    """
+    List of prompt lines that also remembers the sections it was built from.
+
+    Behaves exactly like the plain List[str] returned before, so callers that
+    join or extend it keep working; assemble_prompt uses .sections to budget.
+    """
+
+    def __init__(self, sections: List[PromptSection]):
+        self.sections = [s for s in sections if s.units or s.keep_header_when_empty]
+        super().__init__(line for s in self.sections for line in s.lines())
+
+    def section(self, name: str) -> Optional[PromptSection]:
+        for s in self.sections:
+            if s.name == name:
+                return s
+        return None
+
+
+@dataclass
+class BudgetReport:
+    budget: int
+    sections: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # name -> (before, after)
+
+    @property
+    def total_before(self) -> int:
+        return sum(before for before, _ in self.sections.values())
+
+    @property
+    def total(self) -> int:
+        return sum(after for _, after in self.sections.values())
+
+    @property
+    def trimmed(self) -> List[str]:
+        return [name for name, (before, after) in self.sections.items() if after < before]
+
+    def format(self) -> str:
+        cells = []
+        for name, (before, after) in self.sections.items():
+            cells.append(f"{name}={after}" if after == before else f"{name}={before}->{after}")
+        return f"total={self.total}/{self.budget} " + " ".join(cells)
+
+
+def split_course_context(course_context: str) -> List[str]:
+    """Split a build_context() string back into its labelled chunk pieces (rank order)."""
+    if not course_context or not course_context.strip():
+        return []
+    pieces = [p.strip() for p in _COURSE_LABEL.split(course_context)]
+    return [p for p in pieces if p]
+
+
+def course_section(course_context: str) -> PromptSection:
+    # Renders identically to f"KURS-SNIPPETS (FAKTENBASIS):\n{course_context}\n".
+    return PromptSection(
+        name="course",
+        units=split_course_context(course_context),
+        priority=PRIORITY_COURSE,
+        drop="tail",
+        max_tokens=MAX_CONTEXT_TOKENS or None,
+        header="KURS-SNIPPETS (FAKTENBASIS):",
+        footer="",
+        sep="\n\n",
+        keep_header_when_empty=True,
+    )
+
+
+def summary_section(summary_lines: List[str]) -> PromptSection:
+    return PromptSection(name="summary", units=list(summary_lines), priority=PRIORITY_SUMMARY, drop="tail")
+
+
+def history_section(history_lines: List[str]) -> PromptSection:
+    return PromptSection(
+        name="history",
+        units=list(history_lines),
+        priority=PRIORITY_HISTORY,
+        drop="head",
+        max_tokens=MAX_HISTORY_TOKENS or None,
+        header="LETZTE NACHRICHTEN:",
+        footer="",
+    )
+
+
+def _trim(section: PromptSection, limit: int, tokens: int) -> int:
+    """
+    Drop units until the section fits limit; returns its new token count.
+
+    Each unit is counted once and subtracted when dropped (no re-render per
+    drop); the section is re-counted once the estimate fits, and only keeps
+    dropping if the exact count is still over (per-unit counts are not
+    exactly additive).
+    """
+    if not section.drop or tokens <= limit:
+        return tokens
+    costs = [count_tokens(u + section.sep) for u in section.units]
+    while section.units and tokens > limit:
+        estimate = tokens
+        while section.units and estimate > limit:
+            estimate -= costs.pop(0) if section.drop == "head" else costs.pop()
+            section._drop_one()
+        tokens = section.tokens()
+    return tokens
+
+
+def fit_to_budget(
+    sections: List[PromptSection],
+    budget: Optional[int] = None,
+    fixed: Optional[Dict[str, int]] = None,
+) -> BudgetReport:
+    """
+    Trim sections in place so the rendered prompt fits the budget.
+
+    fixed are token counts of parts sent with the prompt but not rendered
+    into it (the system message); they count against the budget first.
+    Pass 1 applies each section's own max_tokens. Pass 2 shrinks trimmable
+    sections lowest-priority first until the total fits (or nothing is left
+    to drop). Fixed sections are counted but never touched.
+    """
+    budget = MAX_PROMPT_TOKENS if budget is None else budget
+    fixed = fixed or {}
+    before = [s.tokens() for s in sections]
+    after = list(before)
+
+    for i, s in enumerate(sections):
+        if s.drop and s.max_tokens:
+            after[i] = _trim(s, s.max_tokens, after[i])
+
+    if budget:
+        total = sum(fixed.values()) + sum(after)
+        for i in sorted((i for i, s in enumerate(sections) if s.drop), key=lambda i: sections[i].priority):
+            if total <= budget:
+                break
+            current = after[i]
+            after[i] = _trim(sections[i], max(0, current - (total - budget)), current)
+            total += after[i] - current
+
+    report = BudgetReport(budget=budget or 0)
+    for name, tokens in fixed.items():
+        report.sections[name] = (tokens, tokens)
+    for s, tokens_before, tokens_after in zip(sections, before, after):
+        report.sections[s.name] = (tokens_before, tokens_after)
+    return report
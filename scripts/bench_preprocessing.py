@@ -0,0 +1,169 @@
+"""
+Preprocessing benchmark: split LLM calls vs. one fused JSON call.
+
+Replays the SCENARIOS messages from scripts/bot_eval_suite.py (first turn,
+then the follow-up with the first exchange as history) through the LLM
+preprocessing of a knowledge turn, once per mode:
+
+  split  normalize_input || classify_intent, then rewrite_standalone_query,
+         then classify_food_items (the pipeline's critical path)
+  fused  fused_preprocessing.preprocess, then the same four consumers reading
+         its fields (LLM only for fields the fused answer lacked)
+
+and reports per mode: p50/p95 wall time per turn, LLM calls, prompt and
+completion tokens per turn (from llm_accounting), plus per call site.
+By default the calls go to scripts/fake_openai.py in-process (latency model
+only, token counts ~ chars/4); --live uses the configured OpenAI API for
+real latency and token usage. For whole-turn latency under load, run
+scripts/load_test.py with FUSED_PREPROCESSING_ENABLED=0 and =1.
+
+Usage:
+  python scripts/bench_preprocessing.py
+  python scripts/bench_preprocessing.py --repeat 3 --latency-ms 600 --json bench_pre.json
+  OPENAI_API_KEY=sk-... python scripts/bench_preprocessing.py --live
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from bot_eval_suite import SCENARIOS  # noqa: E402
+from fake_openai import FakeOpenAIServer, add_config_args, config_from_args  # noqa: E402
+
+MODES = ("split", "fused")
+_ASSISTANT_REPLY = ("Laut Kursmaterial kommt es auf die richtige Kombination an: Obst allein, "
+                    "Kohlenhydrate und Eiweiß getrennt, Gemüse passt zu beidem.")
+
+
+def build_turns(repeat: int = 1) -> List[Dict[str, Any]]:
+    """(message, recent incl. the message, is_new) per scenario turn."""
+    turns = []
+    for _ in range(repeat):
+        for scenario in SCENARIOS:
+            first = scenario["initial_user_message"]
+            turns.append({"message": first, "recent": [{"role": "user", "content": first}], "is_new": True})
+            followup = scenario.get("followup_user_message")
+            if followup:
+                recent = [{"role": "user", "content": first}, {"role": "assistant", "content": _ASSISTANT_REPLY},
+                          {"role": "user", "content": followup}]
+                turns.append({"message": followup, "recent": recent, "is_new": False})
+    return turns
+
+
+def run_turn(mode: str, turn: Dict[str, Any], pool: ThreadPoolExecutor) -> float:
+    """One turn's LLM preprocessing in `mode`; returns wall seconds."""
+    from app import fused_preprocessing
+    from app.input_service import classify_food_items, classify_intent, normalize_input
+    from app.rag_service import rewrite_standalone_query
+
+    message, recent, is_new = turn["message"], turn["recent"], turn["is_new"]
+    started = time.perf_counter()
+    if mode == "fused":
+        fused_preprocessing.activate(fused_preprocessing.preprocess(message, recent, is_new))
+        normalized = normalize_input(message, recent, is_new)
+        classify_intent(message, recent)
+    else:
+        fused_preprocessing.activate(None)
+        nf = pool.submit(normalize_input, message, recent, is_new)
+        inf = pool.submit(classify_intent, message, recent)
+        normalized = nf.result()
+        inf.result()
+    query = rewrite_standalone_query(None, recent[:-1], normalized)
+    classify_food_items(normalized, query)
+    fused_preprocessing.activate(None)
+    return time.perf_counter() - started
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_mode(mode: str, turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    from app.llm_accounting import ledger
+
+    ledger.reset()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        seconds = [run_turn(mode, turn, pool) for turn in turns]
+    lifetime = ledger.summary()["lifetime"]
+    n = len(turns)
+    calls = sum(t["calls"] for t in lifetime.values())
+    prompt = sum(t["prompt_tokens"] for t in lifetime.values())
+    completion = sum(t["completion_tokens"] for t in lifetime.values())
+    return {
+        "turns": n,
+        "p50_ms": round(statistics.median(seconds) * 1000, 1),
+        "p95_ms": round(_percentile(seconds, 0.95) * 1000, 1),
+        "calls_per_turn": round(calls / n, 2),
+        "prompt_tokens_per_turn": round(prompt / n, 1),
+        "completion_tokens_per_turn": round(completion / n, 1),
+        "sites": {site: {"calls": t["calls"], "prompt_tokens": t["prompt_tokens"],
+                         "completion_tokens": t["completion_tokens"]} for site, t in sorted(lifetime.items())},
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"\n{'mode':6} {'turns':>5} {'p50':>8} {'p95':>8} {'calls':>6} {'prompt':>8} {'compl':>7}")
+    for mode, r in results.items():
+        print(f"{mode:6} {r['turns']:5d} {r['p50_ms']:8.0f} {r['p95_ms']:8.0f} {r['calls_per_turn']:6.2f} "
+              f"{r['prompt_tokens_per_turn']:8.0f} {r['completion_tokens_per_turn']:7.0f}")
+    if set(MODES) <= set(results):
+        split, fused = results["split"], results["fused"]
+        tokens = lambda r: r["prompt_tokens_per_turn"] + r["completion_tokens_per_turn"]  # noqa: E731
+        print(f"\nfused vs split: p50 {fused['p50_ms'] / split['p50_ms'] - 1:+.0%}, "
+              f"tokens/turn {tokens(fused) / tokens(split) - 1:+.0%}")
+    for mode, r in results.items():
+        print(f"\n[{mode}] per call site:")
+        for site, s in r["sites"].items():
+            print(f"  {site:45} calls={s['calls']:4d} tok={s['prompt_tokens']}+{s['completion_tokens']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1, help="replay the scenarios this many times")
+    parser.add_argument("--mode", choices=MODES, action="append", help="only run this mode (repeatable)")
+    parser.add_argument("--live", action="store_true", help="call the configured OpenAI API instead of the fake")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    server = None
+    if not args.live:
+        server = FakeOpenAIServer(config=config_from_args(args))
+        server.start()
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-fake"
+    os.environ.setdefault("CHROMA_DIR", tempfile.mkdtemp(prefix="bench_pre_chroma_"))
+    os.environ["LLM_CALLS_LOG_INTERVAL_S"] = "0"
+
+    turns = build_turns(args.repeat)
+    print(f"[BENCH] {len(turns)} turns per mode against "
+          f"{'the OpenAI API' if args.live else f'fake_openai (latency {args.latency_ms:.0f}ms)'}")
+    try:
+        results = {mode: run_mode(mode, turns) for mode in (args.mode or MODES)}
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    print_report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n[BENCH] wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Recipe search benchmark: full catalogue vs. local index shortlist.
+
+Measures, per query, the _llm_select_recipe_ids prompt size (full list vs.
+shortlist) and the shortlist latency. With --live, also times the real LLM
+rerank call for both variants (needs OPENAI_API_KEY).
+
+Usage:
+  python scripts/bench_recipe_search.py [--live] [--k 20]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import recipe_service  # noqa: E402
+from app.token_budget import count_tokens  # noqa: E402
+
+QUERIES = [
+    "Kartoffelsuppe",
+    "Zucchini und Reis",
+    "Smoothie",
+    "Linsen Eintopf",
+    "Nudeln mit Tomatensoße",
+    "Avocado Brot",
+    "Ich hätte gern etwas Italienisches",
+    "vegan und schnell, Salat",
+    "Dessert ohne Zucker",
+    "Ofengemüse",
+    "etwas Traditionelles",
+]
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="also time the LLM rerank call")
+    parser.add_argument("--k", type=int, default=None, help="shortlist size (default RECIPE_SHORTLIST_K)")
+    args = parser.parse_args()
+
+    recipes = recipe_service.load_recipes()
+    index = recipe_service.get_recipe_index()
+    print(f"{len(recipes)} recipes\n")
+    print(f"{'query':36} {'full tok':>8} {'short tok':>9} {'n':>4} {'index ms':>8}"
+          + (f" {'llm full ms':>11} {'llm short ms':>12}" if args.live else ""))
+
+    full_tokens, short_tokens, index_ms = [], [], []
+    for query in QUERIES:
+        shortlist, ms = _timed(index.shortlist, query, recipes, args.k)
+        full = count_tokens(recipe_service._build_recipe_selection_prompt(query, recipes))
+        short = count_tokens(recipe_service._build_recipe_selection_prompt(query, shortlist))
+        full_tokens.append(full)
+        short_tokens.append(short)
+        index_ms.append(ms)
+        row = f"{query[:36]:36} {full:8d} {short:9d} {len(shortlist):4d} {ms:8.2f}"
+        if args.live:
+            _, llm_full = _timed(recipe_service._llm_select_recipe_ids, query, recipes)
+            _, llm_short = _timed(recipe_service._llm_select_recipe_ids, query, shortlist)
+            row += f" {llm_full:11.0f} {llm_short:12.0f}"
+        print(row)
+
+    print(f"\nmean prompt tokens: full={statistics.mean(full_tokens):.0f} "
+          f"shortlist={statistics.mean(short_tokens):.0f} "
+          f"({1 - statistics.mean(short_tokens) / statistics.mean(full_tokens):.0%} smaller)")
+    print(f"index latency: median={statistics.median(index_ms):.2f}ms max={max(index_ms):.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -373,6 +373,8 @@ def _read_sse_stream(base_url: str, payload: Dict, timeout: int = 60) -> Tuple[D
         conn.request("POST", parsed.path, body=body,
                      headers={"Content-Type": "application/json", "Accept": "text/event-stream"})
         resp = conn.getresponse()
+        if resp.status != 200:  # e.g. 429/503 from admission control
+            raise RuntimeError(f"HTTP Error {resp.status}: {resp.reason}")
         buf = ""
         current_event = None
         for raw_line in resp:
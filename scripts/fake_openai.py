@@ -0,0 +1,301 @@
+"""
+Local OpenAI stand-in for offline load tests.
+
+Serves the two endpoints the backend uses, with configurable latency:
+  POST /v1/chat/completions   JSON or SSE stream (stream=true), usage included
+  POST /v1/embeddings         deterministic feature-hashed unit vectors
+
+Latency model per chat call: time to first token ~ lognormal(median, sigma),
+then tokens at --tokens-per-s (non-streamed calls sleep for the whole
+generation). Embedding calls sleep ~ lognormal(--embed-latency-ms, sigma).
+
+Responses are shaped so the pipeline takes its normal paths:
+  - normalize_input prompts get the original message echoed back
+  - fused preprocessing prompts get the message echoed as normalized/standalone
+    query, no intent, no foods
+  - response_format=json_object gets {"intent": null, "confidence": "low", "ids": []}
+    (no intent override, recipe selection falls back to keyword scoring)
+  - everything else gets deterministic German filler text (seeded by the prompt)
+
+Embeddings hash words into buckets, so texts sharing words land close
+together and retrieval over an ingested collection still ranks sensibly.
+
+Usage:
+  python scripts/fake_openai.py [--port 8089] [--latency-ms 400] [--tokens-per-s 60]
+  OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=sk-fake uvicorn app.main:app
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_FILLER = (
+    "Laut Kursmaterial kommt es vor allem auf die richtige Kombination der Lebensmittel an. "
+    "Obst wird am besten allein und auf leeren Magen gegessen, danach gilt eine kurze Wartezeit. "
+    "Kohlenhydrate und konzentriertes Eiweiß werden getrennt, neutrale Lebensmittel wie Gemüse "
+    "und Salat passen zu beiden Gruppen. Fett in kleinen Mengen ist unproblematisch. "
+    "Achte auf ausreichend Wasser zwischen den Mahlzeiten und auf frische, wenig verarbeitete Zutaten. "
+    "Wenn du magst, schlage ich dir eine passende Kombination für deine nächste Mahlzeit vor."
+).split()
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 400.0        # median time to first token (chat)
+    sigma: float = 0.35              # lognormal spread; 0 = fixed latency
+    tokens_per_s: float = 60.0       # generation speed (0 = instant)
+    answer_tokens: int = 120         # tokens for free-text answers (capped by max_tokens)
+    embed_latency_ms: float = 80.0   # median embedding call latency
+    embed_dim: int = 1536
+    seed: int = 0
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def inc(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def _lognormal_s(median_ms: float, sigma: float, rng: random.Random) -> float:
+    if median_ms <= 0:
+        return 0.0
+    if sigma <= 0:
+        return median_ms / 1000
+    return median_ms * rng.lognormvariate(0.0, sigma) / 1000
+
+
+def _seed_of(text: str, seed: int) -> int:
+    return int.from_bytes(hashlib.sha256(f"{seed}:{text}".encode("utf-8")).digest()[:8], "big")
+
+
+def embed_text(text: str, dim: int = 1536) -> List[float]:
+    """Deterministic unit vector: signed feature hashing of lowercased words."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in _WORD_RE.findall(text.lower()):
+        h = hashlib.blake2b(word[:6].encode("utf-8"), digest_size=8).digest()
+        idx = int.from_bytes(h[:4], "big") % dim
+        vec[idx] += 1.0 if h[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0:
+        vec[0], norm = 1.0, 1.0
+    return (vec / norm).tolist()
+
+
+def _prompt_of(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for m in messages or []:
+        content = m.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(p.get("text", "") for p in content if isinstance(p, dict))
+    return "\n".join(parts)
+
+
+def respond(body: Dict[str, Any], cfg: FakeConfig) -> str:
+    """Completion text for a chat request (see module docstring)."""
+    prompt = _prompt_of(body.get("messages", []))
+    if "**Normalisierte Nachricht:**" in prompt and "**Aktuelle Nachricht:**" in prompt:
+        current = prompt.split("**Aktuelle Nachricht:**", 1)[1]
+        return current.split("**Normalisierte Nachricht:**", 1)[0].strip()
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        if '"standalone_query"' in prompt and "AKTUELLE NACHRICHT:" in prompt:
+            current = prompt.split("AKTUELLE NACHRICHT:", 1)[1].split("\n\n", 1)[0].strip()
+            return json.dumps({"normalized": current, "intent": None, "intent_confidence": "low", "foods": "",
+                               "needs_clarification": None, "standalone_query": current}, ensure_ascii=False)
+        return json.dumps({"intent": None, "confidence": "low", "ids": []})
+
+    n = min(cfg.answer_tokens, int(body.get("max_tokens") or cfg.answer_tokens))
+    rng = random.Random(_seed_of(prompt, cfg.seed))
+    start = rng.randrange(len(_FILLER))
+    words = [_FILLER[(start + i) % len(_FILLER)] for i in range(max(1, int(n * 0.75)))]
+    return " ".join(words)
+
+
+def _split_tokens(text: str) -> List[str]:
+    """Roughly token-sized pieces (word + trailing space)."""
+    return re.findall(r"\S+\s*", text) or [text]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOpenAIServer"
+
+    def log_message(self, fmt: str, *args: Any) -> None:  # quiet
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            return json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        path = self.path.split("?", 1)[0].rstrip("/")
+        try:
+            if path.endswith("/chat/completions"):
+                self._chat(body)
+            elif path.endswith("/embeddings"):
+                self._embeddings(body)
+            else:
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.stats.inc("client_disconnects")
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        cfg, rng = self.server.config, self.server.rng()
+        self.server.stats.inc("chat_stream" if body.get("stream") else "chat")
+        text = respond(body, cfg)
+        pieces = _split_tokens(text)
+        per_token = 1.0 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0.0
+        prompt_tokens = max(1, len(_prompt_of(body.get("messages", []))) // 4)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "fake-model")
+        time.sleep(_lognormal_s(cfg.latency_ms, cfg.sigma, rng))
+
+        if not body.get("stream"):
+            time.sleep(per_token * len(pieces))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                          "total_tokens": prompt_tokens + len(pieces)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def _event(delta: Dict[str, Any], finish: Optional[str] = None) -> None:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        _event({"role": "assistant", "content": ""})
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(per_token)
+            _event({"content": piece})
+        _event({}, "stop")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _embeddings(self, body: Dict[str, Any]) -> None:
+        cfg = self.server.config
+        self.server.stats.inc("embeddings")
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(_lognormal_s(cfg.embed_latency_ms, cfg.sigma, self.server.rng()))
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vec = embed_text(str(text), cfg.embed_dim)
+            if as_base64:
+                vec = base64.b64encode(np.asarray(vec, dtype=np.float32).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vec})
+        tokens = sum(max(1, len(str(t)) // 4) for t in inputs)
+        self._send_json(200, {"object": "list", "data": data, "model": body.get("model", "fake-embedding"),
+                              "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FakeConfig] = None):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeConfig()
+        self.stats = _Stats()
+        self._rng_lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+
+    def rng(self) -> random.Random:
+        """Per-request RNG drawn from the seeded master (latency jitter only)."""
+        with self._rng_lock:
+            return random.Random(self._rng.getrandbits(64))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> threading.Thread:
+        """Serve in a daemon thread (stop with shutdown())."""
+        thread = threading.Thread(target=self.serve_forever, name="fake-openai", daemon=True)
+        thread.start()
+        return thread
+
+
+def add_config_args(parser: argparse.ArgumentParser) -> None:
+    d = FakeConfig()
+    parser.add_argument("--latency-ms", type=float, default=d.latency_ms, help="median time to first token")
+    parser.add_argument("--sigma", type=float, default=d.sigma, help="lognormal latency spread (0 = fixed)")
+    parser.add_argument("--tokens-per-s", type=float, default=d.tokens_per_s, help="streaming rate (0 = instant)")
+    parser.add_argument("--answer-tokens", type=int, default=d.answer_tokens, help="length of free-text answers")
+    parser.add_argument("--embed-latency-ms", type=float, default=d.embed_latency_ms)
+    parser.add_argument("--embed-dim", type=int, default=d.embed_dim)
+    parser.add_argument("--seed", type=int, default=d.seed)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        latency_ms=args.latency_ms, sigma=args.sigma, tokens_per_s=args.tokens_per_s,
+        answer_tokens=args.answer_tokens, embed_latency_ms=args.embed_latency_ms,
+        embed_dim=args.embed_dim, seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, config_from_args(args))
+    print(f"[FAKE_OPENAI] serving on {server.base_url} ({server.config})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[FAKE_OPENAI] calls: {server.stats.counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,11 @@
 import os
+import re
+import json
 import argparse
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 
 import yaml
 from dotenv import load_dotenv
@@ -20,6 +24,12 @@ EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1200"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST", os.path.join(CHROMA_DIR, f"ingest_manifest_{COLLECTION_NAME}.json")
+)
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
@@ -172,40 +182,70 @@ def ensure_metadata_defaults(meta: Dict[str, Any]) -> Dict[str, Any]:
     return result
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--reset", action="store_true", help="Delete & recreate collection")
-    args = ap.parse_args()
+def _sanitize_chroma_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for k, v in meta.items():
+        if v is None:
+            continue
+        if isinstance(v, (list, tuple, set)):
+            out[k] = ", ".join(str(x) for x in v)
+        elif isinstance(v, dict):
+            out[k] = json.dumps(v, ensure_ascii=False)
+        else:
+            out[k] = v
+    return out
+
+
+def _normalize_source_to_mdpath(meta: Dict[str, Any]) -> Dict[str, Any]:
+    # Ziel: source soll immer der relative MD-Pfad sein (für Debugging/Quellenanzeige).
+    # Nur wenn source wie ein PDF-Name aussieht und wir einen md-Pfad in meta haben.
+    src = str(meta.get("source") or "")
+    if src.lower().endswith(".pdf"):
+        for k in ("md_path", "path", "file_path", "file", "id"):
+            v = meta.get(k)
+            if v and str(v).endswith(".md"):
+                meta["origin_pdf"] = src
+                meta["source"] = str(v)
+                break
+    return meta
 
-    if not PAGES_DIR.exists():
-        raise SystemExit("content/pages existiert nicht. Lege Dateien dort ab.")
 
-    files = sorted(
-        [
-            p
-            for p in PAGES_DIR.glob("**/*")
-            if p.is_file() and p.suffix.lower() in [".md", ".txt"]
-        ]
-    )
-    if not files:
-        raise SystemExit("Keine Dateien in content/pages gefunden (.md/.txt).")
+def _fill_page_from_source(meta: Dict[str, Any]) -> Dict[str, Any]:
+    if "page" not in meta:
+        src = str(meta.get("source") or "")
+        mo = re.search(r"page-(\d+)\.md", src)
+        if mo:
+            meta["page"] = int(mo.group(1))
+    return meta
 
-    Path(CHROMA_DIR).mkdir(parents=True, exist_ok=True)
-    chroma = chromadb.PersistentClient(
-        path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False)
-    )
 
-    if args.reset:
-        try:
-            chroma.delete_collection(COLLECTION_NAME)
-        except Exception:
-            pass
+def prepare_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply all Chroma metadata fixes in the order the collection expects."""
+    meta = _sanitize_chroma_metadata(meta)
+    meta = _fill_page_from_source(meta)
+    meta = _normalize_source_to_mdpath(meta)
+    # Ensure all metadata has safe defaults (no None values)
+    return ensure_metadata_defaults(meta)
 
-    col = chroma.get_or_create_collection(name=COLLECTION_NAME)
 
-    ids: List[str] = []
-    docs: List[str] = []
-    metas: List[Dict[str, Any]] = []
+def chunk_hash(doc: str, meta: Dict[str, Any]) -> str:
+    """
+    Content hash of one chunk: text + final metadata (without the hash itself)
+    + embedding model and chunking config, so a manifest rebuilt from Chroma
+    never matches vectors of another model.
+    """
+    payload = {k: v for k, v in meta.items() if k != "content_hash"}
+    payload["_embedding"] = [EMBED_MODEL, CHUNK_SIZE, CHUNK_OVERLAP]
+    h = hashlib.sha256()
+    h.update(doc.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+def collect_chunks(files: List[Path]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Read, split and chunk all page files → [(id, doc, meta), ...] incl. content_hash."""
+    chunks_out: List[Tuple[str, str, Dict[str, Any]]] = []
 
     for fp in files:
         raw = fp.read_text(encoding="utf-8", errors="ignore")
@@ -238,93 +278,227 @@ def main():
         }
 
         for i, ch in enumerate(chunks):
-            ids.append(f"{rel}::chunk_{i}")
-            docs.append(ch)
             m = dict(base_meta)
             m["chunk"] = i
-            metas.append(m)
+            m = prepare_metadata(m)
+            m["content_hash"] = chunk_hash(ch, m)
+            chunks_out.append((f"{rel}::chunk_{i}", ch, m))
+
+    return chunks_out
+
+
+# ── Manifest (incremental mode) ───────────────────────────────────────
+
+def _manifest_header() -> Dict[str, Any]:
+    return {
+        "collection": COLLECTION_NAME,
+        "embed_model": EMBED_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+
 
-    # ggf. existierende gleiche IDs löschen
+def read_manifest(path: Path) -> Tuple[str, Dict[str, str]]:
+    """
+    Load the manifest → (status, {chunk_id: content_hash}).
+
+    status: "ok", "missing" (no / unreadable file) or "mismatch" (written for
+    another collection, embedding model or chunking config; its chunks are
+    not returned and the collection has to be rebuilt).
+    """
+    if not path.exists():
+        return "missing", {}
     try:
-        col.delete(ids=ids)
-    except Exception:
-        pass
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warnung: Manifest {path} unlesbar ({e}) → vollständiger Abgleich.")
+        return "missing", {}
+    header = _manifest_header()
+    if any(data.get(k) != v for k, v in header.items()):
+        return "mismatch", {}
+    chunks = data.get("chunks", {})
+    return "ok", dict(chunks) if isinstance(chunks, dict) else {}
 
-    BATCH = 64
-    for i in range(0, len(docs), BATCH):
-        batch_docs = docs[i : i + BATCH]
-        batch_ids = ids[i : i + BATCH]
-        batch_metas = metas[i : i + BATCH]
-        vecs = embed_batch(batch_docs)
-        import json
-        def _sanitize_chroma_metadata(_m):
-            _out = {}
-            for _k, _v in _m.items():
-                if _v is None:
-                    continue
-                if isinstance(_v, (list, tuple, set)):
-                    _out[_k] = ", ".join(str(x) for x in _v)
-                elif isinstance(_v, dict):
-                    _out[_k] = json.dumps(_v, ensure_ascii=False)
-                else:
-                    _out[_k] = _v
-            return _out
-        batch_metas = [_sanitize_chroma_metadata(_m) for _m in batch_metas]
 
+def load_manifest(path: Path) -> Dict[str, str]:
+    """{chunk_id: content_hash} from the manifest ({} if missing or mismatched)."""
+    return read_manifest(path)[1]
 
-        def _normalize_source_to_mdpath(_m):
 
-            # Ziel: source soll immer der relative MD-Pfad sein (für Debugging/Quellenanzeige)
+def save_manifest(path: Path, chunks: Dict[str, str]) -> None:
+    """Write the manifest atomically so an interrupted run never leaves a torn file."""
+    payload = dict(_manifest_header())
+    payload["chunks"] = dict(sorted(chunks.items()))
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
 
-            # ingest setzt typischerweise zusätzlich eine "path"/"file"/"id"-Info irgendwo; hier greifen wir auf source nur dann zu,
 
-            # wenn es wie ein PDF-Name aussieht und wir einen md-Pfad im _m haben.
+def manifest_from_collection(col) -> Dict[str, str]:
+    """Rebuild the manifest from content_hash metadata already stored in Chroma."""
+    try:
+        res = col.get(include=["metadatas"])
+    except Exception:
+        return {}
+    out: Dict[str, str] = {}
+    for cid, meta in zip(res.get("ids") or [], res.get("metadatas") or []):
+        h = (meta or {}).get("content_hash")
+        if h:
+            out[cid] = h
+    return out
+
+
+def plan_sync(
+    current: Dict[str, str],
+    manifest: Dict[str, str],
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Diff current chunk hashes against the manifest.
 
-            _src = str(_m.get("source") or "")
+    Returns (to_embed, to_delete, unchanged) as sorted id lists.
+    """
+    to_embed = sorted(cid for cid, h in current.items() if manifest.get(cid) != h)
+    to_delete = sorted(cid for cid in manifest if cid not in current)
+    unchanged = sorted(cid for cid, h in current.items() if manifest.get(cid) == h)
+    return to_embed, to_delete, unchanged
+
+
+def embed_and_upsert(
+    col,
+    items: List[Tuple[str, str, Dict[str, Any]]],
+    manifest: Dict[str, str],
+    manifest_path: Optional[Path],
+    batch_size: int,
+    workers: int,
+) -> int:
+    """
+    Embed items in batches with at most `workers` concurrent embedding calls.
 
-            if _src.lower().endswith(".pdf"):
+    Chroma writes stay on the calling thread. After every stored batch the
+    manifest is persisted, so an interrupted run resumes with the remainder.
+    """
+    batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        pending = {}
+        batch_iter = iter(batches)
+
+        def _submit_next() -> bool:
+            batch = next(batch_iter, None)
+            if batch is None:
+                return False
+            pending[ex.submit(embed_batch, [doc for _, doc, _ in batch])] = batch
+            return True
+
+        # Bounded in-flight window: never more than 2×workers batches queued
+        for _ in range(max(1, workers) * 2):
+            if not _submit_next():
+                break
 
-                for k in ("md_path","path","file_path","file","id"):
+        while pending:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                batch = pending.pop(fut)
+                vecs = fut.result()
+                col.upsert(
+                    ids=[cid for cid, _, _ in batch],
+                    documents=[doc for _, doc, _ in batch],
+                    metadatas=[meta for _, _, meta in batch],
+                    embeddings=vecs,
+                )
+                for cid, _, meta in batch:
+                    manifest[cid] = meta["content_hash"]
+                if manifest_path is not None:
+                    save_manifest(manifest_path, manifest)
+                done += len(batch)
+                print(f"  … {done}/{len(items)} Chunks eingebettet")
+                _submit_next()
+    return done
 
-                    v = _m.get(k)
 
-                    if v and str(v).endswith(".md"):
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reset", action="store_true", help="Delete & recreate collection")
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only embed new/changed chunks (content-hash manifest), delete removed ones",
+    )
+    ap.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Concurrent embedding calls")
+    ap.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding call")
+    args = ap.parse_args()
 
-                        _m["origin_pdf"] = _src
+    if not PAGES_DIR.exists():
+        raise SystemExit("content/pages existiert nicht. Lege Dateien dort ab.")
 
-                        _m["source"] = str(v)
+    files = sorted(
+        [
+            p
+            for p in PAGES_DIR.glob("**/*")
+            if p.is_file() and p.suffix.lower() in [".md", ".txt"]
+        ]
+    )
+    if not files:
+        raise SystemExit("Keine Dateien in content/pages gefunden (.md/.txt).")
 
-                        break
+    Path(CHROMA_DIR).mkdir(parents=True, exist_ok=True)
+    chroma = chromadb.PersistentClient(
+        path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False)
+    )
+    manifest_path = Path(MANIFEST_PATH)
 
-            return _m
+    # Vektoren eines anderen Modells (ggf. andere Dimension) nie weiterverwenden
+    reset = args.reset
+    if read_manifest(manifest_path)[0] == "mismatch" and not reset:
+        print("Manifest passt nicht zu Collection/Modell/Chunking → Collection wird neu aufgebaut.")
+        reset = True
 
+    if reset:
+        try:
+            chroma.delete_collection(COLLECTION_NAME)
+        except Exception:
+            pass
+        manifest_path.unlink(missing_ok=True)
 
-        def _fill_page_from_source(_m):
-            import re as _re
-            if "page" not in _m:
-                _src = str(_m.get("source") or "")
-                _mo = _re.search(r"page-(\d+)\.md", _src)
-                if _mo:
-                    _m["page"] = int(_mo.group(1))
-            return _m
+    col = chroma.get_or_create_collection(name=COLLECTION_NAME)
 
-        batch_metas = [_fill_page_from_source(_m) for _m in batch_metas]
+    chunks = collect_chunks(files)
+    current = {cid: meta["content_hash"] for cid, _, meta in chunks}
 
+    if args.incremental:
+        manifest = load_manifest(manifest_path)
+        if not manifest and not reset:
+            manifest = manifest_from_collection(col)
+    else:
+        manifest = {}
 
-        batch_metas = [_normalize_source_to_mdpath(_m) for _m in batch_metas]
+    to_embed, to_delete, unchanged = plan_sync(current, manifest)
+    if not args.incremental:
+        # Vollständiger Lauf: ggf. existierende gleiche IDs + verwaiste IDs löschen
+        to_delete = sorted(set(load_manifest(manifest_path)) - set(current))
+        try:
+            col.delete(ids=list(current))
+        except Exception:
+            pass
+
+    print(
+        f"Plan: {len(to_embed)} neu/geändert, {len(to_delete)} entfernt, "
+        f"{len(unchanged)} unverändert ({len(chunks)} Chunks gesamt)."
+    )
 
-        # Ensure all metadata has safe defaults (no None values)
-        batch_metas = [ensure_metadata_defaults(_m) for _m in batch_metas]
+    if to_delete:
+        col.delete(ids=to_delete)
+        for cid in to_delete:
+            manifest.pop(cid, None)
+    save_manifest(manifest_path, manifest)
 
-        col.add(
-            ids=batch_ids,
-            documents=batch_docs,
-            metadatas=batch_metas,
-            embeddings=vecs,
-        )
+    embed_set = set(to_embed)
+    items = [c for c in chunks if c[0] in embed_set]
+    embed_and_upsert(col, items, manifest, manifest_path, args.batch_size, args.workers)
 
     print(
-        f"OK: {len(docs)} Chunks indexiert in '{COLLECTION_NAME}' ({CHROMA_DIR})."
+        f"OK: {len(items)} Chunks eingebettet, {len(to_delete)} gelöscht, "
+        f"{len(unchanged)} übersprungen in '{COLLECTION_NAME}' ({CHROMA_DIR})."
     )
 
 
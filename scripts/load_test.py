@@ -0,0 +1,284 @@
+"""
+Offline load test: the FastAPI app against a local OpenAI stand-in.
+
+Starts scripts/fake_openai.py in-process, points a uvicorn subprocess at it
+(OPENAI_BASE_URL, temp DB_PATH/CHROMA_DIR, course material ingested with
+the fake embeddings) and drives /api/v1/chat and /api/v1/chat/stream with
+concurrent virtual users. Each user replays SCENARIOS from
+scripts/bot_eval_suite.py (first turn + follow-up in one conversation).
+
+Reports per endpoint: throughput, p50/p95/p99 total latency and, for the
+stream endpoint, time to first delta. Requests shed by admission control
+(429/503) are counted separately and excluded from the percentiles.
+--sweep runs one load phase per user count against the same app, to check
+that latency of admitted turns stays flat once the server is saturated.
+No real API key or network needed.
+
+Usage:
+  python scripts/load_test.py --users 8 --duration 60
+  python scripts/load_test.py --users 4 --iterations 5 --endpoint stream --latency-ms 800
+  python scripts/load_test.py --base-url http://localhost:8000 --users 2   # existing server
+  ADMISSION_MAX_INFLIGHT=8 python scripts/load_test.py --sweep 4,8,16,32,64 --duration 20
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bot_eval_suite import SCENARIOS, _post_json, _read_sse_stream  # noqa: E402
+from fake_openai import FakeOpenAIServer, add_config_args, config_from_args  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _wait_healthy(base_url: str, proc: subprocess.Popen, timeout_s: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/v1/health", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            time.sleep(0.3)
+    raise RuntimeError(f"app not healthy after {timeout_s:.0f}s")
+
+
+def start_app(fake_url: str, workdir: Path, port: int, ingest: bool, log_path: Path) -> subprocess.Popen:
+    """Ingest (optional) and launch uvicorn against the fake; returns the process."""
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": fake_url,
+        "OPENAI_API_KEY": "sk-fake",
+        "DB_PATH": str(workdir / "chat.db"),
+        "CHROMA_DIR": str(workdir / "chroma"),
+        "ONTOLOGY_SNAPSHOT_PATH": str(workdir / "ontology_snapshot.pkl"),
+        "LLM_CALLS_LOG_INTERVAL_S": "0",
+    }
+    log = open(log_path, "w", encoding="utf-8")
+    if ingest:
+        t0 = time.monotonic()
+        subprocess.run([sys.executable, "scripts/ingest.py"], cwd=ROOT, env=env,
+                       stdout=log, stderr=subprocess.STDOUT, check=True)
+        print(f"[LOAD] ingested course material in {time.monotonic() - t0:.1f}s")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return proc
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, sample: Dict[str, Any]) -> None:
+        with self._lock:
+            self.samples.append(sample)
+
+
+def _turn(base_url: str, endpoint: str, payload: Dict[str, Any], timeout: int) -> Dict[str, Any]:
+    if endpoint == "stream":
+        resp, _t_meta, t_delta, total = _read_sse_stream(base_url, payload, timeout=timeout)
+        # _read_sse_stream reports total when no delta arrived (engine-only answers)
+        ttfd = t_delta if t_delta < total else None
+    else:
+        resp, total = _post_json(base_url, payload, timeout=timeout)
+        ttfd = None
+    ok = bool(resp) and "error" not in resp and bool(resp.get("conversationId"))
+    error = str(resp.get("error") or "")
+    shed = next((code for code in (429, 503) if error.startswith(f"HTTP Error {code}")), None)
+    return {"endpoint": endpoint, "total_ms": total, "ttfd_ms": ttfd, "ok": ok, "shed": shed,
+            "conversation_id": resp.get("conversationId"), "error": resp.get("error")}
+
+
+def virtual_user(idx: int, args: argparse.Namespace, stop_at: float, recorder: Recorder) -> None:
+    rng = random.Random(args.seed * 1000 + idx)
+    endpoints = ["chat", "stream"] if args.endpoint == "both" else [args.endpoint]
+    guest_id = f"load-{idx}-{uuid.uuid4().hex[:8]}"
+    iteration = 0
+    while time.monotonic() < stop_at and (not args.iterations or iteration < args.iterations):
+        scenario = rng.choice(SCENARIOS)
+        endpoint = endpoints[iteration % len(endpoints)]
+        messages = [scenario["initial_user_message"]]
+        if scenario.get("followup_user_message") and not args.no_followups:
+            messages.append(scenario["followup_user_message"])
+        conv_id = None
+        for turn_idx, message in enumerate(messages):
+            payload = {"message": message, "guestId": guest_id, "conversationId": conv_id,
+                       "intent": scenario["intent"] if turn_idx == 0 else None}
+            sample = _turn(args.base_url, endpoint, payload, args.timeout)
+            sample.update({"user": idx, "scenario": scenario["id"], "turn": turn_idx,
+                           "finished_at": time.monotonic()})
+            recorder.add(sample)
+            conv_id = sample["conversation_id"] or conv_id
+            if args.think_ms:
+                time.sleep(args.think_ms / 1000 * rng.uniform(0.5, 1.5))
+        iteration += 1
+
+
+def summarize(samples: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"wall_s": round(wall_s, 2), "endpoints": {}}
+    for endpoint in sorted({s["endpoint"] for s in samples}):
+        rows = [s for s in samples if s["endpoint"] == endpoint]
+        ok = [s for s in rows if s["ok"]]
+        totals = [s["total_ms"] for s in ok]
+        ttfds = [s["ttfd_ms"] for s in ok if s["ttfd_ms"] is not None]
+        shed = [s for s in rows if s.get("shed")]
+        report["endpoints"][endpoint] = {
+            "requests": len(rows),
+            "errors": len(rows) - len(ok) - len(shed),
+            "shed_429": sum(1 for s in shed if s["shed"] == 429),
+            "shed_503": sum(1 for s in shed if s["shed"] == 503),
+            "throughput_rps": round(len(ok) / wall_s, 2) if wall_s else None,
+            **{f"p{q}_ms": _round(_percentile(totals, q / 100)) for q in (50, 95, 99)},
+            **{f"ttfd_p{q}_ms": _round(_percentile(ttfds, q / 100)) for q in (50, 95, 99)},
+            "ttfd_samples": len(ttfds),
+        }
+    return report
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def print_report(report: Dict[str, Any], args: argparse.Namespace, users: int) -> None:
+    print(f"\n[LOAD] {users} users, {report['wall_s']}s wall, fake latency {args.latency_ms:.0f}ms "
+          f"(sigma {args.sigma}), {args.tokens_per_s:.0f} tok/s")
+    print(f"{'endpoint':8} {'req':>5} {'err':>4} {'429':>4} {'503':>4} {'rps':>6} {'p50':>7} {'p95':>7} {'p99':>7}"
+          f" {'ttfd50':>7} {'ttfd95':>7} {'ttfd99':>7}")
+    for endpoint, r in report["endpoints"].items():
+        cells = [r[k] for k in ("p50_ms", "p95_ms", "p99_ms", "ttfd_p50_ms", "ttfd_p95_ms", "ttfd_p99_ms")]
+        print(f"{endpoint:8} {r['requests']:5d} {r['errors']:4d} {r['shed_429']:4d} {r['shed_503']:4d} "
+              f"{r['throughput_rps'] or 0:6.2f} "
+              + " ".join(f"{'-' if c is None else int(c):>7}" for c in cells))
+
+
+def run_phase(args: argparse.Namespace, users: int) -> Dict[str, Any]:
+    """One load phase with `users` virtual users; returns report + samples."""
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + (args.duration if not args.iterations else float("inf"))
+    threads = [threading.Thread(target=virtual_user, args=(i, args, stop_at, recorder), daemon=True)
+               for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report = summarize(recorder.samples, time.monotonic() - started)
+    report["users"] = users
+    return {"report": report, "samples": recorder.samples}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--users", type=int, default=4, help="concurrent virtual users")
+    p.add_argument("--sweep", default=None, help="comma-separated user counts, one phase each (e.g. 4,16,64)")
+    p.add_argument("--duration", type=float, default=30.0, help="seconds to run (ends after the current turn)")
+    p.add_argument("--iterations", type=int, default=0, help="scenarios per user (0 = until --duration)")
+    p.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both")
+    p.add_argument("--think-ms", type=float, default=0.0, help="pause between turns of one user")
+    p.add_argument("--no-followups", action="store_true", help="send only the first turn of each scenario")
+    p.add_argument("--timeout", type=int, default=120, help="per-request timeout in seconds")
+    p.add_argument("--base-url", default=None, help="use a running backend instead of starting one")
+    p.add_argument("--no-ingest", action="store_true", help="skip ingesting course material (empty collection)")
+    p.add_argument("--keep", action="store_true", help="keep the temp dir (DB, chroma, app log)")
+    p.add_argument("--json", dest="json_out", default=None, help="write the report (and samples) to this file")
+    add_config_args(p)
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="kursbot-load-"))
+    fake: Optional[FakeOpenAIServer] = None
+    proc: Optional[subprocess.Popen] = None
+    try:
+        if args.base_url is None:
+            fake = FakeOpenAIServer(config=config_from_args(args))
+            fake.start()
+            port = _free_port()
+            args.base_url = f"http://127.0.0.1:{port}"
+            proc = start_app(fake.base_url, workdir, port, not args.no_ingest, workdir / "app.log")
+            _wait_healthy(args.base_url, proc)
+            print(f"[LOAD] app on {args.base_url}, fake OpenAI on {fake.base_url}, workdir {workdir}")
+            fake.stats.counts.clear()  # count load-phase calls only
+
+        levels = [int(n) for n in args.sweep.split(",")] if args.sweep else [args.users]
+        phases = []
+        for users in levels:
+            if fake is not None:
+                fake.stats.counts.clear()
+            phase = run_phase(args, users)
+            report, samples = phase["report"], phase["samples"]
+            if fake is not None:
+                report["fake_openai_calls"] = dict(fake.stats.counts)
+            print_report(report, args, users)
+            if fake is not None:
+                print(f"[LOAD] fake OpenAI calls: {report['fake_openai_calls']}")
+            errors = [s for s in samples if not s["ok"] and not s["shed"]][:3]
+            for s in errors:
+                print(f"[LOAD] error sample: {s['endpoint']} {s['scenario']} turn {s['turn']}: {s['error']}")
+            phases.append(phase)
+        if len(phases) > 1:
+            print("\n[LOAD] sweep (admitted turns only):")
+            print(f"{'users':>5} {'endpoint':8} {'req':>5} {'shed':>5} {'p50':>7} {'p99':>7}")
+            for phase in phases:
+                r = phase["report"]
+                for endpoint, e in r["endpoints"].items():
+                    print(f"{r['users']:5d} {endpoint:8} {e['requests']:5d} {e['shed_429'] + e['shed_503']:5d} "
+                          f"{'-' if e['p50_ms'] is None else int(e['p50_ms']):>7} "
+                          f"{'-' if e['p99_ms'] is None else int(e['p99_ms']):>7}")
+        if args.json_out:
+            with open(args.json_out, "w", encoding="utf-8") as f:
+                if len(phases) == 1:
+                    json.dump({"args": vars(args), **phases[0]}, f, indent=2)
+                else:
+                    json.dump({"args": vars(args), "phases": phases}, f, indent=2)
+            print(f"[LOAD] wrote {args.json_out}")
+        return 0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if fake is not None:
+            fake.shutdown()
+            fake.server_close()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,307 @@
+"""
+Microbenchmarks for the engine, ontology, prompt and DB hot paths.
+
+Each benchmark times one operation (e.g. "look up all gold-matrix names",
+"one get_last_n_messages query") with timeit-style autoranging: a batch is
+grown until it takes >= 20 ms, then --rounds batches are timed and the
+median per-op time is reported. --compare flags a benchmark when its best
+(min) per-op time is more than --threshold slower than the baseline's; the
+min is far less sensitive to a busy machine than the median. No LLM or
+network calls; the DB benchmarks run against a synthetic SQLite file in a
+temp dir.
+
+Inputs are the repo's own fixtures: the gold-matrix cases from
+tests/test_food_core_gold_matrix.py, real-world menus/dishes from the
+characterization tests, SCENARIOS messages from scripts/bot_eval_suite.py
+and chunks of content/pages.
+
+Usage:
+  python scripts/microbench.py                                 # run + print
+  python scripts/microbench.py --save bench_baseline.json      # store baseline
+  python scripts/microbench.py --compare bench_baseline.json   # exit 1 on regression
+  python scripts/microbench.py --filter db. --rounds 9 --threshold 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")  # app.clients needs a key; nothing is called
+
+MIN_BATCH_S = 0.02
+DEFAULT_THRESHOLD = 0.15
+
+Bench = Tuple[str, Callable[[], Any]]
+
+
+# ── Timing ────────────────────────────────────────────────────────────
+
+def _time_batch(fn: Callable[[], Any], number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - t0
+
+
+def run_bench(fn: Callable[[], Any], rounds: int = 5, min_batch_s: float = MIN_BATCH_S) -> Dict[str, float]:
+    """Per-op timings in microseconds: median/min/max over `rounds` autoranged batches."""
+    fn()  # warm caches / lazy indexes
+    number = 1
+    while True:
+        elapsed = _time_batch(fn, number)
+        if elapsed >= min_batch_s or number >= 1_000_000:
+            break
+        number *= 2 if elapsed * 2 >= min_batch_s else 10
+    per_op = sorted(_time_batch(fn, number) / number * 1e6 for _ in range(rounds))
+    return {
+        "median_us": round(statistics.median(per_op), 3),
+        "min_us": round(per_op[0], 3),
+        "max_us": round(per_op[-1], 3),
+        "ops_per_batch": number,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Per-benchmark ratio current/baseline (min per-op); status regression/improved/ok/new."""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, cur in current.get("results", {}).items():
+        base = base_results.get(name)
+        if base is None or not base.get("min_us"):
+            rows.append({"name": name, "status": "new", "current_us": cur["min_us"]})
+            continue
+        ratio = cur["min_us"] / base["min_us"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"name": name, "status": status, "ratio": round(ratio, 3),
+                     "baseline_us": base["min_us"], "current_us": cur["min_us"]})
+    return rows
+
+
+# ── Fixtures ──────────────────────────────────────────────────────────
+
+def _gold_item_lists() -> List[List[str]]:
+    from tests.test_food_core_gold_matrix import ENGINE_GOLD_CASES_P0, ENGINE_GOLD_CASES_VOLLWERT
+    return [case["raw_items"] for case in ENGINE_GOLD_CASES_P0 + ENGINE_GOLD_CASES_VOLLWERT]
+
+
+REAL_MENUS = [
+    "1. Reis mit Brokkoli\n2. Grüner Smoothie\n3. Pommes\n4. Spaghetti Bolognese\n",
+    "Jar breakfast: fried chicken, poached egg and pickle",
+    "Spaghetti Bolognese",
+    "Ist Avocadotoast zum Frühstück ok?",
+    "Veganer Burger mit Patty, Salat, Gurke und Ketchup",
+    "Linsensuppe mit Gemüse",
+    "Pad Thai mit Tofu und Erdnüssen",
+]
+
+
+def _chat_messages() -> List[str]:
+    from bot_eval_suite import SCENARIOS
+    messages = []
+    for s in SCENARIOS:
+        messages.append(s["initial_user_message"])
+        if s.get("followup_user_message"):
+            messages.append(s["followup_user_message"])
+    return messages
+
+
+def _course_chunks(n: int = 8) -> Tuple[List[str], List[Dict[str, Any]]]:
+    import ingest
+    files = sorted((ROOT / "content" / "pages").rglob("*.md"))
+    cwd = os.getcwd()
+    os.chdir(ROOT)  # collect_chunks paths are relative to the repo root
+    try:
+        chunks = ingest.collect_chunks([f.relative_to(ROOT) for f in files])
+    finally:
+        os.chdir(cwd)
+    step = max(1, len(chunks) // n)
+    picked = chunks[::step][:n]
+    return [doc for _, doc, _ in picked], [meta for _, _, meta in picked]
+
+
+# ── Benchmarks ────────────────────────────────────────────────────────
+
+def trennkost_benches() -> List[Bench]:
+    from trennkost.analyzer import analyze_text
+    from trennkost.engine import TrennkostEngine
+    from trennkost.normalizer import normalize_dish
+    from trennkost.ontology import get_ontology
+
+    ontology = get_ontology()
+    engine = TrennkostEngine()
+    item_lists = _gold_item_lists()
+    names = sorted({name for items in item_lists for name in items}) + ["xyz unbekannt", "gegrilltes Hähnchen"]
+    analyses = [normalize_dish(dish_name=" + ".join(items), raw_items=items) for items in item_lists]
+
+    return [
+        (f"ontology.lookup[{len(names)} names]", lambda: [ontology.lookup(n) for n in names]),
+        (f"normalize_dish[{len(item_lists)} gold cases]",
+         lambda: [normalize_dish(dish_name=" + ".join(items), raw_items=items) for items in item_lists]),
+        (f"engine.evaluate[{len(analyses)} gold cases]",
+         lambda: [engine.evaluate(a, mode="trennkost") for a in analyses]),
+        (f"analyze_text[{len(REAL_MENUS)} menus]",
+         lambda: [analyze_text(t, llm_fn=None, mode="strict", evaluation_mode="strict") for t in REAL_MENUS]),
+    ]
+
+
+def pipeline_benches() -> List[Bench]:
+    from app.chat_modes import detect_chat_mode
+    from app.prompt_builder import assemble_prompt, build_base_context, build_prompt_knowledge
+    from app.rag_service import build_context
+
+    messages = _chat_messages()
+    docs, metas = _course_chunks()
+    query = "Warum soll Obst allein gegessen werden?"
+    context = build_context(docs, metas, query=query)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": m} for i, m in enumerate(messages[:8])]
+    parts = build_base_context("Der Nutzer fragt nach Obst und Frühstück.", history)
+    instructions = build_prompt_knowledge(query)
+
+    return [
+        (f"detect_chat_mode[{len(messages)} messages]",
+         lambda: [detect_chat_mode(m, is_new_conversation=False, recent_message_count=4) for m in messages]),
+        (f"build_context[{len(docs)} chunks, packed]", lambda: build_context(docs, metas, query=query)),
+        (f"build_context[{len(docs)} chunks, plain]", lambda: build_context(docs, metas)),
+        ("assemble_prompt[knowledge]", lambda: assemble_prompt(parts, context, query, instructions)),
+    ]
+
+
+def db_benches(workdir: Path, conversations: int = 200, messages_per_conv: int = 20) -> List[Bench]:
+    from app import database, migrations
+
+    database.DB_PATH = migrations.DB_PATH = str(workdir / "bench.db")
+    database.init_db()
+    migrations.run_migrations()
+    guests = [f"guest-{i}" for i in range(conversations // 4)]
+    conv_ids = []
+    with database.get_db() as conn:
+        now = datetime.now(timezone.utc).isoformat()
+        for i in range(conversations):
+            cid = f"conv-{i:05d}"
+            conv_ids.append(cid)
+            conn.execute(
+                "INSERT INTO conversations (id, created_at, updated_at, guest_id, title) VALUES (?, ?, ?, ?, ?)",
+                (cid, now, now, guests[i % len(guests)], f"Chat {i}"),
+            )
+            conn.executemany(
+                "INSERT INTO messages (id, conversation_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(f"{cid}-m{j:03d}", cid, "user" if j % 2 == 0 else "assistant",
+                  f"Nachricht {j} über Reis, Gemüse und Obst.", f"{now}-{j:03d}")
+                 for j in range(messages_per_conv)],
+            )
+    cid, guest = conv_ids[len(conv_ids) // 2], guests[len(guests) // 2]
+    label = f"{conversations}x{messages_per_conv}"
+
+    return [
+        (f"db.get_conversation[{label}]", lambda: database.get_conversation(cid)),
+        (f"db.get_last_n_messages[{label}]", lambda: database.get_last_n_messages(cid, 8)),
+        (f"db.get_messages[{label}]", lambda: database.get_messages(cid)),
+        (f"db.count_messages_since_cursor[{label}]", lambda: database.count_messages_since_cursor(cid, 4)),
+        (f"db.get_conversations_by_guest[{label}]", lambda: database.get_conversations_by_guest(guest)),
+        (f"db.conversation_belongs_to_guest[{label}]", lambda: database.conversation_belongs_to_guest(cid, guest)),
+        (f"db.create_message[{label}]", lambda: database.create_message(cid, "user", "Noch eine Frage")),
+    ]
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_all(name_filter: Optional[str], rounds: int) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix="kursbot-bench-"))
+    results: Dict[str, Any] = {}
+    try:
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):  # pipeline code logs with print()
+            benches = trennkost_benches() + pipeline_benches() + db_benches(workdir)
+        for name, fn in benches:
+            if name_filter and name_filter not in name:
+                continue
+            with contextlib.redirect_stdout(quiet):
+                results[name] = run_bench(fn, rounds=rounds)
+            quiet.seek(0)
+            quiet.truncate()
+            print(f"  {name:48} {results[name]['median_us']:>12.1f} µs")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "rounds": rounds,
+        },
+        "results": results,
+    }
+
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float) -> None:
+    print(f"\n{'benchmark':48} {'base min µs':>12} {'cur min µs':>12} {'ratio':>7}  status (threshold ±{threshold:.0%})")
+    for r in rows:
+        base = f"{r['baseline_us']:.1f}" if "baseline_us" in r else "-"
+        ratio = f"{r['ratio']:.2f}" if "ratio" in r else "-"
+        flag = "  <<<" if r["status"] == "regression" else ""
+        print(f"{r['name']:48} {base:>12} {r['current_us']:>12.1f} {ratio:>7}  {r['status']}{flag}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default 0.15)")
+    parser.add_argument("--filter", default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"[BENCH] rounds={args.rounds}")
+    current = run_all(args.filter, args.rounds)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"[BENCH] baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(baseline, current, args.threshold)
+        print(f"[BENCH] baseline {baseline.get('meta', {}).get('commit')} "
+              f"({baseline.get('meta', {}).get('created')})")
+        print_comparison(rows, args.threshold)
+        regressions = [r["name"] for r in rows if r["status"] == "regression"]
+        if regressions:
+            print(f"[BENCH] {len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        print("[BENCH] no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
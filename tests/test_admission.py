@@ -0,0 +1,122 @@
+"""Admission control: token buckets, bounded priority queue, 429/503 with Retry-After."""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import admission, metrics
+from app.admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _decisions():
+    totals = {}
+    for key, value in metrics.snapshot()["counters"][admission.DECISIONS_TOTAL].items():
+        outcome = dict(key)["outcome"]
+        totals[outcome] = totals.get(outcome, 0) + value
+    return totals
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert bucket.take(now=bucket.updated) and bucket.take(now=bucket.updated)
+    assert not bucket.take(now=bucket.updated)
+    assert bucket.wait_s(now=bucket.updated) == pytest.approx(0.5)
+    assert bucket.take(now=bucket.updated + 0.5)
+    assert TokenBucket(rate=0, burst=1).take()  # disabled
+
+
+def test_queued_text_turns_are_served_before_image_turns():
+    ctrl = AdmissionController(max_inflight=1, queue_size=4, queue_timeout_ms=2000, rate_per_s=0,
+                               guest_max_inflight=0, guest_rate_per_s=0)
+    order = []
+
+    async def _turn(guest, kind, hold):
+        ticket = await ctrl.acquire(guest, kind)
+        order.append(kind)
+        await asyncio.sleep(hold)
+        ctrl.release(ticket)
+
+    async def _flow():
+        first = asyncio.create_task(_turn("a", "text", 0.05))
+        await asyncio.sleep(0)
+        image = asyncio.create_task(_turn("b", "image", 0))
+        await asyncio.sleep(0)
+        text = asyncio.create_task(_turn("c", "text", 0))
+        await asyncio.gather(first, image, text)
+
+    asyncio.run(_flow())
+    assert order == ["text", "text", "image"]
+    assert _decisions() == {"admitted": 1, "queued": 2}
+    assert ctrl.stats() == {"inflight": 0, "queued": 0, "guests": 0}
+
+
+def test_queue_deadline_and_capacity_reject_with_503():
+    ctrl = AdmissionController(max_inflight=1, queue_size=1, queue_timeout_ms=50, rate_per_s=0,
+                               guest_max_inflight=0, guest_rate_per_s=0)
+
+    async def _flow():
+        held = await ctrl.acquire("a")
+        waiting = asyncio.create_task(ctrl.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await ctrl.acquire("c")
+        with pytest.raises(AdmissionRejected) as timeout:
+            await waiting
+        ctrl.release(held)
+        return full.value, timeout.value
+
+    full, timeout = asyncio.run(_flow())
+    assert (full.status, full.code, full.reason) == (503, "OVERLOADED", "queue_full")
+    assert (timeout.status, timeout.reason) == (503, "queue_timeout")
+    assert timeout.retry_after_s >= 1
+    assert ctrl.stats()["inflight"] == 0 and ctrl.stats()["guests"] == 0
+
+
+def test_per_guest_concurrency_and_rate_reject_with_429():
+    ctrl = AdmissionController(max_inflight=10, rate_per_s=0, guest_max_inflight=1,
+                               guest_rate_per_s=0.5, guest_burst=2)
+
+    async def _flow():
+        ticket = await ctrl.acquire("guest:a")
+        with pytest.raises(AdmissionRejected) as busy:
+            await ctrl.acquire("guest:a")
+        await ctrl.acquire("guest:b")  # other guests unaffected
+        ctrl.release(ticket)
+        ctrl.release(await ctrl.acquire("guest:a"))
+        with pytest.raises(AdmissionRejected) as rate:
+            await ctrl.acquire("guest:a")
+        return busy.value, rate.value
+
+    busy, rate = asyncio.run(_flow())
+    assert (busy.status, busy.reason) == (429, "guest_concurrency")
+    assert (rate.status, rate.code, rate.reason, rate.retry_after_s) == (429, "RATE_LIMITED", "guest_rate", 2)
+
+
+def test_middleware_keys_on_guest_id_and_replays_the_body(monkeypatch):
+    monkeypatch.setattr(admission, "controller", AdmissionController(rate_per_s=0, guest_rate_per_s=0.01,
+                                                                     guest_burst=1))
+    seen = []
+
+    def _handle_chat(conversation_id, message, guest_id, *_a, **_k):
+        seen.append((message, guest_id))
+        return {"conversationId": "conv-1", "answer": "ok", "sources": []}
+
+    monkeypatch.setattr(main, "handle_chat", _handle_chat)
+    client = TestClient(main.app)
+
+    assert client.post("/api/v1/chat", json={"message": "Hallo", "guestId": "g-1"}).status_code == 200
+    limited = client.post("/api/v1/chat", json={"message": "Nochmal", "guestId": "g-1"})
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert limited.json()["error"]["code"] == "RATE_LIMITED"
+    assert client.post("/api/v1/chat", json={"message": "Hi", "guestId": "g-2"}).status_code == 200
+    assert client.get("/api/v1/health").status_code == 200  # not a chat route
+    assert seen == [("Hallo", "g-1"), ("Hi", "g-2")]
@@ -0,0 +1,130 @@
+"""Exact-match answer cache for fresh KNOWLEDGE turns (sync + streaming replay)."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import app.answer_cache as answer_cache
+import app.chat_service as chat_service
+from app.chat_modes import ChatMode
+
+
+class _FakeCompletions:
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if kwargs.get("stream"):
+            pieces = [self.text[i:i + 4] for i in range(0, len(self.text), 4)]
+            return iter(
+                [SimpleNamespace(choices=[])]
+                + [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=p))]) for p in pieces]
+            )
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.text))])
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    answer_cache.clear()
+    completions = _FakeCompletions("Obst verdaut schnell und sollte allein gegessen werden.")
+    monkeypatch.setattr(chat_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    saved = []
+    monkeypatch.setattr(chat_service, "create_message",
+                        lambda cid, role, content, intent=None: saved.append(content))
+    monkeypatch.setattr(chat_service, "get_conversation", lambda *_a, **_k: None)
+    yield completions, saved
+    answer_cache.clear()
+
+
+def _key(message="Warum Obst alleine?", doc="Obst verdaut schnell."):
+    return answer_cache.make_key(message, [doc], [{"path": "p.md", "chunk": 0}], f"prompt {doc}")
+
+
+def test_key_normalizes_message_and_tracks_chunk_content():
+    assert _key("Warum Obst alleine?") == _key("  warum   obst ALLEINE? ")
+    assert _key() != _key(doc="Obst verdaut langsam.")
+    assert _key() != _key("Warum Obst zuerst?")
+
+
+def test_only_fresh_knowledge_turns_are_cacheable():
+    current = [{"role": "user", "content": "Frage"}]
+    assert answer_cache.is_cacheable(ChatMode.KNOWLEDGE, None, current)
+    assert not answer_cache.is_cacheable(ChatMode.KNOWLEDGE, "Zusammenfassung", current)
+    assert not answer_cache.is_cacheable(ChatMode.KNOWLEDGE, None, current * 2)
+    opener = [{"role": "assistant", "content": "Was möchtest du lernen?"}]
+    assert answer_cache.is_cacheable(ChatMode.KNOWLEDGE, None, opener + current)
+    assert not answer_cache.is_cacheable(ChatMode.FOOD_ANALYSIS, None, current)
+    assert not answer_cache.is_cacheable(ChatMode.KNOWLEDGE, None, current, needs_clarification="?")
+
+
+def test_lru_evicts_oldest_entry(monkeypatch):
+    answer_cache.clear()
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_MAX_ENTRIES", 2)
+    for i in range(3):
+        answer_cache.put(f"k{i}", f"a{i}")
+    assert answer_cache.get("k0") is None
+    assert answer_cache.get("k2") == "a2"
+    answer_cache.clear()
+
+
+def test_generate_and_save_replays_cached_answer(fake_llm):
+    completions, saved = fake_llm
+    key = _key()
+
+    first = chat_service._generate_and_save("c1", "prompt", ChatMode.KNOWLEDGE, cache_key=key)
+    second = chat_service._generate_and_save("c2", "prompt", ChatMode.KNOWLEDGE, cache_key=key)
+    chat_service._generate_and_save("c3", "prompt", ChatMode.KNOWLEDGE)
+
+    assert first == second
+    assert completions.calls == 2
+    assert saved == [first, first, first]
+
+
+def _events(frames):
+    out = []
+    for frame in frames:
+        lines = frame.strip().split("\n")
+        out.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return out
+
+
+def _prep(monkeypatch, key):
+    monkeypatch.setattr(chat_service, "_prepare_stream", lambda *_a, **_k: {
+        "conversation_id": "conv-1", "llm_input": "prompt", "ui_intent": "learn",
+        "mode": ChatMode.KNOWLEDGE, "recipe_results": None, "sources": [], "cache_key": key,
+    })
+
+
+def test_stream_replays_cached_answer_as_deltas(fake_llm, monkeypatch):
+    completions, saved = fake_llm
+    _prep(monkeypatch, _key())
+
+    first = _events(chat_service.handle_chat_stream("conv-1", "Warum Obst alleine?"))
+    second = _events(chat_service.handle_chat_stream("conv-1", "Warum Obst alleine?"))
+
+    assert completions.calls == 1
+    for events in (first, second):
+        kinds = [e for e, _ in events]
+        assert kinds[0] == "meta" and kinds[-1] == "final"
+        assert set(kinds[1:-1]) == {"delta"}
+        assert "".join(d["text"] for e, d in events if e == "delta") == completions.text
+        assert events[-1][1]["answer"] == completions.text
+    assert len(saved) == 2
+
+
+def test_async_stream_replays_cached_answer(fake_llm, monkeypatch):
+    completions, _ = fake_llm
+    _prep(monkeypatch, _key())
+
+    async def _collect():
+        return [f async for f in chat_service.handle_chat_stream_async("conv-1", "Warum Obst alleine?")]
+
+    first = _events(asyncio.run(_collect()))
+    second = _events(asyncio.run(_collect()))
+
+    assert completions.calls == 1
+    assert first[-1] == second[-1]
+    assert [e for e, _ in second if e == "delta"]
@@ -0,0 +1,83 @@
+"""Async DB layer: one DB thread with a persistent connection, same surface as app.database."""
+import asyncio
+
+import pytest
+
+import app.chat_service as chat_service
+from app import async_database as adb
+from app import database, migrations
+from app.chat_modes import ChatMode
+
+
+@pytest.fixture(autouse=True)
+def _isolated_db(monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+    yield
+    adb.shutdown()
+
+
+@pytest.fixture
+def connects(monkeypatch):
+    opened = []
+    real_connect = database._connect
+
+    def _counting():
+        opened.append(1)
+        return real_connect()
+
+    monkeypatch.setattr(database, "_connect", _counting)
+    return opened
+
+
+def test_async_calls_share_one_connection(connects):
+    async def _flow():
+        cid = await adb.create_conversation("guest-1")
+        await adb.create_message(cid, "user", "Warum Obst allein?")
+        await adb.create_message(cid, "assistant", "Weil es schnell verdaut.")
+        return cid, await adb.get_messages(cid), await adb.conversation_belongs_to_guest(cid, "guest-1")
+
+    cid, messages, belongs = asyncio.run(_flow())
+
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    assert belongs is True
+    assert len(connects) == 1
+    assert database.get_conversation(cid)["guest_id"] == "guest-1"  # committed, visible to sync readers
+
+
+def test_errors_propagate_and_connection_follows_db_path(monkeypatch, tmp_path, connects):
+    def _boom():
+        with database.get_db() as conn:
+            conn.execute("INSERT INTO nope VALUES (1)")
+
+    async def _flow():
+        with pytest.raises(Exception, match="no such table"):
+            await adb.run(_boom)
+        await adb.get_conversation("x")
+
+        other = tmp_path / "other.db"
+        monkeypatch.setattr(database, "DB_PATH", str(other))
+        database.init_db()
+        return await adb.create_conversation("guest-2")
+
+    cid = asyncio.run(_flow())
+    assert len(connects) == 2
+    assert database.get_conversation(cid) is not None
+
+
+def test_async_stream_uses_db_thread_for_setup_and_persist(monkeypatch):
+    monkeypatch.setattr(chat_service, "_prepare_stream", lambda *_a, **_k: {
+        "conversation_id": _a[0], "ui_intent": "learn", "mode": ChatMode.KNOWLEDGE,
+        "early_answer": "Obst am besten allein.", "sources": [],
+    })
+
+    async def _collect():
+        return [f async for f in chat_service.handle_chat_stream_async(None, "Warum Obst?", "guest-9", "learn")]
+
+    frames = asyncio.run(_collect())
+    assert frames[0].startswith("event: meta") and frames[-1].startswith("event: final")
+    [conv] = database.get_conversations_by_guest("guest-9")
+    assert database.conversation_belongs_to_guest(conv["id"], "guest-9")
@@ -0,0 +1,119 @@
+"""Client-disconnect cancellation: stage checks, upstream close, partial-answer policy, metrics."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.chat_service as chat_service
+from app import cancellation, llm_accounting, metrics
+from app.chat_modes import ChatMode
+
+TOKENS = ["Obst ", "wird ", "am ", "besten ", "allein ", "gegessen", "."] * 20
+
+
+class _UpstreamStream:
+    """openai 1.3-like stream: no close(), only .response.close()."""
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.sent = 0
+        self.response = SimpleNamespace(closed=False)
+        self.response.close = lambda: setattr(self.response, "closed", True)
+
+    def __iter__(self):
+        for t in TOKENS:
+            if self.response.closed:
+                return
+            time.sleep(self.delay_s)
+            self.sent += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))])
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    upstream = _UpstreamStream(delay_s=0.005)
+    saved = []
+    monkeypatch.setattr(chat_service, "client", llm_accounting.AccountingClient(SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **_k: upstream)),
+        embeddings=SimpleNamespace(create=None),
+    )))
+    monkeypatch.setattr(chat_service, "create_message",
+                        lambda cid, role, content, intent=None: saved.append(content))
+    monkeypatch.setattr(chat_service, "get_conversation", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "_prepare_stream", lambda *_a, **_k: {
+        "conversation_id": "conv-1", "llm_input": "prompt", "ui_intent": "learn",
+        "mode": ChatMode.KNOWLEDGE, "recipe_results": None, "sources": [],
+    })
+    monkeypatch.setattr(chat_service, "STREAM_DELTA_MODE", "token")
+    metrics.reset()
+    cancellation.reset()
+    yield SimpleNamespace(upstream=upstream, saved=saved)
+    metrics.reset()
+
+
+def _counter(name):
+    return {tuple(v for _, v in k): n for k, n in metrics.snapshot()["counters"].get(name, {}).items()}
+
+
+def test_sync_disconnect_closes_upstream_and_discards_partial_answer(streaming):
+    gen = chat_service.handle_chat_stream("conv-1", "Warum Obst?")
+    frames = [next(gen) for _ in range(4)]  # meta + 3 deltas
+    gen.close()
+
+    assert frames[0].startswith("event: meta") and frames[-1].startswith("event: delta")
+    assert streaming.upstream.response.closed and streaming.upstream.sent < len(TOKENS)
+    assert streaming.saved == []
+    assert _counter(cancellation.CANCELLATIONS_TOTAL) == {("false", "llm_stream"): 1}
+    assert _counter(cancellation.SAVED_TOKENS_TOTAL)[()] > 0
+
+
+def test_partial_policy_stores_streamed_text(streaming, monkeypatch):
+    monkeypatch.setattr(chat_service, "STREAM_PERSIST_ON_DISCONNECT", "partial")
+    gen = chat_service.handle_chat_stream("conv-1", "Warum Obst?")
+    for _ in range(4):
+        next(gen)
+    gen.close()
+
+    assert streaming.saved == ["Obst wird am"]
+    assert _counter(cancellation.CANCELLATIONS_TOTAL) == {("true", "llm_stream"): 1}
+
+
+def test_async_disconnect_stops_llm_worker(streaming):
+    async def _disconnect_after_first_delta():
+        gen = chat_service.handle_chat_stream_async("conv-1", "Warum Obst?")
+        async for frame in gen:
+            if frame.startswith("event: delta"):
+                break
+        await gen.aclose()  # what Starlette's cancellation does to the response generator
+
+    asyncio.run(_disconnect_after_first_delta())
+    deadline = time.monotonic() + 5
+    while not streaming.upstream.response.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert streaming.upstream.response.closed and streaming.upstream.sent < len(TOKENS)
+    assert streaming.saved == []
+    assert _counter(cancellation.FREED_WORKERS_TOTAL) == {("llm",): 1}
+
+
+def test_cancelled_token_stops_prepare_at_next_stage():
+    token = cancellation.CancelToken()
+    stages = []
+
+    def _pipeline():
+        stages.append("preprocessing")
+        token.cancel()
+        cancellation.check("retrieval")
+        stages.append("retrieval")
+
+    metrics.reset()
+    cancellation.reset()
+    with pytest.raises(cancellation.TurnCancelled):
+        cancellation.scoped(_pipeline, token, "cpu")()
+    cancellation.check("outside")  # no token outside the scope
+
+    assert stages == ["preprocessing"]
+    assert _counter(cancellation.CANCELLATIONS_TOTAL) == {("false", "retrieval"): 1}
+    assert _counter(cancellation.SAVED_TOKENS_TOTAL)[()] == 300
+    metrics.reset()
@@ -0,0 +1,296 @@
+"""LLM circuit breaker: error / slow-call tripping, half-open probes, engine-only degraded answers."""
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.chat_service as chat_service
+from app import answer_cache, circuit_breaker, database, metrics, migrations, speculative_retrieval
+from app.circuit_breaker import CircuitBreaker, GuardedClient, LLMUnavailable
+from app.grounding_policy import FALLBACK_SENTENCE
+from trennkost.analyzer import analyze_text
+from trennkost.formatter import format_results_without_llm
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class _ServerError(Exception):
+    status_code = 503
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _fail():
+    raise _ServerError("upstream down")
+
+
+def _counter(name):
+    return {tuple(v for _, v in k): n for k, n in metrics.snapshot()["counters"].get(name, {}).items()}
+
+
+def _open_breaker(clock):
+    breaker = CircuitBreaker(min_calls=2, error_rate=0.5, open_s=30, clock=clock)
+    for _ in range(2):
+        with pytest.raises(_ServerError):
+            breaker.call(_fail)
+    assert breaker.state == circuit_breaker.OPEN
+    return breaker
+
+
+def test_error_rate_trips_and_open_breaker_fails_fast():
+    clock = _Clock()
+    breaker = CircuitBreaker(min_calls=4, error_rate=0.5, clock=clock)
+    breaker.call(lambda: "ok")
+    with pytest.raises(ValueError):  # not a backend failure: not counted
+        breaker.call(lambda: int("x"))
+    with pytest.raises(_ServerError):
+        breaker.call(_fail)
+    breaker.call(lambda: "ok")
+    assert breaker.state == circuit_breaker.CLOSED  # 1 of 3 counted calls failed
+
+    with pytest.raises(_ServerError):
+        breaker.call(_fail)
+    assert breaker.state == circuit_breaker.OPEN and not breaker.available()
+
+    def _unexpected():
+        raise AssertionError("open breaker must not call through")
+
+    with pytest.raises(LLMUnavailable):
+        breaker.call(_unexpected)
+    assert _counter(circuit_breaker.REJECTED_TOTAL) == {(): 1}
+    assert metrics.snapshot()["gauges"][circuit_breaker.STATE][()] == 2
+
+
+def test_slow_calls_trip_the_breaker():
+    clock = _Clock()
+    breaker = CircuitBreaker(min_calls=2, slow_rate=0.5, slow_call_s=8, slow_tokens_per_s=50, clock=clock)
+
+    def _slow(**_kwargs):
+        clock.now += 11
+        return "late"
+
+    assert breaker.call(_slow, max_tokens=100) == "late"  # limit 8s + 100 / 50 tok/s
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.call(_slow, max_tokens=100)
+    assert breaker.state == circuit_breaker.OPEN
+
+
+def test_slow_limit_scales_with_max_tokens_and_skips_open_ended_answers():
+    clock = _Clock()
+    breaker = CircuitBreaker(min_calls=2, slow_rate=0.5, slow_call_s=8, slow_tokens_per_s=50, clock=clock)
+
+    def _long_answer(**_kwargs):
+        clock.now += 40
+        return "answer"
+
+    breaker.call(_long_answer, max_tokens=2000)  # limit 48s
+    breaker.call(_long_answer)  # no max_tokens: never slow
+    assert breaker.state == circuit_breaker.CLOSED
+
+
+def test_streams_are_timed_to_the_first_chunk():
+    clock = _Clock()
+    breaker = CircuitBreaker(window_s=600, open_s=600, min_calls=2, slow_rate=0.5, slow_call_s=8, clock=clock)
+
+    def _stream(first_chunk_s):
+        def _chunks():
+            clock.now += first_chunk_s
+            yield "a"
+            clock.now += 60  # a long answer is not a slow backend
+            yield "b"
+        return lambda **_kwargs: _chunks()
+
+    for _ in range(2):
+        assert list(breaker.call(_stream(1), stream=True)) == ["a", "b"]
+    assert breaker.state == circuit_breaker.CLOSED
+
+    for _ in range(2):
+        assert list(breaker.call(_stream(9), stream=True)) == ["a", "b"]
+    assert breaker.state == circuit_breaker.OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = _Clock()
+    breaker = _open_breaker(clock)
+
+    clock.now += 30
+    assert breaker.state == circuit_breaker.HALF_OPEN and breaker.available()
+    with pytest.raises(_ServerError):
+        breaker.call(_fail)
+    assert breaker.state == circuit_breaker.OPEN
+
+    clock.now += 30
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == circuit_breaker.CLOSED
+    assert _counter(circuit_breaker.TRANSITIONS_TOTAL) == {("open",): 2, ("half_open",): 2, ("closed",): 1}
+
+
+def test_guarded_client_only_wraps_chat_completions():
+    clock = _Clock()
+    breaker = _open_breaker(clock)
+    inner = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **_k: "answer")),
+        embeddings=SimpleNamespace(create=lambda **_k: "vectors"),
+    )
+    guarded = GuardedClient(inner, breaker)
+
+    assert guarded.embeddings.create(input="x") == "vectors"
+    with pytest.raises(LLMUnavailable):
+        guarded.chat.completions.create(messages=[])
+
+
+@pytest.fixture
+def degraded_pipeline(monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+
+    monkeypatch.setattr(circuit_breaker, "llm", _open_breaker(_Clock()))
+    metrics.reset()
+
+    def _unexpected(*_a, **_k):
+        raise AssertionError("no LLM call expected")
+
+    metas = [{"path": f"modul{i}.pdf", "source": f"modul{i}.pdf", "page": i, "module_label": f"Modul {i}"}
+             for i in range(1, 6)]
+    monkeypatch.setattr(chat_service, "client", SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=_unexpected))))
+    monkeypatch.setattr(chat_service, "normalize_input", lambda message, *_a, **_k: message)
+    monkeypatch.setattr(chat_service, "classify_intent", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback",
+                        lambda *_a, **_k: (["chunk"] * 5, metas, [0.2, 0.3, 0.4, 0.5, 0.6], False))
+    monkeypatch.setattr(speculative_retrieval, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+    return speculative_retrieval.scoped(chat_service._prepare_stream)
+
+
+def test_engine_only_formatter_covers_conditional_verdicts():
+    answer = format_results_without_llm(analyze_text("Salat mit Dressing", llm_fn=None))
+
+    assert answer.startswith("**Salat + Dressing** ist **bedingt konform**:")
+    assert "❓ **Offene Frage:** Folgende Zutaten konnte ich nicht eindeutig zuordnen: Dressing." in answer
+    assert "()" not in answer
+
+
+def test_open_breaker_answers_food_turn_from_the_engine(degraded_pipeline):
+    prep = degraded_pipeline(None, "Ist Pasta mit Käse ok?", "guest-1", "eat")
+
+    answer = prep["early_answer"]
+    assert answer.startswith(chat_service._DEGRADED_NOTE)
+    assert "**Pasta + Käse** ist leider **nicht trennkost-konform**." in answer
+    stored = database.get_last_n_messages(prep["conversation_id"], 2)
+    assert stored[-1]["role"] == "assistant" and stored[-1]["content"] == answer
+    assert _counter(chat_service.DEGRADED_ANSWERS_TOTAL) == {("engine",): 1}
+
+
+def test_open_breaker_answers_knowledge_turn_with_fallback_and_sources(degraded_pipeline):
+    prep = degraded_pipeline(None, "Was sagt der Kurs über Verdauung am Abend?", "guest-1", "learn")
+
+    assert prep["early_answer"].startswith(FALLBACK_SENTENCE)
+    assert "- Modul 1, S. 1" in prep["early_answer"]
+    assert [s["path"] for s in prep["sources"]] == ["modul1.pdf", "modul2.pdf", "modul3.pdf"]
+    assert _counter(chat_service.DEGRADED_ANSWERS_TOTAL) == {("fallback",): 1}
+    assert ("food_classify",) in _counter(circuit_breaker.SKIPPED_STAGES_TOTAL)
+
+
+def test_open_breaker_still_serves_cached_answers(degraded_pipeline, monkeypatch):
+    question = "Was sagt der Kurs über Verdauung am Abend?"
+    open_breaker = circuit_breaker.llm
+    monkeypatch.setattr(chat_service, "classify_food_items", lambda *_a, **_k: None)
+    monkeypatch.setattr(circuit_breaker, "llm", None)
+    prep = degraded_pipeline(None, question, "guest-1", "learn")
+    assert prep["cache_key"] is not None
+    answer_cache.put(prep["cache_key"], "Abends verdaut der Körper langsamer.")
+
+    monkeypatch.setattr(circuit_breaker, "llm", open_breaker)
+    try:
+        prep = degraded_pipeline(None, question, "guest-1", "learn")
+    finally:
+        answer_cache.clear()
+
+    assert prep["early_answer"] == "Abends verdaut der Körper langsamer."
+    stored = database.get_last_n_messages(prep["conversation_id"], 2)
+    assert stored[-1]["content"] == prep["early_answer"]
+    assert _counter(chat_service.DEGRADED_ANSWERS_TOTAL) == {("cache",): 1}
+
+
+def test_answer_refused_mid_turn_by_a_half_open_breaker_degrades(degraded_pipeline, monkeypatch):
+    clock = _Clock()
+    breaker = _open_breaker(clock)
+    clock.now += 30  # half-open: the turn starts planning with the LLM
+    probe_out, release = threading.Event(), threading.Event()
+
+    def _other_turns_probe():
+        breaker.call(lambda: release.wait(5))
+
+    degraded_answer = chat_service._degraded_answer
+
+    def _checked_then_probe_taken(*args, **kwargs):
+        answer = degraded_answer(*args, **kwargs)
+        if not probe_out.is_set():  # another turn takes the only probe slot right after the check
+            threading.Thread(target=_other_turns_probe, daemon=True).start()
+            while not breaker._probes_out:
+                time.sleep(0.01)
+            probe_out.set()
+        return answer
+
+    def _unexpected(*_a, **_k):
+        raise AssertionError("no LLM call expected")
+
+    monkeypatch.setattr(circuit_breaker, "llm", breaker)
+    monkeypatch.setattr(chat_service, "client", GuardedClient(SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=_unexpected))), breaker))
+    monkeypatch.setattr(chat_service, "classify_food_items", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "_degraded_answer", _checked_then_probe_taken)
+    try:
+        result = chat_service.handle_chat(None, "Was sagt der Kurs über Verdauung am Abend?", "guest-1", intent="learn")
+    finally:
+        release.set()
+
+    assert probe_out.is_set()
+    assert result["answer"].startswith(FALLBACK_SENTENCE)
+    assert "- Modul 1, S. 1" in result["answer"]
+    assert [s["path"] for s in result["sources"]] == ["modul1.pdf", "modul2.pdf", "modul3.pdf"]
+    assert _counter(chat_service.DEGRADED_ANSWERS_TOTAL) == {("fallback",): 1}
+
+
+def test_stream_refused_before_the_first_token_ends_with_the_degraded_answer(monkeypatch):
+    def _refused(**_kwargs):
+        raise LLMUnavailable("LLM circuit breaker open")
+
+    saved = []
+    monkeypatch.setattr(chat_service, "client",
+                        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_refused))))
+    monkeypatch.setattr(chat_service, "create_message",
+                        lambda cid, role, content, intent=None: saved.append(content))
+    monkeypatch.setattr(chat_service, "_prepare_stream", lambda *_a, **_k: {
+        "conversation_id": "conv-1", "llm_input": "prompt", "ui_intent": "learn", "recipe_results": None,
+        "sources": [], "trennkost_results": None,
+        "metas": [{"path": "modul1.pdf", "source": "modul1.pdf", "page": 1}], "dists": [0.2],
+    })
+
+    async def _collect():
+        return [f async for f in chat_service.handle_chat_stream_async("conv-1", "Warum Obst?")]
+
+    for frames in (list(chat_service.handle_chat_stream("conv-1", "Warum Obst?")), asyncio.run(_collect())):
+        assert frames[-1].startswith("event: final")
+        final = json.loads(frames[-1].split("data: ", 1)[1])
+        assert final["answer"].startswith(FALLBACK_SENTENCE)
+        assert [s["path"] for s in final["sources"]] == ["modul1.pdf"]
+    assert saved == [final["answer"]] * 2
+    assert _counter(chat_service.DEGRADED_ANSWERS_TOTAL) == {("fallback",): 2}
@@ -0,0 +1,98 @@
+"""Sentence-window context packing: overlap removal, window selection, token savings."""
+import sys
+from pathlib import Path
+
+import pytest
+
+import app.context_packing as packing
+from app.rag_service import build_context, deduplicate_by_source, expand_alias_terms
+from app.token_budget import count_tokens, split_course_context
+
+sys.path.insert(0, str(Path(__file__).parent))
+from test_rag_quality import TEST_CASES  # noqa: E402
+
+
+def test_overlap_between_chunks_of_same_path_is_removed():
+    shared = "Geteilter Absatz am Ende."
+    docs = [f"Erster Absatz.\n\n{shared}", f"{shared}\n\nNeuer Absatz.", f"{shared}\n\nAndere Seite."]
+    metas = [{"path": "a.md", "chunk": 0}, {"path": "a.md", "chunk": 1}, {"path": "b.md", "chunk": 0}]
+
+    blocks = packing.remove_overlap(docs, metas)
+
+    assert blocks[0] == ["Erster Absatz.", shared]
+    assert blocks[1] == ["Neuer Absatz."]
+    assert blocks[2] == [shared, "Andere Seite."]
+
+
+def test_pack_keeps_best_window_with_neighbours_and_marks_gaps(monkeypatch):
+    monkeypatch.setattr(packing, "PACK_MAX_WINDOWS", 1)
+    doc = (
+        "Satz eins ist Einleitung. Satz zwei bereitet vor. "
+        "Kohlenhydrate brauchen ein basisches Milieu. Satz vier erklärt. "
+        "Satz fünf ist egal. Satz sechs auch."
+    )
+    text = packing.pack_chunk([doc], packing.query_terms("Welche Kohlenhydrate?"))
+
+    assert text.split("\n") == [
+        "Satz zwei bereitet vor.",
+        "Kohlenhydrate brauchen ein basisches Milieu.",
+        "Satz vier erklärt.",
+    ]
+
+    monkeypatch.setattr(packing, "PACK_WINDOW", 0)
+    monkeypatch.setattr(packing, "PACK_MAX_WINDOWS", 2)
+    text = packing.pack_chunk([doc], packing.query_terms("Kohlenhydrate Einleitung"))
+    assert packing.GAP_MARKER in text.split("\n")
+
+
+def test_chunk_without_hits_keeps_leading_sentences_but_no_signal_keeps_all():
+    docs = ["Protein ist wichtig. Noch ein Satz.", "Erster Satz. Zweiter Satz. Dritter Satz."]
+    metas = [{"path": "a.md", "chunk": 0}, {"path": "b.md", "chunk": 0}]
+
+    packed = dict(packing.pack_pieces(docs, metas, "Protein"))
+    assert packed["[b.md#0]"] == "Erster Satz.\nZweiter Satz."
+
+    unpacked = dict(packing.pack_pieces(docs, metas, "Quantenmechanik"))
+    assert unpacked["[b.md#0]"] == docs[1]
+
+
+def test_build_context_without_query_is_unchanged():
+    docs = ["Erster Absatz.\n\nZweiter.", "Zweiter.\n\nDritter."]
+    metas = [{"path": "a.md", "chunk": 0}, {"path": "a.md", "chunk": 1}]
+
+    assert build_context(docs, metas) == "[a.md#0]\nErster Absatz.\n\nZweiter.\n\n[a.md#1]\nZweiter.\n\nDritter."
+
+
+def _course_chunks():
+    ingest = pytest.importorskip("scripts.ingest")
+    files = sorted(ingest.PAGES_DIR.rglob("*.md"))
+    if not files:
+        pytest.skip("no course pages")
+    return ingest.collect_chunks(files)
+
+
+def test_rag_quality_cases_keep_keywords_with_fewer_tokens():
+    """
+    Offline stand-in for tests/test_rag_quality.py: chunks are ranked lexically
+    (no embeddings here), then full vs packed context is compared per case.
+    """
+    chunks = _course_chunks()
+    full_tokens = packed_tokens = 0
+
+    for case in TEST_CASES:
+        query = expand_alias_terms(case["question"])
+        terms = packing.query_terms(query)
+        ranked = sorted(chunks, key=lambda c: -packing.score_sentence(c[1], terms))[:10]
+        docs, metas, _ = deduplicate_by_source([c[1] for c in ranked], [c[2] for c in ranked], [0.0] * len(ranked))
+
+        full = build_context(docs, metas)
+        packed = build_context(docs, metas, query=query)
+        full_tokens += count_tokens(full)
+        packed_tokens += count_tokens(packed)
+
+        for kw in case["expect_keywords"]:
+            if kw in full.lower():
+                assert kw in packed.lower(), (case["id"], kw)
+        assert len(split_course_context(packed)) >= len(split_course_context(full)), case["id"]
+
+    assert packed_tokens < 0.7 * full_tokens
@@ -1,8 +1,14 @@
 """Targeted regression tests for context-reference preprocessing paths."""
+from types import SimpleNamespace
+
+import pytest
+
 import app.chat_service as chat_service
 import app.input_service as input_service
+import app.rag_service as rag_service
+from app import metrics
 from app.chat_modes import ChatMode
-from app.input_service import resolve_context_references
+from app.input_service import context_reference_reason, resolve_context_references
 
 
 def _install_food_extractor(monkeypatch, mapping):
@@ -129,3 +135,58 @@ def test_prepare_analysis_query_returns_normalized_message_for_other_modes(monke
         ChatMode.RECIPE_FROM_INGREDIENTS,
     ):
         assert chat_service._prepare_analysis_query(normalized_message, [], mode) == normalized_message
+
+
+_HISTORY = [
+    {"role": "user", "content": "Lachs mit Kartoffeln, passt das?"},
+    {"role": "assistant", "content": "Fisch und Kartoffeln kombinieren Protein mit Kohlenhydraten."},
+]
+
+
+@pytest.mark.parametrize("message", [
+    "Was ist das Zwei-Stufen-Frühstück?",
+    "Warum soll man Obst allein essen?",
+    "Gibt es Regeln für Obst am Morgen?",
+    "Kann ich Joghurt essen?",
+    "Können Sie mir den Unterschied zwischen Protein und Kohlenhydraten erklären?",
+    "Welche Lebensmittel gelten als neutral in der Trennkost?",
+])
+def test_self_contained_messages_need_no_rewrite(message):
+    assert context_reference_reason(message, _HISTORY) is None
+
+
+@pytest.mark.parametrize("message, reason", [
+    ("Kann ich dazu Joghurt essen?", "reference"),       # same signal as resolve_context_references
+    ("Kann ich dazu Joghurt mit Reis essen?", "reference"),
+    ("Und Reis?", "short"),
+    ("den Fisch", "short"),
+    ("Was ist mit Quinoa statt Kartoffeln?", "ellipsis"),
+    ("Ist das so in Ordnung für mich?", "demonstrative"),
+    ("Kann ich die Kartoffeln durch Reis ersetzen?", "anaphora"),
+    ("Wäre die zweite Variante besser für abends?", "marker"),
+    ("Darf ich ihn vorher noch marinieren?", "marker"),
+])
+def test_referring_messages_need_a_rewrite(message, reason):
+    assert context_reference_reason(message, _HISTORY) == reason
+
+
+def test_rewrite_standalone_query_skips_llm_for_self_contained_messages(monkeypatch):
+    calls = []
+
+    def _create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Lachs Kartoffeln grillen"))])
+
+    monkeypatch.setattr(rag_service, "client",
+                        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create))))
+    metrics.reset()
+
+    explicit = "Was ist das Zwei-Stufen-Frühstück?"
+    assert rag_service.rewrite_standalone_query("Summary", _HISTORY, explicit) == explicit
+    assert rag_service.rewrite_standalone_query(None, _HISTORY, "Kann ich den Fisch grillen?") == "Lachs Kartoffeln grillen"
+    assert rag_service.rewrite_standalone_query(None, [], "Und Reis?") == "Und Reis?"
+    assert len(calls) == 1
+
+    decisions = {dict(k)["decision"]: v for k, v in metrics.snapshot()["counters"][rag_service.REWRITES_TOTAL].items()}
+    assert decisions == {"skipped_self_contained": 1, "rewritten": 1, "skipped_no_context": 1}
+    metrics.reset()
@@ -0,0 +1,168 @@
+"""Per-turn deadline: stage timeouts, automatic degradation, hedged preprocessing calls."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.chat_service as chat_service
+from app import deadline, input_service, metrics, rag_service
+from app.deadline import Deadline
+
+_HISTORY = [
+    {"role": "user", "content": "Ist Lachs mit Kartoffeln ok?"},
+    {"role": "assistant", "content": "Lachs und Kartoffeln solltest du trennen."},
+]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    metrics.reset()
+    deadline.reset()
+    yield
+    deadline.reset()
+    metrics.reset()
+
+
+def _counter(name):
+    return {tuple(v for _, v in k): n for k, n in metrics.snapshot()["counters"].get(name, {}).items()}
+
+
+def _unexpected_client():
+    def _create(**_kwargs):
+        raise AssertionError("no LLM call expected")
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+
+
+def test_stage_timeouts_shrink_with_the_remaining_budget(monkeypatch):
+    monkeypatch.setattr(deadline, "DEADLINE_ANSWER_MIN_S", 10)
+    clock = _Clock()
+    turn = Deadline(20, clock=clock)
+
+    assert deadline.timeout(5) == 5 and deadline.answer_timeout() == 600  # no deadline: unchanged
+    with deadline.scope(turn):
+        assert deadline.timeout(5) == 5 and deadline.answer_timeout() == 20
+        clock.now += 17.5
+        assert deadline.timeout(5) == 2.5
+        assert deadline.answer_timeout() == 10  # the answer always gets its floor
+        clock.now += 10
+        assert deadline.timeout(5) == 0.5
+
+
+def test_low_budget_skips_optional_llm_stages(monkeypatch):
+    monkeypatch.setattr(input_service, "client", _unexpected_client())
+    monkeypatch.setattr(rag_service, "client", _unexpected_client())
+
+    with deadline.scope(Deadline(9)):  # 9s - 8s answer reserve < any stage cap
+        assert input_service.normalize_input("Kann ich ihn grllen", _HISTORY, False) == "Kann ich ihn grllen"
+        assert input_service.classify_intent("Kann ich ihn grllen", _HISTORY) is None
+        assert rag_service.rewrite_standalone_query(None, _HISTORY, "Kann ich ihn grillen?") == "Kann ich ihn grillen?"
+        assert input_service.classify_food_items("Kann ich ihn grillen?", "Kann ich ihn grillen?") is None
+
+    assert _counter(deadline.DEGRADED_TOTAL) == {
+        ("normalize",): 1, ("intent",): 1, ("query_rewrite",): 1, ("food_classify",): 1}
+    assert {k[0] for k in _counter(rag_service.REWRITES_TOTAL)} == {"skipped_deadline"}
+
+
+def test_observed_p90_lets_a_fast_stage_run_on_a_tight_budget(monkeypatch):
+    monkeypatch.setattr(deadline, "HEDGE_MIN_SAMPLES", 5)
+    for _ in range(10):
+        deadline.observe_latency("input_service.classify_intent", 0.4)
+
+    with deadline.scope(Deadline(9)):
+        assert deadline.allows("intent", "input_service.classify_intent", 4)
+        assert not deadline.allows("normalize", "input_service.normalize_input", 5)
+
+
+def test_preprocessing_on_the_llm_pool_sees_the_turn_deadline(monkeypatch):
+    monkeypatch.setattr(input_service, "client", _unexpected_client())
+    monkeypatch.setattr(chat_service, "FUSED_PREPROCESSING_ENABLED", False)
+
+    with deadline.scope(Deadline(1)):
+        waiter = chat_service._start_preprocessing("ist resi ok", _HISTORY, False, {})
+    assert waiter() == ("ist resi ok", None)
+    assert _counter(deadline.DEGRADED_TOTAL) == {("normalize",): 1, ("intent",): 1}
+
+
+def test_slow_call_is_hedged_after_p90_and_first_answer_wins(monkeypatch):
+    monkeypatch.setattr(deadline, "HEDGED_REQUESTS_ENABLED", True)
+    monkeypatch.setattr(deadline, "HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(deadline, "HEDGE_MIN_DELAY_MS", 20)
+    for _ in range(10):
+        deadline.observe_latency("input_service.classify_intent", 0.05)
+
+    calls = []
+    release = threading.Event()
+
+    def _create(**params):
+        calls.append(params["timeout"])
+        if len(calls) == 1:
+            release.wait(5)  # slow primary
+            return "primary"
+        return "hedge"
+
+    started = time.perf_counter()
+    call = deadline.bounded("input_service.classify_intent", _create, 4, hedge=True)
+    assert call(model="m", messages=[]) == "hedge"
+    assert time.perf_counter() - started < 1.0
+    release.set()
+
+    assert calls == [4, 4]
+    assert _counter(deadline.HEDGED_TOTAL) == {("sent", "input_service.classify_intent"): 1,
+                                              ("hedge_won", "input_service.classify_intent"): 1}
+
+
+def test_fast_call_is_not_hedged(monkeypatch):
+    monkeypatch.setattr(deadline, "HEDGED_REQUESTS_ENABLED", True)
+    monkeypatch.setattr(deadline, "HEDGE_MIN_SAMPLES", 5)
+    for _ in range(10):
+        deadline.observe_latency("input_service.normalize_input", 0.5)
+
+    calls = []
+    call = deadline.bounded("input_service.normalize_input", lambda **p: calls.append(p) or "ok", 5, hedge=True)
+    assert call(model="m") == "ok"
+    assert len(calls) == 1 and _counter(deadline.HEDGED_TOTAL) == {}
+
+
+def test_failed_rewrite_falls_back_to_the_raw_message_and_the_turn_answers(monkeypatch, tmp_path):
+    from app import database, migrations, speculative_retrieval
+
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+    conversation_id = database.create_conversation(guest_id="guest-1")
+    for message in _HISTORY:
+        database.create_message(conversation_id, message["role"], message["content"])
+
+    def _rewrite_times_out(**_kwargs):
+        raise TimeoutError("Request timed out.")
+
+    queries = []
+    monkeypatch.setattr(rag_service, "client", SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=_rewrite_times_out))))
+    monkeypatch.setattr(chat_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **_k: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Antwort"))])))))
+    monkeypatch.setattr(chat_service, "normalize_input", lambda message, *_a, **_k: message)
+    monkeypatch.setattr(chat_service, "classify_intent", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "classify_food_items", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback",
+                        lambda query, *_a, **_k: queries.append(query) or (
+                            ["Lachs passt zu Gemüse."], [{"path": "modul1.pdf", "page": 1}], [0.2], False))
+    monkeypatch.setattr(speculative_retrieval, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+    monkeypatch.setattr(chat_service, "FUSED_PREPROCESSING_ENABLED", False)
+
+    result = chat_service.handle_chat(conversation_id, "Was sagt der Kurs dazu?", "guest-1")
+
+    assert result["answer"] == "Antwort"
+    assert queries and queries[0].startswith("Was sagt der Kurs dazu?")
+    assert _counter(rag_service.REWRITES_TOTAL) == {("failed",): 1, ("rewritten",): 1}
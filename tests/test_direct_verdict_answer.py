@@ -0,0 +1,85 @@
+"""Direct (LLM-free) answers for unambiguous OK / NOT_OK engine verdicts."""
+import pytest
+
+import app.chat_service as chat_service
+from app import database, direct_answer_policy, metrics, migrations, speculative_retrieval
+from app.chat_modes import ChatMode, ChatModifiers
+from app.direct_answer_policy import evaluate_direct_answer_policy
+from trennkost.analyzer import analyze_text
+from trennkost.formatter import format_verdict_directly
+from trennkost.models import RequiredQuestion
+
+
+def _result(text):
+    (result,) = analyze_text(text, llm_fn=None)
+    return result
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(direct_answer_policy, "DIRECT_VERDICT_ANSWERS", True)
+
+
+def test_not_ok_answer_states_verdict_problem_and_keep_one_offer():
+    answer = format_verdict_directly(_result("Spaghetti Carbonara"))
+
+    assert answer.startswith("**Spaghetti Carbonara** ist leider **nicht trennkost-konform**.")
+    assert "**Kohlenhydrate + Proteine nicht kombinieren** (Pasta, Ei und Speck)" in answer
+    assert "Kohlenhydrate (Pasta), Milchprodukte (Parmesan) oder Protein (Ei und Speck)" in answer
+    assert "→" not in answer and "(KH)" not in answer
+
+
+def test_ok_answer_includes_neutral_pairing_and_amount_guidance():
+    answer = format_verdict_directly(_result("Reis mit Brokkoli und Olivenöl"))
+
+    assert answer.startswith("**Reis + Brokkoli + Olivenöl** ist **trennkost-konform**")
+    assert "Reis (Kohlenhydrate) passt gut zu Brokkoli" in answer
+    assert "**Mengen-Hinweis:** Olivenöl — max. ca. 1-2 TL." in answer
+    assert "?" not in answer
+
+
+def test_policy_only_allows_unambiguous_single_dish_turns(enabled, monkeypatch):
+    def decide(result, mode=ChatMode.FOOD_ANALYSIS, message="Ist Käsebrot ok?", modifiers=None, image=None):
+        return evaluate_direct_answer_policy([result], mode, modifiers or ChatModifiers(), message, image)
+
+    kaesebrot = _result("Käsebrot")
+    assert decide(kaesebrot).allowed
+    assert decide(kaesebrot, message="Warum ist Käsebrot nicht ok?").reason_code == "explanation"
+    assert decide(kaesebrot, mode=ChatMode.MENU_ANALYSIS).reason_code == "mode"
+    assert decide(kaesebrot, image="meal.jpg").reason_code == "mode"
+    assert decide(kaesebrot, modifiers=ChatModifiers(is_breakfast=True)).reason_code == "context"
+
+    asking = kaesebrot.model_copy(update={"required_questions": [
+        RequiredQuestion(question="Welcher Käse?", reason="Sorte", affects_items=["Käse"])]})
+    assert decide(asking).reason_code == "open_questions"
+
+    monkeypatch.setattr(direct_answer_policy, "DIRECT_VERDICT_ANSWERS", False)
+    assert decide(kaesebrot).reason_code == "disabled"
+
+
+def test_stream_pipeline_answers_without_rag_or_llm(enabled, monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+    metrics.reset()
+
+    def _unexpected(*_a, **_k):
+        raise AssertionError("no retrieval / LLM call expected")
+
+    monkeypatch.setattr(chat_service, "normalize_input", lambda message, *_a, **_k: message)
+    monkeypatch.setattr(chat_service, "classify_intent", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback", _unexpected)
+    monkeypatch.setattr(chat_service, "rewrite_standalone_query", _unexpected)
+    monkeypatch.setattr(speculative_retrieval, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+
+    prepare = speculative_retrieval.scoped(chat_service._prepare_stream)
+    prep = prepare(None, "Ist Reis mit Hähnchen ok?", "guest-1", "eat")
+
+    assert prep["early_answer"].startswith("**Reis + Hähnchen** ist leider **nicht trennkost-konform**.")
+    stored = database.get_last_n_messages(prep["conversation_id"], 2)
+    assert stored[-1]["role"] == "assistant" and stored[-1]["content"] == prep["early_answer"]
+    series = metrics.snapshot()["counters"][chat_service.DIRECT_ANSWERS_TOTAL]
+    assert {dict(k)["decision"]: v for k, v in series.items()} == {"direct": 1}
+    metrics.reset()
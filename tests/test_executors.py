@@ -0,0 +1,137 @@
+"""Shared bounded executors: admission limit, metrics, 503 on saturation."""
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.chat_service as chat_service
+from app import database, executors, metrics, migrations
+from app.executors import BoundedExecutor, ExecutorSaturated
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_rejects_beyond_workers_plus_queue_and_recovers():
+    pool = BoundedExecutor("test", workers=1, queue=1)
+    started, release = threading.Event(), threading.Event()
+
+    def _block():
+        started.set()
+        return release.wait(5)
+
+    try:
+        running = pool.submit(_block)
+        assert started.wait(5)
+        queued = pool.submit(lambda: "queued")
+        assert pool.saturated()
+        with pytest.raises(ExecutorSaturated) as exc:
+            pool.submit(lambda: "too many")
+        assert exc.value.pool == "test" and exc.value.retry_after_s > 0
+
+        snap = metrics.snapshot()
+        assert snap["counters"][executors.REJECTED_TOTAL][(("pool", "test"),)] == 1
+        assert snap["gauges"][executors.QUEUE_DEPTH][(("pool", "test"),)] == 1
+        assert snap["gauges"][executors.ACTIVE][(("pool", "test"),)] == 1
+
+        release.set()
+        assert running.result(5) is True and queued.result(5) == "queued"
+        assert pool.stats() == {"admitted": 0, "running": 0, "queued": 0, "capacity": 2}
+        assert pool.submit(lambda: 42).result(5) == 42
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_cancelled_queued_task_gives_back_its_admission():
+    pool = BoundedExecutor("test", workers=1, queue=1)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait, 5)
+        queued = pool.submit(lambda: "never")
+        assert queued.cancel()
+        assert pool.stats()["admitted"] == 1
+        release.set()
+        assert running.result(5) is True
+        assert pool.stats()["admitted"] == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_run_async_and_restart_after_shutdown():
+    pool = BoundedExecutor("test", workers=2, queue=0)
+    pool.shutdown()  # app shutdown must not leave module pools unusable
+
+    async def _flow():
+        return await pool.run_async(sum, [1, 2, 3])
+
+    assert asyncio.run(_flow()) == 6
+    assert metrics.snapshot()["histograms"][executors.WAIT_SECONDS][(("pool", "test"),)]["count"] == 1
+    pool.shutdown()
+
+
+def test_stream_endpoint_answers_503_with_retry_after_when_saturated(monkeypatch):
+    monkeypatch.setattr(executors.cpu, "saturated", lambda: True)
+    resp = TestClient(app).post("/api/v1/chat/stream", json={"message": "Warum Obst allein?"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "2"
+    assert resp.json()["error"]["code"] == "OVERLOADED"
+
+
+@pytest.fixture
+def _db(monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+
+
+def _reject(*_a, **_k):
+    raise ExecutorSaturated("llm")
+
+
+def test_rejected_turn_leaves_no_user_message_behind(_db, monkeypatch):
+    conv_id = database.create_conversation(guest_id="guest-1")
+    database.create_message(conv_id, "user", "Hallo")
+    monkeypatch.setattr(executors.llm, "submit", _reject)
+
+    with pytest.raises(ExecutorSaturated):
+        chat_service.handle_chat(conv_id, "Ist Reis mit Brokkoli ok?", "guest-1")
+    assert [m["content"] for m in database.get_messages(conv_id)] == ["Hallo"]
+
+    with pytest.raises(ExecutorSaturated):
+        chat_service.handle_chat(None, "Ist Reis mit Brokkoli ok?", "guest-1")
+    assert [c["id"] for c in database.get_conversations_by_guest("guest-1")] == [conv_id]
+
+
+def test_rejected_vision_submit_cancels_the_queued_preprocessing(_db, monkeypatch):
+    llm = BoundedExecutor("llm", workers=1, queue=4)
+    release = threading.Event()
+    called = []
+    monkeypatch.setattr(executors, "llm", llm)
+    monkeypatch.setattr(executors.vision, "submit", _reject)
+    monkeypatch.setattr(chat_service, "FUSED_PREPROCESSING_ENABLED", False)
+    monkeypatch.setattr(chat_service, "normalize_input", lambda *_a, **_k: called.append("normalize"))
+    monkeypatch.setattr(chat_service, "classify_intent", lambda *_a, **_k: called.append("intent"))
+    conv_id = database.create_conversation(guest_id="guest-1")
+    try:
+        llm.submit(release.wait, 5)  # busy: the turn's calls stay queued
+        with pytest.raises(ExecutorSaturated):
+            chat_service.handle_chat(conv_id, "Ist das ok?", "guest-1", image_path="/tmp/teller.jpg")
+        assert llm.stats()["admitted"] == 1
+        release.set()
+        llm.shutdown(wait=True)
+    finally:
+        release.set()
+        llm.shutdown()
+
+    assert called == []
+    assert database.get_messages(conv_id) == []
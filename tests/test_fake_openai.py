@@ -0,0 +1,57 @@
+"""Local OpenAI stand-in used by scripts/load_test.py: real SDK round trips."""
+import numpy as np
+import pytest
+from openai import OpenAI
+
+from scripts.fake_openai import FakeConfig, FakeOpenAIServer, embed_text
+
+
+@pytest.fixture(scope="module")
+def fake_client():
+    server = FakeOpenAIServer(config=FakeConfig(latency_ms=0, embed_latency_ms=0, tokens_per_s=0, embed_dim=64))
+    server.start()
+    yield OpenAI(api_key="sk-fake", base_url=server.base_url), server
+    server.shutdown()
+    server.server_close()
+
+
+def test_completion_is_deterministic_and_has_usage(fake_client):
+    client, _ = fake_client
+    kwargs = dict(model="m", messages=[{"role": "user", "content": "Warum Obst allein?"}], max_tokens=40)
+    first = client.chat.completions.create(**kwargs)
+    second = client.chat.completions.create(**kwargs)
+
+    assert first.choices[0].message.content == second.choices[0].message.content
+    assert first.usage.completion_tokens > 0
+
+
+def test_normalize_prompt_echoes_message_and_json_mode_is_neutral(fake_client):
+    client, _ = fake_client
+    prompt = "Du normalisierst...\n**Aktuelle Nachricht:**\nReis mit Hähnchen\n\n**Normalisierte Nachricht:**"
+    out = client.chat.completions.create(model="m", messages=[{"role": "user", "content": prompt}])
+    assert out.choices[0].message.content == "Reis mit Hähnchen"
+
+    out = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "x"}],
+                                         response_format={"type": "json_object"})
+    assert '"intent": null' in out.choices[0].message.content
+
+
+def test_stream_yields_chunks_until_done(fake_client):
+    client, server = fake_client
+    stream = client.chat.completions.create(
+        model="m", messages=[{"role": "user", "content": "Frage"}], max_tokens=20, stream=True)
+    text = "".join(c.choices[0].delta.content or "" for c in stream)
+
+    assert len(text.split()) == 15
+    assert server.stats.counts["chat_stream"] >= 1
+
+
+def test_embeddings_are_unit_vectors_sharing_words(fake_client):
+    client, _ = fake_client
+    data = client.embeddings.create(model="e", input=["Obst am Morgen", "Obst am Abend", "Kartoffelgratin"]).data
+    vecs = np.array([d.embedding for d in data])
+
+    assert vecs.shape == (3, 64)
+    assert np.allclose(np.linalg.norm(vecs, axis=1), 1.0, atol=1e-5)
+    assert vecs[0] @ vecs[1] > vecs[0] @ vecs[2]
+    assert vecs[0].tolist() == pytest.approx(embed_text("Obst am Morgen", 64))
@@ -0,0 +1,100 @@
+"""Semantic FAQ cache: threshold + same-sources matching, pipeline replay, admin endpoints."""
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.admin as admin
+import app.chat_service as chat_service
+import app.faq_cache as faq_cache
+from app.chat_modes import ChatMode
+from app.main import app
+
+DOCS = ["Obst verdaut schnell.", "Obst gärt im Magen.", "Zucker und Stärke.", "Milieus."]
+METAS = [{"path": f"p{i}.md", "chunk": 0} for i in range(4)]
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    faq_cache.purge()
+    yield
+    faq_cache.purge()
+
+
+def _probe(vector, docs=DOCS, ui_intent="learn", question="Warum Obst alleine?"):
+    return faq_cache.make_probe(question, vector, docs, METAS, ui_intent)
+
+
+def test_probe_only_for_configured_intents_and_with_vector():
+    assert _probe([1.0, 0.0]) is not None
+    assert _probe([1.0, 0.0], ui_intent="eat") is None
+    assert _probe(None) is None
+
+
+def test_lookup_requires_similarity_and_same_sources():
+    faq_cache.store(_probe([1.0, 0.0, 0.0]), "Antwort")
+
+    assert faq_cache.lookup(_probe([0.99, 0.05, 0.0], question="Wieso Obst solo?")) == "Antwort"
+    assert faq_cache.lookup(_probe([0.7, 0.7, 0.0])) is None
+    assert faq_cache.lookup(_probe([1.0, 0.0, 0.0], docs=["Anderer Text"] + DOCS[1:])) is None
+    # order of the top chunks does not matter, their identity does
+    reordered = faq_cache.make_probe("q", [1.0, 0.0, 0.0], DOCS[::-1], METAS[::-1], "learn")
+    assert faq_cache.lookup(reordered) == "Antwort"
+    assert faq_cache.stats()["hits"] == 2
+
+
+def test_store_replaces_same_question_and_evicts_lru(monkeypatch):
+    monkeypatch.setattr(faq_cache, "FAQ_CACHE_MAX_ENTRIES", 2)
+    faq_cache.store(_probe([1.0, 0.0]), "alt")
+    faq_cache.store(_probe([1.0, 0.0]), "neu")
+    assert [e["answer_preview"] for e in faq_cache.list_entries()] == ["neu"]
+
+    faq_cache.store(_probe([0.0, 1.0], question="Was sind Milieus?"), "m")
+    faq_cache.lookup(_probe([1.0, 0.0]))
+    faq_cache.store(_probe([0.6, 0.8], question="Was ist Stärke?"), "s")
+    questions = {e["question"] for e in faq_cache.list_entries()}
+    assert questions == {"warum obst alleine?", "was ist stärke?"}
+
+
+def test_generate_and_save_reuses_answer_for_paraphrase(monkeypatch):
+    calls = {"n": 0}
+
+    def _create(**_kwargs):
+        calls["n"] += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Obst allein essen."))])
+
+    monkeypatch.setattr(chat_service, "client",
+                        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create))))
+    monkeypatch.setattr(chat_service, "create_message", lambda *_a, **_k: None)
+
+    first = chat_service._generate_and_save(
+        "c1", "prompt-1", ChatMode.KNOWLEDGE, faq_probe=_probe([1.0, 0.0]))
+    second = chat_service._generate_and_save(
+        "c2", "prompt-2", ChatMode.KNOWLEDGE, faq_probe=_probe([0.995, 0.1], question="Obst separat?"))
+
+    assert first == second == "Obst allein essen."
+    assert calls["n"] == 1
+
+
+def test_admin_endpoints_list_and_purge(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    faq_cache.store(_probe([1.0, 0.0]), "Antwort")
+    http = TestClient(app)
+
+    assert http.get("/api/v1/admin/faq-cache").status_code == 403
+    headers = {"X-Admin-Token": "secret"}
+    data = http.get("/api/v1/admin/faq-cache", headers=headers).json()
+    assert data["stats"]["entries"] == 1
+    entry = data["entries"][0]
+    assert entry["question"] == "warum obst alleine?"
+    assert entry["sources"] == [f"p{i}.md#0" for i in range(4)]
+
+    assert http.delete("/api/v1/admin/faq-cache/nope", headers=headers).status_code == 404
+    assert http.delete(f"/api/v1/admin/faq-cache/{entry['id']}", headers=headers).json() == {"purged": 1}
+    assert http.delete("/api/v1/admin/faq-cache", headers=headers).json() == {"purged": 0}
+
+
+def test_admin_endpoints_disabled_in_prod_without_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    monkeypatch.setattr(admin, "APP_ENV", "prod")
+    assert TestClient(app).get("/api/v1/admin/faq-cache").status_code == 403
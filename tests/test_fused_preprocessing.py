@@ -0,0 +1,121 @@
+"""Fused preprocessing: per-field parsing, consumers reading fused fields, split-path fallback."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import app.chat_service as chat_service
+from app import database, fused_preprocessing, input_service, metrics, migrations, rag_service, speculative_retrieval
+from app.fused_preprocessing import FusedResult, parse
+
+_HISTORY = [
+    {"role": "user", "content": "Ist Lachs mit Kartoffeln ok?"},
+    {"role": "assistant", "content": "Lachs und Kartoffeln solltest du trennen."},
+]
+
+
+def _fake_client(calls, content="LLM"):
+    def _create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    metrics.reset()
+    fused_preprocessing.activate(None)
+    yield
+    fused_preprocessing.activate(None)
+    metrics.reset()
+
+
+def _field_sources():
+    series = metrics.snapshot()["counters"].get(fused_preprocessing.FIELDS_TOTAL, {})
+    return {(dict(k)["field"], dict(k)["source"]): v for k, v in series.items()}
+
+
+def test_parse_validates_each_field_on_its_own():
+    raw = json.dumps({"normalized": "Ist Reis mit Hähnchen ok?", "intent": "recipe_from_ingredients",
+                      "intent_confidence": "sure", "foods": "Reis: Kohlenhydrate; Hähnchen: Protein",
+                      "needs_clarification": "", "standalone_query": "Reis Hähnchen Kombination"})
+    assert parse(raw, "Ist Resi mit Hähnchen ok?") == {
+        "normalized_message": "Ist Reis mit Hähnchen ok?",
+        "intent": {"intent": "recipe_from_ingredients", "confidence": "low"},
+        "food": {"classification": "Reis: Kohlenhydrate; Hähnchen: Protein", "needs_clarification": None},
+        "standalone_query": "Reis Hähnchen Kombination",
+    }
+
+    partial = json.dumps({"normalized": "x" * 100, "intent": "smoothie", "foods": None, "standalone_query": " "})
+    assert parse(partial, "kurz") == {}
+    assert parse("not json", "kurz") == {}
+    assert parse(json.dumps({"normalized": "anders"}), "a" * 250) == {"normalized_message": "a" * 250}
+
+
+def test_consumers_use_fused_fields_without_llm_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(input_service, "client", _fake_client(calls))
+    monkeypatch.setattr(rag_service, "client", _fake_client(calls))
+    fused_preprocessing.activate(FusedResult("Kann ich ihn grllen", {
+        "normalized_message": "Kann ich ihn grillen?",
+        "intent": {"intent": None, "confidence": "high"},
+        "food": {"classification": "Fisch: Protein", "needs_clarification": None},
+        "standalone_query": "Lachs grillen Protein",
+    }))
+
+    normalized = input_service.normalize_input("Kann ich ihn grllen", _HISTORY, False)
+    assert normalized == "Kann ich ihn grillen?"
+    assert input_service.classify_intent("Kann ich ihn grllen", _HISTORY) == {"intent": None, "confidence": "high"}
+    assert rag_service.rewrite_standalone_query(None, _HISTORY, normalized) == "Lachs grillen Protein"
+    assert input_service.classify_food_items(normalized, "Lachs grillen Protein")["classification"] == "Fisch: Protein"
+    assert calls == []
+    assert set(_field_sources()) == {(f, "fused") for f in fused_preprocessing.FIELDS}
+
+    decisions = metrics.snapshot()["counters"][rag_service.REWRITES_TOTAL]
+    assert {dict(k)["decision"] for k in decisions} == {"fused"}
+
+
+def test_missing_fields_and_other_messages_fall_back_to_the_split_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(input_service, "client", _fake_client(calls, content='{"intent": null, "confidence": "low"}'))
+    fused_preprocessing.activate(FusedResult("Ist Reis ok?", {"normalized_message": "Ist Reis ok?"}))
+
+    assert input_service.classify_intent("Ist Reis ok?", []) == {"intent": None, "confidence": "low"}
+    assert len(calls) == 1  # intent field missing → own prompt
+    assert input_service.normalize_input("Ist Reis ok?", [], True) == "Ist Reis ok?"
+    assert fused_preprocessing.field("normalized_message", "Ist Hirse ok?") is None  # computed for another message
+    assert _field_sources() == {("intent", "fallback"): 1, ("normalized_message", "fused"): 1}
+
+
+def test_stream_pipeline_issues_one_fused_call(monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+
+    calls = []
+    fused_json = json.dumps({"normalized": "Warum soll man Obst allein essen?", "intent": None,
+                             "intent_confidence": "high", "foods": "Obst", "needs_clarification": None,
+                             "standalone_query": "Obst allein essen Verdauung"})
+    monkeypatch.setattr(fused_preprocessing, "client", _fake_client(calls, content=fused_json))
+    monkeypatch.setattr(input_service, "client", _fake_client(calls))
+    monkeypatch.setattr(rag_service, "client", _fake_client(calls))
+    monkeypatch.setattr(chat_service, "FUSED_PREPROCESSING_ENABLED", True)
+    monkeypatch.setattr(speculative_retrieval, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+    queries = []
+
+    def _retrieve(query, _user_message):
+        queries.append(query)
+        return ["Obst verdaut schnell."], [{"path": "kurs/obst.pdf", "page": 1, "chunk": 0}], [0.2], False
+
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback", _retrieve)
+
+    prepare = speculative_retrieval.scoped(chat_service._prepare_stream)
+    prep = prepare(None, "warum soll man obst allein essen", "guest-1", "learn")
+
+    assert len(calls) == 1 and calls[0]["response_format"] == {"type": "json_object"}
+    assert "Warum soll man Obst allein essen?" in prep["llm_input"]
+    assert queries[-1].endswith("\nObst")
+    sources = _field_sources()
+    assert sources[("normalized_message", "fused")] == 1 and sources[("food", "fused")] == 1
@@ -0,0 +1,157 @@
+"""Incremental ingestion: content-hash manifest diffing and resumable batch upserts."""
+import json
+
+import pytest
+
+import scripts.ingest as ingest
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.upsert_calls = 0
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.upsert_calls += 1
+        for cid, doc, meta, vec in zip(ids, documents, metadatas, embeddings):
+            self.rows[cid] = (doc, meta, vec)
+
+    def delete(self, ids):
+        for cid in ids:
+            self.rows.pop(cid, None)
+
+    def get(self, include=None):
+        ids = sorted(self.rows)
+        return {"ids": ids, "metadatas": [self.rows[i][1] for i in ids]}
+
+
+def _item(cid: str, doc: str):
+    meta = ingest.prepare_metadata({"path": cid.split("::")[0], "chunk": 0})
+    meta["content_hash"] = ingest.chunk_hash(doc, meta)
+    return cid, doc, meta
+
+
+def test_chunk_hash_is_stable_and_content_sensitive():
+    meta = ingest.prepare_metadata({"path": "a.md", "chunk": 0})
+    assert ingest.chunk_hash("Text", meta) == ingest.chunk_hash("Text", dict(meta))
+    assert ingest.chunk_hash("Text", meta) != ingest.chunk_hash("Text!", meta)
+    assert ingest.chunk_hash("Text", meta) != ingest.chunk_hash("Text", {**meta, "section": "Neu"})
+    assert ingest.chunk_hash("Text", meta) == ingest.chunk_hash("Text", {**meta, "content_hash": "x"})
+
+
+def test_plan_sync_splits_new_changed_removed_and_unchanged():
+    current = {"a": "h1", "b": "h2-new", "c": "h3"}
+    manifest = {"a": "h1", "b": "h2-old", "d": "h4"}
+
+    to_embed, to_delete, unchanged = ingest.plan_sync(current, manifest)
+
+    assert to_embed == ["b", "c"]
+    assert to_delete == ["d"]
+    assert unchanged == ["a"]
+
+
+def test_load_manifest_ignores_foreign_embed_model(tmp_path):
+    path = tmp_path / "manifest.json"
+    assert ingest.read_manifest(path) == ("missing", {})
+    ingest.save_manifest(path, {"a": "h1"})
+    assert ingest.read_manifest(path) == ("ok", {"a": "h1"})
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["embed_model"] = "other-model"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    assert ingest.read_manifest(path) == ("mismatch", {})
+    assert ingest.load_manifest(path) == {}
+
+
+class _FakeChroma:
+    def __init__(self):
+        self.col = _FakeCollection()
+        self.deleted = 0
+
+    def delete_collection(self, name):
+        self.deleted += 1
+        self.col = _FakeCollection()
+
+    def get_or_create_collection(self, name):
+        return self.col
+
+
+def test_model_change_rebuilds_collection_on_incremental_run(monkeypatch, tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    (pages / "a.md").write_text("Erster Absatz.", encoding="utf-8")
+    (pages / "b.md").write_text("Zweiter Absatz.", encoding="utf-8")
+    chroma = _FakeChroma()
+    monkeypatch.setattr(ingest, "PAGES_DIR", pages)
+    monkeypatch.setattr(ingest, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(ingest, "MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(ingest.chromadb, "PersistentClient", lambda **_k: chroma)
+    monkeypatch.setattr(ingest, "embed_batch", lambda texts: [[0.0, 0.0] for _ in texts])
+    monkeypatch.setattr("sys.argv", ["ingest.py", "--incremental"])
+    ingest.main()
+    assert chroma.deleted == 0 and len(chroma.col.rows) == 2
+
+    embedded = []
+    monkeypatch.setattr(ingest, "EMBED_MODEL", "text-embedding-3-large")
+    monkeypatch.setattr(ingest, "embed_batch", lambda texts: embedded.extend(texts) or [[1.0] * 3 for _ in texts])
+    ingest.main()
+
+    assert chroma.deleted == 1
+    assert sorted(embedded) == ["Erster Absatz.", "Zweiter Absatz."]
+    assert all(vec == [1.0] * 3 for _, _, vec in chroma.col.rows.values())
+    assert ingest.read_manifest(tmp_path / "manifest.json")[0] == "ok"
+
+
+def test_manifest_rebuilt_from_collection_marks_other_model_as_changed(monkeypatch):
+    col = _FakeCollection()
+    cid, doc, meta = _item("a.md::chunk_0", "Text")
+    col.upsert([cid], [doc], [meta], [[0.0]])
+
+    monkeypatch.setattr(ingest, "EMBED_MODEL", "text-embedding-3-large")
+    current = {cid: ingest.chunk_hash(doc, meta)}
+    to_embed, _, unchanged = ingest.plan_sync(current, ingest.manifest_from_collection(col))
+
+    assert to_embed == [cid] and unchanged == []
+
+
+def test_embed_and_upsert_persists_manifest_per_batch(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, "embed_batch", lambda texts: [[float(len(t))] for t in texts])
+    col = _FakeCollection()
+    path = tmp_path / "manifest.json"
+    items = [_item(f"p{i}.md::chunk_0", f"doc {i}") for i in range(5)]
+    manifest = {}
+
+    done = ingest.embed_and_upsert(col, items, manifest, path, batch_size=2, workers=3)
+
+    assert done == 5
+    assert col.upsert_calls == 3
+    assert ingest.load_manifest(path) == {cid: meta["content_hash"] for cid, _, meta in items}
+    assert ingest.manifest_from_collection(col) == ingest.load_manifest(path)
+
+
+def test_interrupted_run_resumes_with_remaining_chunks(monkeypatch, tmp_path):
+    calls = {"n": 0}
+
+    def flaky_embed(texts):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("network down")
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(ingest, "embed_batch", flaky_embed)
+    col = _FakeCollection()
+    path = tmp_path / "manifest.json"
+    items = [_item(f"p{i}.md::chunk_0", f"doc {i}") for i in range(4)]
+
+    with pytest.raises(RuntimeError):
+        ingest.embed_and_upsert(col, items, {}, path, batch_size=2, workers=1)
+
+    current = {cid: meta["content_hash"] for cid, _, meta in items}
+    to_embed, _, unchanged = ingest.plan_sync(current, ingest.load_manifest(path))
+    assert len(unchanged) == 2
+    assert len(to_embed) == 2
+
+    monkeypatch.setattr(ingest, "embed_batch", lambda texts: [[0.0] for _ in texts])
+    remaining = [it for it in items if it[0] in set(to_embed)]
+    ingest.embed_and_upsert(col, remaining, ingest.load_manifest(path), path, batch_size=2, workers=1)
+    assert ingest.load_manifest(path) == current
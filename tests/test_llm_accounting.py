@@ -0,0 +1,110 @@
+"""LLM call accounting proxy: per-site latency, tokens, timeouts, admin endpoint."""
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+import app.admin as admin
+from app import llm_accounting, metrics
+from app.main import app
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.fail = None
+
+    def create(self, **kwargs):
+        if self.fail:
+            raise self.fail
+        if kwargs.get("stream"):
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))])
+                         for t in ("Hallo ", "Welt")])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=7),
+        )
+
+
+@pytest.fixture
+def accounted():
+    llm_accounting.ledger.reset()
+    metrics.reset()
+    completions = _FakeCompletions()
+    inner = SimpleNamespace(
+        chat=SimpleNamespace(completions=completions),
+        embeddings=SimpleNamespace(create=lambda **_k: SimpleNamespace(data=[], usage=None)),
+        api_key="sk-test",
+    )
+    yield llm_accounting.AccountingClient(inner), completions
+    llm_accounting.ledger.reset()
+    metrics.reset()
+
+
+def _site(name):
+    return next(s for s in llm_accounting.ledger.summary()["sites"] if s["site"].endswith(name))
+
+
+def normalize_input(client):
+    return client.chat.completions.create(model="m", messages=[{"role": "user", "content": "x"}])
+
+
+def stream_answer(client):
+    return "".join(c.choices[0].delta.content for c in client.chat.completions.create(
+        model="m", messages=[{"role": "user", "content": "Frage"}], stream=True))
+
+
+def test_calls_are_attributed_to_the_calling_function(accounted):
+    client, _ = accounted
+    normalize_input(client)
+    normalize_input(client)
+    client.embeddings.create(model="e", input=["text"])
+
+    site = _site(".normalize_input")
+    assert site["calls"] == 2
+    assert site["prompt_tokens"] == 240 and site["completion_tokens"] == 14
+    assert _site(".test_calls_are_attributed_to_the_calling_function")["kind"] == "embedding"
+    assert client.api_key == "sk-test"  # other attributes pass through
+
+
+def test_stream_records_first_chunk_and_estimated_tokens(accounted):
+    client, _ = accounted
+    assert stream_answer(client) == "Hallo Welt"
+
+    site = _site(".stream_answer")
+    assert site["kind"] == "chat_stream"
+    assert site["first_chunk_p50_ms"] is not None
+    assert site["completion_tokens"] > 0
+
+
+def test_timeouts_and_errors_are_counted(accounted):
+    client, completions = accounted
+    completions.fail = openai.APITimeoutError(request=httpx.Request("POST", "http://x"))
+    with pytest.raises(openai.APITimeoutError):
+        normalize_input(client)
+    completions.fail = RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        normalize_input(client)
+
+    site = _site(".normalize_input")
+    assert (site["calls"], site["timeouts"], site["errors"]) == (2, 1, 1)
+    text = metrics.render_prometheus()
+    assert 'outcome="timeout"' in text and 'outcome="error"' in text
+
+
+def test_summary_log_and_admin_endpoint(accounted, monkeypatch, capsys):
+    client, _ = accounted
+    normalize_input(client)
+
+    llm_accounting.ledger.log_summary()
+    assert "[LLM_CALLS]" in capsys.readouterr().out
+    llm_accounting.ledger.log_summary()  # nothing new → silent
+    assert capsys.readouterr().out == ""
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    http = TestClient(app)
+    assert http.get("/api/v1/admin/llm-calls").status_code == 403
+    data = http.get("/api/v1/admin/llm-calls", headers={"X-Admin-Token": "secret"}).json()
+    assert any(s["site"].endswith(".normalize_input") for s in data["sites"])
+    assert http.delete("/api/v1/admin/llm-calls", headers={"X-Admin-Token": "secret"}).json() == {"purged": 1}
@@ -0,0 +1,99 @@
+"""Per-stage spans, turn labels and the Prometheus /api/v1/metrics endpoint."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.chat_service as chat_service
+from app import metrics
+from app.chat_modes import ChatMode
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _stage_series():
+    return metrics.snapshot()["histograms"].get(metrics.STAGE_SECONDS, {})
+
+
+def test_spans_get_mode_label_resolved_at_turn_end():
+    with metrics.turn("chat", ui_intent="eat"):
+        with metrics.span("normalize"):
+            pass
+        metrics.set_mode(ChatMode.FOOD_ANALYSIS)
+        with metrics.span("engine"):
+            pass
+
+    keys = set(_stage_series())
+    assert (("mode", "FOOD_ANALYSIS"), ("stage", "normalize"), ("ui_intent", "eat")) in keys
+    assert (("mode", "FOOD_ANALYSIS"), ("stage", "engine"), ("ui_intent", "eat")) in keys
+    turns = metrics.snapshot()["counters"][metrics.TURNS_TOTAL]
+    assert turns == {(("mode", "FOOD_ANALYSIS"), ("outcome", "ok"), ("path", "chat"), ("ui_intent", "eat")): 1.0}
+
+
+def test_timed_executor_work_is_attributed_to_the_turn():
+    with metrics.turn("chat"):
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            ex.submit(metrics.timed("intent", lambda: None)).result()
+
+    assert (("mode", "none"), ("stage", "intent"), ("ui_intent", "none")) in _stage_series()
+
+
+def test_failed_turn_is_counted_as_error():
+    with pytest.raises(RuntimeError):
+        with metrics.turn("chat"):
+            raise RuntimeError("boom")
+    [key] = metrics.snapshot()["counters"][metrics.TURNS_TOTAL]
+    assert ("outcome", "error") in key
+
+
+def test_prometheus_text_has_cumulative_buckets():
+    metrics.observe("demo_seconds", 0.02, {"stage": "x"})
+    metrics.observe("demo_seconds", 3.0, {"stage": "x"})
+    text = metrics.render_prometheus()
+
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="x",le="0.025"} 1' in text
+    assert 'demo_seconds_bucket{stage="x",le="5"} 2' in text
+    assert 'demo_seconds_bucket{stage="x",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="x"} 2' in text
+
+
+def test_async_stream_records_llm_stages_and_endpoint_exposes_them(monkeypatch):
+    def _create(**_kwargs):
+        return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))])
+                     for t in ("Obst ", "allein.")])
+
+    monkeypatch.setattr(chat_service, "client",
+                        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create))))
+    monkeypatch.setattr(chat_service, "create_message", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "get_conversation", lambda *_a, **_k: None)
+
+    def _prepare(*_args):
+        metrics.set_mode(ChatMode.KNOWLEDGE)
+        with metrics.span("retrieval"):
+            pass
+        return {"conversation_id": "conv-1", "llm_input": "prompt", "ui_intent": "learn",
+                "mode": ChatMode.KNOWLEDGE, "recipe_results": None, "sources": []}
+
+    monkeypatch.setattr(chat_service, "_prepare_stream", _prepare)
+
+    async def _collect():
+        return [f async for f in chat_service.handle_chat_stream_async("conv-1", "Warum Obst?", intent="learn")]
+
+    frames = asyncio.run(_collect())
+    assert frames[-1].startswith("event: final")
+
+    stages = {dict(k)["stage"] for k in _stage_series() if dict(k)["mode"] == "KNOWLEDGE"}
+    assert {"retrieval", "llm_first_token", "llm_total"} <= stages
+
+    body = TestClient(app).get("/api/v1/metrics").text
+    assert 'kursbot_stage_duration_seconds_count{mode="KNOWLEDGE",stage="llm_first_token",ui_intent="learn"} 1' in body
+    assert 'kursbot_turns_total{mode="KNOWLEDGE",outcome="ok",path="stream_async",ui_intent="learn"} 1' in body
@@ -0,0 +1,20 @@
+"""Microbenchmark runner: autoranged timings and baseline comparison."""
+from scripts.microbench import compare, run_bench
+
+
+def test_run_bench_autoranges_and_reports_per_op_times():
+    calls = []
+    result = run_bench(lambda: calls.append(1), rounds=3, min_batch_s=0.001)
+
+    assert result["ops_per_batch"] > 1
+    assert 0 < result["min_us"] <= result["median_us"] <= result["max_us"]
+    assert len(calls) > 3 * result["ops_per_batch"]
+
+
+def test_compare_flags_slowdowns_beyond_threshold():
+    baseline = {"results": {"a": {"min_us": 100.0}, "b": {"min_us": 100.0}, "c": {"min_us": 100.0}}}
+    current = {"results": {"a": {"min_us": 130.0}, "b": {"min_us": 110.0}, "c": {"min_us": 50.0},
+                           "d": {"min_us": 1.0}}}
+
+    status = {r["name"]: r["status"] for r in compare(baseline, current, threshold=0.15)}
+    assert status == {"a": "regression", "b": "ok", "c": "improved", "d": "new"}
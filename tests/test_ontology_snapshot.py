@@ -0,0 +1,90 @@
+"""Compiled ontology snapshot: same lookups as the CSV path, invalidated by source and code hashes."""
+import pickle
+import shutil
+
+import pytest
+
+from trennkost import ontology_snapshot as snap
+from trennkost.ontology import Ontology
+
+
+@pytest.fixture
+def sources(tmp_path):
+    copied = {}
+    for name, path in snap._sources().items():
+        target = tmp_path / path.name
+        shutil.copy(path, target)
+        copied[name] = target
+    return copied
+
+
+def _build(sources):
+    return Ontology(
+        ontology_csv=sources["ontology_csv"],
+        compounds_json=sources["compounds_json"],
+        wait_profiles_json=sources["wait_profiles_json"],
+        risk_profiles_json=sources["risk_profiles_json"],
+        guidance_profiles_json=sources["guidance_profiles_json"],
+    )
+
+
+def test_snapshot_roundtrip_matches_csv_ontology(tmp_path, sources):
+    original = _build(sources)
+    path = snap.compile_snapshot(original, tmp_path / "onto.pkl", sources)
+    restored = snap.load_snapshot(path, sources)
+
+    assert restored is not None
+    assert [e.model_dump() for e in restored.entries] == [e.model_dump() for e in original.entries]
+    assert restored.validation_issues == original.validation_issues
+    for name in ["Hähnchen", "gegrilltes Hähnchen", "Lachs", "Vollkornnudeln", "xyz"]:
+        a, b = original.lookup(name), restored.lookup(name)
+        assert (a and a.canonical) == (b and b.canonical)
+    compound = next(iter(original.compounds))
+    assert restored.get_compound(compound.upper()) == original.get_compound(compound)
+
+
+def test_snapshot_is_stale_after_source_change(tmp_path, sources):
+    path = snap.compile_snapshot(_build(sources), tmp_path / "onto.pkl", sources)
+    with open(sources["ontology_csv"], "a", encoding="utf-8") as f:
+        f.write("\n# changed\n")
+    assert snap.load_snapshot(path, sources) is None
+
+
+def test_snapshot_is_stale_after_code_change(tmp_path, sources, monkeypatch):
+    code = {}
+    for name, path in snap._code_files().items():
+        code[name] = tmp_path / path.name
+        shutil.copy(path, code[name])
+    monkeypatch.setattr(snap, "_code_files", lambda: code)
+    path = snap.compile_snapshot(_build(sources), tmp_path / "onto.pkl", sources)
+    assert snap.load_snapshot(path, sources) is not None
+
+    with open(code["models_py"], "a", encoding="utf-8") as f:
+        f.write("\n# changed\n")
+    assert snap.load_snapshot(path, sources) is None
+
+
+def test_unreadable_snapshot_falls_back(tmp_path, sources):
+    path = tmp_path / "onto.pkl"
+    path.write_bytes(b"not a pickle")
+    assert snap.load_snapshot(path, sources) is None
+
+    path.write_bytes(pickle.dumps(["not", "a", "payload"]))
+    assert snap.load_snapshot(path, sources) is None
+    path.write_bytes(pickle.dumps({"code": snap.code_hashes(), "sources": snap.source_hashes(sources), "state": {}}))
+    assert snap.load_snapshot(path, sources) is None
+
+
+def test_load_ontology_writes_then_reuses_snapshot(tmp_path):
+    path = tmp_path / "onto.pkl"
+    first = snap.load_ontology(path)
+    assert path.exists()
+    second = snap.load_ontology(path)
+    assert second is not first
+    assert len(second.entries) == len(first.entries)
+
+
+def test_test_runs_do_not_write_the_default_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(snap, "SNAPSHOT_PATH", tmp_path / "default.pkl")
+    assert snap.load_ontology().entries
+    assert not (tmp_path / "default.pkl").exists()
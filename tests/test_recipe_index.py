@@ -0,0 +1,142 @@
+"""Local recipe index: shortlist quality, keyword-fallback parity, prompt size."""
+import pytest
+
+import app.recipe_service as recipe_service
+from app.recipe_index import RecipeIndex, query_terms
+from app.token_budget import count_tokens
+
+EXPECTED_TOP = [
+    ("Kartoffelsuppe", "goldene-kartoffelsuppe"),
+    ("Linsen Eintopf", "altmodische-linsensuppe"),
+    ("Nudeln mit Tomatensoße", "cashew-tomatensauce-nudeln"),
+    ("Ich hätte gern etwas Italienisches", "spargel-auf-italienische-art"),
+    ("Ofengemüse", "knuspriges-ofengemuse"),
+]
+
+PARITY_QUERIES = [
+    "Kartoffelsuppe",
+    "Zucchini und Reis",
+    "Smoothie",
+    "Linsen Eintopf",
+    "Nudeln mit Tomatensoße",
+    "Avocado Brot",
+]
+
+
+@pytest.fixture(scope="module")
+def recipes():
+    loaded = recipe_service.load_recipes()
+    if not loaded:
+        pytest.skip("recipes.json not available")
+    return loaded
+
+
+def _keyword_fallback(monkeypatch, query, limit=5):
+    monkeypatch.setattr(recipe_service, "_llm_select_recipe_ids", lambda *_a, **_k: [])
+    return recipe_service.search_recipes(query, limit=limit)
+
+
+def test_query_terms_drop_stopwords_and_stem():
+    assert query_terms("Ich hätte gern etwas Italienisches") == ["italie"]
+    assert query_terms("Zucchini und Reis") == ["zucchi", "reis"]
+
+
+@pytest.mark.parametrize("query,expected_id", EXPECTED_TOP)
+def test_shortlist_contains_expected_recipe(recipes, query, expected_id):
+    shortlist = recipe_service.get_recipe_index().shortlist(query, recipes)
+    ids = [r["id"] for r in shortlist]
+    assert len(ids) <= 20
+    assert expected_id in ids[:5]
+
+
+@pytest.mark.parametrize("query", PARITY_QUERIES)
+def test_shortlist_keeps_keyword_fallback_hits(recipes, monkeypatch, query):
+    shortlist_ids = {r["id"] for r in recipe_service.get_recipe_index().shortlist(query, recipes)}
+    fallback = [r for r in _keyword_fallback(monkeypatch, query) if r["score"] > 0]
+    assert fallback
+    assert {r["id"] for r in fallback} <= shortlist_ids
+
+
+def test_no_lexical_signal_keeps_full_pool(recipes):
+    assert len(recipe_service.get_recipe_index().shortlist("etwas Traditionelles", recipes)) == len(recipes)
+
+
+def test_small_pool_is_not_cut():
+    pool = [{"id": f"r{i}", "name": f"Salat {i}"} for i in range(5)]
+    assert RecipeIndex(pool).shortlist("Salat", pool, k=10) == pool
+
+
+def test_search_recipes_sends_shortlist_to_llm(recipes, monkeypatch):
+    seen = {}
+
+    def _select(query, candidates, limit=3):
+        seen["ids"] = [r["id"] for r in candidates]
+        return ["goldene-kartoffelsuppe"]
+
+    monkeypatch.setattr(recipe_service, "_llm_select_recipe_ids", _select)
+    results = recipe_service.search_recipes("Kartoffelsuppe")
+
+    assert len(seen["ids"]) <= 20 < len(recipes)
+    assert "goldene-kartoffelsuppe" in seen["ids"]
+    assert results[0]["id"] == "goldene-kartoffelsuppe"
+
+
+def test_shortlist_prompt_is_much_smaller(recipes):
+    query = "Zucchini und Reis"
+    shortlist = recipe_service.get_recipe_index().shortlist(query, recipes)
+    full = count_tokens(recipe_service._build_recipe_selection_prompt(query, recipes))
+    short = count_tokens(recipe_service._build_recipe_selection_prompt(query, shortlist))
+    assert short < full * 0.4
+
+
+# ── Inverted ingredient index ─────────────────────────────────────────
+
+OVERLAP_CASES = [
+    ["Kartoffeln", "Zwiebel", "Karotte"],
+    ["Hähnchenbrust", "Reis", "Brokkoli"],
+    ["tomate", "nudeln", "basilikum", "knoblauch"],
+    ["Linsen", "Möhren", "Sellerie", "Lauch"],
+    ["xyz"],
+]
+
+
+def _pairwise_overlap(available, limit):
+    """Reference: the original per-pair _ingredient_matches scoring."""
+    scored = []
+    for recipe in recipe_service.load_recipes():
+        required = recipe.get("ingredients", [])
+        if not required:
+            continue
+        matched = [i for i in required if any(recipe_service._ingredient_matches(i, a) for a in available)]
+        missing_optional = [
+            o for o in recipe.get("optional_ingredients", [])
+            if not any(recipe_service._ingredient_matches(o, a) for a in available)
+        ]
+        scored.append((len(matched) / len(required), recipe["name"], recipe["id"], matched, missing_optional))
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    return [(rid, score, matched, missing) for score, _, rid, matched, missing in scored[:limit]]
+
+
+@pytest.mark.parametrize("available", OVERLAP_CASES)
+def test_ingredient_overlap_matches_pairwise_reference(recipes, available):
+    results = recipe_service.find_recipes_by_ingredient_overlap(available, limit=len(recipes))
+    got = [(r["id"], r["overlap_score"], r["matched_ingredients"], r["missing_optional"]) for r in results]
+    assert got == _pairwise_overlap(available, len(recipes))
+
+
+def test_term_mask_covers_vocabulary_of_the_same_canonical(recipes):
+    index = recipe_service.get_ingredient_index()
+    canonical, vids = next(iter(index._canonical_vocab.items()))
+    mask = index.term_mask(index.vocab[vids[0]])
+    assert mask[vids].all()
+    for vid in vids:
+        assert recipe_service.get_ontology().lookup(index.vocab[vid]).canonical == canonical
+
+
+def test_keyword_fallback_uses_ingredient_index(recipes, monkeypatch):
+    def _fail(*_a, **_k):
+        raise AssertionError("pairwise matching should not run")
+
+    monkeypatch.setattr(recipe_service, "_ingredient_matches", _fail)
+    results = _keyword_fallback(monkeypatch, "Kartoffel Zwiebel Suppe")
+    assert results and results[0]["score"] >= 3.0
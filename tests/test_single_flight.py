@@ -0,0 +1,125 @@
+"""Single-flight: identical in-flight calls share one request (threads and asyncio)."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from app import metrics, rag_service, single_flight
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _roles(site):
+    series = metrics.snapshot()["counters"].get(single_flight.CALLS_TOTAL, {})
+    return {dict(k)["role"]: v for k, v in series.items() if dict(k)["site"] == site}
+
+
+def _wait_for_followers(site, n, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while _roles(site).get("follower", 0) < n:
+        assert time.monotonic() < deadline, f"only {_roles(site)} joined"
+        time.sleep(0.005)
+
+
+class _SlowCall:
+    def __init__(self, result="ok", exc=None):
+        self.calls = []
+        self.release = threading.Event()
+        self.result, self.exc = result, exc
+
+    def __call__(self, **params):
+        self.calls.append(params)
+        self.release.wait(5)
+        if self.exc:
+            raise self.exc
+        return self.result
+
+
+def test_concurrent_identical_thread_calls_share_one_request():
+    fn = _SlowCall(result=object())
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(single_flight.run, "t.site", fn, model="m", messages=[{"content": "Hallo"}])
+                   for _ in range(5)]
+        _wait_for_followers("t.site", 4)
+        fn.release.set()
+        results = [f.result(5) for f in futures]
+
+    assert len(fn.calls) == 1
+    assert all(r is fn.result for r in results)
+    assert _roles("t.site") == {"leader": 1, "follower": 4}
+    assert single_flight.inflight() == 0
+    single_flight.run("t.site", fn, model="m", messages=[{"content": "Hallo"}])  # finished → new call
+    assert len(fn.calls) == 2
+
+
+def test_errors_are_shared_and_different_params_are_not_coalesced():
+    fn = _SlowCall(exc=TimeoutError("upstream timeout"))
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        same = [pool.submit(single_flight.run, "t.err", fn, model="m", input=["a"]) for _ in range(2)]
+        _wait_for_followers("t.err", 1)
+        other = pool.submit(single_flight.run, "t.err", fn, model="m", input=["b"])
+        fn.release.set()
+        for f in same + [other]:
+            with pytest.raises(TimeoutError):
+                f.result(5)
+    assert [c["input"] for c in fn.calls].count(["a"]) == 1 and len(fn.calls) == 2
+
+
+def test_async_callers_coalesce_and_can_follow_a_thread_leader():
+    calls = []
+
+    async def _create(**params):
+        calls.append(params)
+        await asyncio.sleep(0.05)
+        return "async-ok"
+
+    async def _flow():
+        return await asyncio.gather(*[single_flight.run_async("t.async", _create, model="m", input=["x"])
+                                      for _ in range(4)])
+
+    assert asyncio.run(_flow()) == ["async-ok"] * 4
+    assert len(calls) == 1 and _roles("t.async") == {"leader": 1, "follower": 3}
+
+    fn = _SlowCall(result="thread-ok")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(single_flight.run, "t.mixed", fn, model="m")
+        while single_flight.inflight() == 0:
+            time.sleep(0.005)
+
+        async def _follow():
+            task = asyncio.ensure_future(single_flight.run_async("t.mixed", _create, model="m"))
+            await asyncio.sleep(0.01)
+            fn.release.set()
+            return await task
+
+        assert asyncio.run(_follow()) == "thread-ok"
+        assert leader.result(5) == "thread-ok"
+    assert len(fn.calls) == 1 and len(calls) == 1
+
+
+def test_embed_one_coalesces_concurrent_requests(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def _create(model, input):
+        calls.append(input)
+        release.wait(5)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2])])
+
+    monkeypatch.setattr(rag_service, "client", SimpleNamespace(embeddings=SimpleNamespace(create=_create)))
+    monkeypatch.setattr(rag_service, "_embed_memo", type(rag_service._embed_memo)())
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(rag_service.embed_one, "Warum Obst allein?") for _ in range(3)]
+        _wait_for_followers("rag_service.embed_one", 2)
+        release.set()
+        assert [f.result(5) for f in futures] == [[0.1, 0.2]] * 3
+    assert calls == [["Warum Obst allein?"]]
@@ -0,0 +1,104 @@
+"""Speculative retrieval on the raw message: similarity check, hit/miss reuse, turn scoping."""
+import pytest
+
+import app.chat_service as chat_service
+from app import database, metrics, migrations, speculative_retrieval
+from app.speculative_retrieval import similarity
+
+RAW = "warum soll man obst allein essen"
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+
+    queries = []
+
+    def _retrieve(query, _user_message):
+        queries.append(query)
+        return ["Obst verdaut schnell."], [{"path": "kurs/obst.pdf", "page": 1, "chunk": 0}], [0.2], False
+
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback", _retrieve)
+    monkeypatch.setattr(chat_service, "classify_intent", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "classify_food_items", lambda *_a, **_k: None)
+    metrics.reset()
+    yield queries
+    metrics.reset()
+
+
+def _outcomes():
+    series = metrics.snapshot()["counters"].get(speculative_retrieval.OUTCOMES_TOTAL, {})
+    return {dict(k)["outcome"]: v for k, v in series.items()}
+
+
+def test_similarity_ignores_case_punctuation_and_whitespace():
+    assert similarity(RAW, "Warum soll man Obst allein essen?") == 1.0
+    assert similarity("Obst  allein?", "obst allein") == 1.0
+    assert similarity(RAW, "Warum sollte man Obst allein essen?") < 0.9
+    assert similarity("", "Obst") == 0.0
+
+
+def test_noop_normalization_reuses_the_speculative_retrieval(pipeline, monkeypatch):
+    monkeypatch.setattr(chat_service, "normalize_input", lambda *_a, **_k: "Warum soll man Obst allein essen?")
+
+    prep = speculative_retrieval.scoped(chat_service._prepare_stream)(None, RAW, "guest-1", "learn")
+
+    assert "llm_input" in prep and "Obst verdaut schnell." in prep["llm_input"]
+    assert len(pipeline) == 1  # only the speculative call
+    assert _outcomes() == {"started": 1, "hit": 1}
+
+
+def test_rewritten_message_falls_back_to_normal_retrieval(pipeline, monkeypatch):
+    monkeypatch.setattr(chat_service, "normalize_input", lambda *_a, **_k: "Wieso isst man Früchte getrennt?")
+
+    speculative_retrieval.scoped(chat_service._prepare_stream)(None, RAW, "guest-1", "learn")
+
+    assert len(pipeline) == 2 and pipeline[-1].startswith("Wieso isst man Früchte getrennt?")
+    assert _outcomes() == {"started": 1, "miss": 1}
+
+
+def test_food_analysis_turn_does_not_speculate(pipeline, monkeypatch):
+    message = "Ist Pasta mit Käse ok?"
+    monkeypatch.setattr(chat_service, "normalize_input", lambda *_a, **_k: message)
+
+    speculative_retrieval.scoped(chat_service._prepare_stream)(None, message, "guest-1", "eat")
+
+    assert all(not q.startswith(message) for q in pipeline)  # only the engine query was retrieved
+    assert _outcomes() == {"skipped": 1}
+
+
+def test_speculation_does_not_leak_past_its_turn(pipeline):
+    with speculative_retrieval.scope():
+        speculative_retrieval.start("chat", RAW, chat_service.retrieve_with_fallback)
+    assert speculative_retrieval.take(RAW) is None  # outside the turn: nothing to reuse
+    assert speculative_retrieval.start("chat", RAW, chat_service.retrieve_with_fallback, "img.jpg") is None
+    assert _outcomes() == {"started": 1, "skipped": 1}
+
+
+def test_speculative_hit_keeps_the_faq_probe(pipeline, monkeypatch):
+    from app import faq_cache, rag_service
+
+    def _retrieve(query, _user_message):
+        pipeline.append(query)
+        rag_service._embed_memo[query] = [1.0, 0.0]  # what embed_one leaves behind
+        return ["Obst verdaut schnell."], [{"path": "kurs/obst.pdf", "page": 1, "chunk": 0}], [0.2], False
+
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback", _retrieve)
+    monkeypatch.setattr(chat_service, "normalize_input", lambda *_a, **_k: "Warum soll man Obst allein essen?")
+    monkeypatch.setattr(faq_cache, "_stats", dict(faq_cache._stats))
+    faq_cache.purge()
+    try:
+        prep = speculative_retrieval.scoped(chat_service._prepare_stream)(None, RAW, "guest-1", "learn")
+
+        assert _outcomes() == {"started": 1, "hit": 1} and len(pipeline) == 1
+        assert prep["faq_probe"] is not None
+        faq_cache.store(prep["faq_probe"], "Obst verdaut schneller als alles andere.")
+        assert faq_cache.lookup(prep["faq_probe"]) == "Obst verdaut schneller als alles andere."
+    finally:
+        faq_cache.purge()
+        for query in pipeline:
+            rag_service._embed_memo.pop(query, None)
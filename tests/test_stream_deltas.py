@@ -0,0 +1,95 @@
+"""Coalesced SSE delta frames: flush policy, per-token mode, stream integration."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import app.chat_service as chat_service
+from app import metrics
+from app.chat_modes import ChatMode
+from app.stream_deltas import DeltaCoalescer, delta_frame
+
+TOKENS = ["Obst ", "wird ", "am ", "besten ", "allein ", "gegessen", ", ", "weil ", "es ", "schnell ",
+          "verdaut ", "wird", "."] * 4
+
+
+def _texts(frames):
+    return [json.loads(f.split("data: ", 1)[1])["text"] for f in frames if f.startswith("event: delta")]
+
+
+def test_delta_frame_matches_generic_sse_encoding():
+    for text in ["Hallo", 'Zitat "x"\nneue Zeile', "Ä ö ü ß"]:
+        assert delta_frame(text) == chat_service._sse("delta", {"text": text})
+
+
+def test_first_token_goes_out_then_chars_threshold_batches():
+    c = DeltaCoalescer("coalesce", flush_ms=10_000, max_chars=20)
+    frames = [f for f in (c.add(t, now=0.0) for t in TOKENS) if f]
+    frames.append(c.flush())
+
+    texts = _texts(frames)
+    assert texts[0] == "Obst "
+    assert "".join(texts) == "".join(TOKENS) == c.text()
+    assert all(len(t) >= 20 for t in texts[1:-1])
+    assert len(frames) < len(TOKENS) / 3
+
+
+def test_interval_flush_and_empty_chunks_poll():
+    c = DeltaCoalescer("coalesce", flush_ms=50, max_chars=0)
+    assert c.add("A", now=0.0)          # first token: immediate
+    assert c.add("B", now=0.01) is None
+    assert c.add("", now=0.02) is None  # empty chunk only polls
+    assert _texts([c.add("", now=0.06)]) == ["B"]
+    assert c.flush() is None
+
+
+def test_token_mode_emits_one_frame_per_chunk():
+    c = DeltaCoalescer("token", flush_ms=100, max_chars=120)
+    frames = [c.add(t) for t in TOKENS]
+    assert _texts(frames) == TOKENS
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    def _create(**_kwargs):
+        return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))]) for t in TOKENS])
+
+    saved = []
+    monkeypatch.setattr(chat_service, "client",
+                        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create))))
+    monkeypatch.setattr(chat_service, "create_message",
+                        lambda cid, role, content, intent=None: saved.append(content))
+    monkeypatch.setattr(chat_service, "get_conversation", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "_prepare_stream", lambda *_a, **_k: {
+        "conversation_id": "conv-1", "llm_input": "prompt", "ui_intent": "learn",
+        "mode": ChatMode.KNOWLEDGE, "recipe_results": None, "sources": [],
+    })
+    metrics.reset()
+    yield saved
+    metrics.reset()
+
+
+def test_sync_and_async_streams_coalesce_deltas(streaming, monkeypatch):
+    monkeypatch.setattr(chat_service, "STREAM_DELTA_FLUSH_MS", 10_000)
+    monkeypatch.setattr(chat_service, "STREAM_DELTA_FLUSH_CHARS", 40)
+
+    async def _collect():
+        return [f async for f in chat_service.handle_chat_stream_async("conv-1", "Warum Obst?")]
+
+    for frames in (list(chat_service.handle_chat_stream("conv-1", "Warum Obst?")), asyncio.run(_collect())):
+        texts = _texts(frames)
+        assert "".join(texts) == "".join(TOKENS)
+        assert len(texts) <= len(TOKENS) // 5
+        assert json.loads(frames[-1].split("data: ", 1)[1])["answer"] == "".join(TOKENS)
+    assert streaming == ["".join(TOKENS)] * 2
+
+    frames = metrics.snapshot()["counters"]["kursbot_stream_delta_frames_total"][(("mode", "coalesce"),)]
+    chunks = metrics.snapshot()["counters"]["kursbot_stream_delta_chunks_total"][(("mode", "coalesce"),)]
+    assert chunks == 2 * len(TOKENS) and frames < chunks / 5
+
+
+def test_per_token_mode_keeps_old_framing(streaming, monkeypatch):
+    monkeypatch.setattr(chat_service, "STREAM_DELTA_MODE", "token")
+    frames = list(chat_service.handle_chat_stream("conv-1", "Warum Obst?"))
+    assert _texts(frames) == TOKENS
@@ -0,0 +1,100 @@
+"""Early "verdict" SSE event: engine decision before retrieval and LLM deltas."""
+import asyncio
+import json
+import threading
+
+import pytest
+
+import app.chat_service as chat_service
+from app import database, metrics, migrations, speculative_retrieval
+from app.chat_modes import ChatMode
+from trennkost.analyzer import analyze_text
+
+
+def _events(frames):
+    parsed = []
+    for frame in frames:
+        event, data = frame.strip().split("\n", 1)
+        parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    db_path = tmp_path / "chat.db"
+    monkeypatch.setattr(database, "DB_PATH", str(db_path))
+    monkeypatch.setattr(migrations, "DB_PATH", str(db_path))
+    database.init_db()
+    migrations.run_migrations()
+    metrics.reset()
+
+    calls = []
+    monkeypatch.setattr(chat_service, "normalize_input", lambda message, *_a, **_k: message)
+    monkeypatch.setattr(chat_service, "classify_intent", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "classify_food_items", lambda *_a, **_k: None)
+    monkeypatch.setattr(chat_service, "rewrite_standalone_query", lambda _s, _r, message: message)
+    monkeypatch.setattr(speculative_retrieval, "SPECULATIVE_RETRIEVAL_ENABLED", False)
+
+    def _retrieve(query, _user_message):
+        calls.append("retrieve")
+        return ["Kohlenhydrate und Protein trennen."], [{"path": "kurs/kombi.pdf", "page": 1, "chunk": 0}], [0.2], False
+
+    def _tokens(prep, turn=None):
+        calls.append("llm")
+        yield "Leider "
+        yield "nicht ok."
+
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback", _retrieve)
+    monkeypatch.setattr(chat_service, "_answer_tokens", _tokens)
+    yield calls
+    metrics.reset()
+
+
+def test_verdict_payload_lists_dishes_and_menu_ranking():
+    results = analyze_text("Spaghetti Carbonara", llm_fn=None) + analyze_text("Reis mit Brokkoli", llm_fn=None)
+    payload = chat_service._verdict_payload("c-1", ChatMode.MENU_ANALYSIS, results)
+
+    assert payload["conversationId"] == "c-1" and payload["mode"] == "MENU_ANALYSIS"
+    carbonara = payload["dishes"][0]
+    assert carbonara["verdict"] == "NOT_OK" and {"KH", "PROTEIN"} <= set(carbonara["affectedGroups"])
+    assert payload["ranking"][0] == payload["dishes"][1]["dish"]  # OK dish ranked first
+    assert "ranking" not in chat_service._verdict_payload("c-1", ChatMode.FOOD_ANALYSIS, results[:1])
+
+
+def test_sync_stream_sends_verdict_before_deltas(pipeline):
+    events = _events(chat_service.handle_chat_stream(None, "Ist Reis mit Hähnchen ok?", guest_id="g-1"))
+
+    names = [name for name, _ in events]
+    assert names[:2] == ["meta", "verdict"] and names[-1] == "final"
+    assert names.index("verdict") < names.index("delta")
+    verdict = events[1][1]
+    assert verdict["mode"] == "FOOD_ANALYSIS" and verdict["dishes"][0]["verdict"] == "NOT_OK"
+    assert verdict["conversationId"] == events[-1][1]["conversationId"]
+
+
+def test_async_stream_delivers_verdict_while_prepare_still_runs(pipeline, monkeypatch):
+    verdict_seen = threading.Event()
+    retrieval_saw_verdict = []
+
+    def _retrieve(query, _user_message):
+        retrieval_saw_verdict.append(verdict_seen.wait(timeout=5))
+        return ["Kohlenhydrate und Protein trennen."], [{"path": "kurs/kombi.pdf", "page": 1, "chunk": 0}], [0.2], False
+
+    monkeypatch.setattr(chat_service, "retrieve_with_fallback", _retrieve)
+
+    async def _collect():
+        names = []
+        async for frame in chat_service.handle_chat_stream_async(None, "Ist Reis mit Hähnchen ok?", guest_id="g-1"):
+            names.append(frame.split("\n", 1)[0][len("event: "):])
+            if names[-1] == "verdict":
+                verdict_seen.set()
+        return names
+
+    names = asyncio.run(_collect())
+    assert names.count("verdict") == 1 and names.index("verdict") < names.index("delta")
+    assert retrieval_saw_verdict == [True]  # client had the verdict before retrieval returned
+
+
+def test_knowledge_turns_send_no_verdict(pipeline):
+    names = [n for n, _ in _events(chat_service.handle_chat_stream(None, "Warum soll man Obst allein essen?"))]
+    assert "verdict" not in names and "delta" in names
@@ -0,0 +1,139 @@
+"""Token-budgeted prompt assembly: section trimming order and unchanged output under budget."""
+import app.chat_service as chat_service
+import app.token_budget as token_budget
+from app.chat_modes import ChatMode, ChatModifiers
+from app.prompt_builder import SYSTEM_INSTRUCTIONS, assemble_prompt, assemble_prompt_with_report, build_base_context
+from app.rag_service import build_context
+
+
+def _messages(n: int, size: int = 400):
+    msgs = []
+    for i in range(n):
+        msgs.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i} " + "x" * size})
+    return msgs
+
+
+def _course(n: int, size: int = 800) -> str:
+    docs = [f"chunk {i} " + "y" * size for i in range(n)]
+    metas = [{"path": f"modul/page-{i:03d}.md", "chunk": i} for i in range(n)]
+    return build_context(docs, metas, max_tokens=0)
+
+
+def _parts(summary=None, messages=None):
+    parts, instructions = chat_service._build_prompt_parts(
+        mode=ChatMode.KNOWLEDGE,
+        modifiers=ChatModifiers(),
+        trennkost_results=None,
+        vision_data={},
+        summary=summary,
+        last_messages=messages or [],
+        user_message="Frage?",
+    )
+    return parts, instructions
+
+
+def test_prompt_parts_render_like_base_context():
+    msgs = _messages(4, size=10)
+    parts, _ = _parts(summary="Kurz", messages=msgs)
+
+    assert list(parts) == build_base_context("Kurz", msgs)
+    assert [s.name for s in parts.sections] == ["summary", "history"]
+
+
+def test_prompt_is_unchanged_when_under_budget():
+    msgs = _messages(3, size=10)
+    parts, instructions = _parts(summary="Kurz", messages=msgs)
+    course = _course(2, size=50)
+
+    prompt, report = assemble_prompt_with_report(parts, course, "Frage?", instructions, max_tokens=100000)
+
+    expected = "\n".join(
+        list(parts)
+        + [f"KURS-SNIPPETS (FAKTENBASIS):\n{course}\n", "AKTUELLE FRAGE:\nFrage?\n", instructions]
+    )
+    assert prompt == expected
+    assert report.trimmed == []
+
+
+def test_history_is_trimmed_before_course_and_oldest_turns_go_first(monkeypatch):
+    monkeypatch.setattr(token_budget, "MAX_HISTORY_TOKENS", 0)
+    msgs = _messages(9)
+    parts, instructions = _parts(messages=msgs)
+    course = _course(3)
+    _, full = assemble_prompt_with_report(parts, course, "Frage?", instructions, max_tokens=0)
+
+    budget = full.total - full.sections["history"][0] // 2
+    prompt, report = assemble_prompt_with_report(parts, course, "Frage?", instructions, max_tokens=budget)
+
+    assert report.total <= budget
+    assert report.trimmed == ["history"]
+    assert "m7 " in prompt and "m0 " not in prompt
+    assert "chunk 2 " in prompt
+
+
+def test_course_chunks_dropped_from_lowest_rank_and_fixed_sections_kept():
+    parts, instructions = _parts(summary="Zusammenfassung " * 50, messages=_messages(5))
+    course = _course(6)
+
+    prompt, report = assemble_prompt_with_report(
+        parts, course, "Frage?", instructions,
+        max_tokens=token_budget.count_tokens(SYSTEM_INSTRUCTIONS) + token_budget.count_tokens(instructions) + 500,
+    )
+
+    assert "LETZTE NACHRICHTEN:" not in prompt
+    assert "KONVERSATIONS-ZUSAMMENFASSUNG" not in prompt
+    assert "chunk 0 " in prompt and "chunk 5 " not in prompt
+    assert "AKTUELLE FRAGE:\nFrage?" in prompt
+    assert prompt.endswith(instructions)
+    assert report.sections["instructions"][0] == report.sections["instructions"][1]
+
+
+def test_plain_list_parts_are_kept_as_fixed_block(capsys):
+    prompt = assemble_prompt(["KONTEXT"], "", "Frage?", "ANWEISUNG", max_tokens=1)
+
+    assert prompt.startswith("KONTEXT\nKURS-SNIPPETS (FAKTENBASIS):\n")
+    assert prompt.endswith("ANWEISUNG")
+    assert "[PROMPT_BUDGET]" in capsys.readouterr().out
+
+
+def test_build_context_stops_at_token_cap():
+    docs = ["a" * 700, "b" * 700, "c" * 700]
+    metas = [{"path": "p.md", "chunk": i} for i in range(3)]
+    one = token_budget.count_tokens(f"[p.md#0]\n{docs[0]}\n")
+
+    context = build_context(docs, metas, max_tokens=one * 2)
+
+    assert "[p.md#1]" in context
+    assert "[p.md#2]" not in context
+    assert token_budget.split_course_context(context)[0].startswith("[p.md#0]")
+
+
+def test_system_message_counts_against_the_budget():
+    parts, instructions = _parts(messages=_messages(6))
+    system = token_budget.count_tokens(SYSTEM_INSTRUCTIONS)
+    _, full = assemble_prompt_with_report(parts, _course(2), "Frage?", instructions, max_tokens=0)
+
+    assert full.sections["system"] == (system, system)
+    assert full.total == system + sum(after for name, (_, after) in full.sections.items() if name != "system")
+
+    prompt, report = assemble_prompt_with_report(
+        parts, _course(2), "Frage?", instructions, max_tokens=full.total - system // 2,
+    )
+    assert "history" in report.trimmed and report.total <= full.total - system // 2
+    assert SYSTEM_INSTRUCTIONS not in prompt
+
+
+def test_trim_counts_units_once(monkeypatch):
+    calls = []
+    real = token_budget.count_tokens
+    monkeypatch.setattr(token_budget, "count_tokens", lambda text: calls.append(text) or real(text))
+    units = [f"line {i} " + "x" * 200 for i in range(20)]
+    section = token_budget.history_section(units)
+
+    tokens = token_budget._trim(section, 100, section.tokens())
+    unit_counts = [c for c in calls if c in {u + "\n" for u in units}]
+    renders = len(calls) - len(unit_counts)
+
+    assert sorted(unit_counts) == sorted(u + "\n" for u in units)  # every unit counted exactly once
+    assert renders <= 3  # initial count + recount(s), not one per dropped unit
+    assert tokens == section.tokens() <= 100
@@ -1,8 +1,10 @@
 """
 Trennkost result formatters.
 
-Transforms TrennkostResult objects into text for LLM context and RAG queries.
+Transforms TrennkostResult objects into text for LLM context and RAG queries,
+and renders unambiguous verdicts directly as the user-facing answer.
 """
+import re
 from typing import List
 
 from trennkost.models import AnalysisMode, TrennkostResult, Verdict
@@ -22,6 +24,9 @@ _GROUP_DISPLAY = {
 }
 
 
+_GROUP_SUFFIX_RE = re.compile(r"\s*\([A-Z_]+\)$")
+
+
 def _group_items(result: TrennkostResult, group: str) -> List[str]:
     if result.strict_groups_found and group in result.strict_groups_found:
         return result.strict_groups_found[group]
@@ -246,3 +251,116 @@ def build_rag_query(results: List[TrennkostResult], breakfast_context: bool = Fa
                 query_parts.append("Gärung Fäulnis Obst Fermentation")
 
     return " ".join(query_parts)
+
+
+# ── Direct answer (no LLM) ────────────────────────────────────────────
+
+def _clean_item(item: str) -> str:
+    """'Parmesan → Käse (MILCH)' → 'Parmesan'."""
+    return _GROUP_SUFFIX_RE.sub("", item.split(" → ")[0]).strip()
+
+
+def _join_items(items: List[str]) -> str:
+    names = list(dict.fromkeys(_clean_item(i) for i in items))
+    if len(names) <= 1:
+        return "".join(names)
+    return ", ".join(names[:-1]) + " und " + names[-1]
+
+
+def _keep_options(result: TrennkostResult) -> List[str]:
+    """'Kohlenhydrate (Pasta)' per conflicting group — the choices behind _generate_fix_directions."""
+    groups = set()
+    for p in result.problems:
+        groups.update(p.affected_groups)
+    groups -= {"NEUTRAL", "UNKNOWN"}
+    options = []
+    for g in sorted(groups):
+        items = _group_items(result, g)
+        if items:
+            options.append(f"{_GROUP_DISPLAY.get(g, g)} ({_join_items(items)})")
+    return options if len(options) >= 2 else []
+
+
+def format_verdict_directly(result: TrennkostResult) -> str:
+    """
+    User-facing answer for an unambiguous OK / NOT_OK verdict, without LLM.
+
+    Same structure the LLM is asked for in build_prompt_food_analysis:
+    verdict first, problems briefly explained, the optional keep-one-group
+    offer for NOT_OK, then guidance and health tips. Only meant for results
+    without required_questions (app.direct_answer_policy decides).
+    """
+    dish = result.dish_name
+    lines: List[str] = []
+
+    if result.verdict == Verdict.OK:
+        lines.append(f"**{dish}** ist **trennkost-konform** ✅")
+        neutral = _group_items(result, "NEUTRAL")
+        concentrated = [
+            f"{_join_items(_group_items(result, g))} ({_GROUP_DISPLAY.get(g, g)})"
+            for g in sorted(result.groups_found) if g not in ("NEUTRAL", "FETT", "UNKNOWN") and _group_items(result, g)
+        ]
+        if concentrated and neutral:
+            lines.append(
+                f"\n{' und '.join(concentrated)} passt gut zu {_join_items(neutral)} — stärkearmes Gemüse "
+                "und Salat sind neutral und lassen sich mit allem kombinieren."
+            )
+        elif len(concentrated) == 1:
+            lines.append(f"\nAlles gehört zu einer Gruppe: {concentrated[0]} — du kombinierst also keine "
+                         "konzentrierten Lebensmittel miteinander.")
+    else:
+        lines.append(f"**{dish}** ist leider **nicht trennkost-konform**.")
+        seen = set()
+        for p in result.problems:
+            if p.rule_id in seen:
+                continue
+            seen.add(p.rule_id)
+            lines.append(f"\n**{p.description}** ({_join_items(p.affected_items)}): {p.explanation}")
+        options = _keep_options(result)
+        if options:
+            lines.append(
+                "\nFalls du magst, kann ich dir eine konforme Variante vorschlagen — sag mir einfach, "
+                f"was du lieber behalten möchtest: {', '.join(options[:-1])} oder {options[-1]}. "
+                "Dazu passt dann stärkearmes Gemüse oder Salat."
+            )
+
+    for fact in result.guidance_facts:
+        if fact.affected_items:
+            lines.append(f"\n💡 **Mengen-Hinweis:** {_join_items(fact.affected_items)} — {fact.amount_hint}.")
+    for hint in result.health_hints:
+        lines.append(f"\n💡 **Kleiner Tipp:** {hint.explanation}")
+
+    return "\n".join(lines)
+
+
+_VERDICT_LABELS = {
+    Verdict.CONDITIONAL: "bedingt konform",
+    Verdict.UNKNOWN: "nicht eindeutig bestimmbar",
+}
+
+
+def format_results_without_llm(results: List[TrennkostResult]) -> str:
+    """
+    User-facing answer for any engine results while the LLM is unavailable.
+
+    OK / NOT_OK dishes use format_verdict_directly; CONDITIONAL / UNKNOWN
+    dishes get the verdict label, the engine summary and its problems. Open
+    questions are listed instead of asked one by one.
+    """
+    blocks: List[str] = []
+    for result in results:
+        if result.verdict in (Verdict.OK, Verdict.NOT_OK):
+            lines = [format_verdict_directly(result)]
+        else:
+            lines = [f"**{result.dish_name}** ist **{_VERDICT_LABELS[result.verdict]}**: {result.summary}"]
+            seen = set()
+            for p in result.problems:
+                if p.rule_id in seen:
+                    continue
+                seen.add(p.rule_id)
+                items = f" ({_join_items(p.affected_items)})" if p.affected_items else ""
+                lines.append(f"\n**{p.description}**{items}: {p.explanation}")
+        for question in result.required_questions:
+            lines.append(f"\n❓ **Offene Frage:** {question.question}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
@@ -132,6 +132,7 @@ class Ontology:
         self._entries: List[OntologyEntry] = []
         self._synonym_index: Dict[str, OntologyEntry] = {}  # lowercase → entry
         self._compounds: Dict[str, dict] = {}
+        self._compound_index: Dict[str, str] = {}  # lowercase → compound name
         self._wait_profiles: Dict[str, WaitProfile] = {}
         self._risk_profiles: Dict[str, RiskProfile] = {}
         self._guidance_profiles: Dict[str, GuidanceProfile] = {}
@@ -343,6 +344,8 @@ class Ontology:
         with open(self._compounds_json, "r", encoding="utf-8") as f:
             data = json.load(f)
             self._compounds = data.get("compounds", {})
+        for name in self._compounds:
+            self._compound_index.setdefault(name.lower(), name)
         logger.info(f"Compounds loaded: {len(self._compounds)} dishes")
 
     def _parse_csv_list(self, raw_value: Optional[str]) -> List[str]:
@@ -518,10 +521,8 @@ class Ontology:
         if key in self._compounds:
             return self._compounds[key]
         # Case-insensitive
-        for name, compound in self._compounds.items():
-            if name.lower() == key.lower():
-                return compound
-        return None
+        name = self._compound_index.get(key.lower())
+        return self._compounds[name] if name is not None else None
 
     def get_ambiguous_entries(self, items: List[FoodItem]) -> List[Tuple[FoodItem, str]]:
         """
@@ -576,8 +577,9 @@ _ontology: Optional[Ontology] = None
 
 
 def get_ontology() -> Ontology:
-    """Get or create the singleton Ontology instance."""
+    """Get or create the singleton Ontology instance (from the compiled snapshot when fresh)."""
     global _ontology
     if _ontology is None:
-        _ontology = Ontology()
+        from trennkost.ontology_snapshot import load_ontology
+        _ontology = load_ontology()
     return _ontology
@@ -0,0 +1,182 @@
+"""
+Compiled ontology snapshot.
+
+Ontology() parses ontology.csv row by row, validates references against the
+profile registries, loads compounds.json and builds the synonym index. The
+snapshot stores the finished state (entries, synonym index, compound index,
+profiles, validation issues) as one pickle, keyed by the SHA-256 of every
+source file and of the code that builds and holds that state (ontology.py,
+models.py, this module) plus the pydantic version. Loading it skips parsing
+and validation.
+
+The snapshot is a local build artifact (written by this process or by
+`python -m trennkost.ontology_snapshot`), never user-supplied data. Any
+mismatch or unreadable / unrestorable file falls back to the CSV path.
+Test runs (pytest imported) never write the default SNAPSHOT_PATH, so the
+checkout stays clean; explicit paths are written as usual.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+import pydantic
+
+from trennkost import models, ontology as ontology_module
+from trennkost.ontology import (
+    COMPOUNDS_JSON,
+    GUIDANCE_PROFILES_JSON,
+    ONTOLOGY_CSV,
+    RISK_PROFILES_JSON,
+    WAIT_PROFILES_JSON,
+    Ontology,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = Path(
+    os.getenv(
+        "ONTOLOGY_SNAPSHOT_PATH",
+        str(Path(__file__).parent.parent / "storage" / "ontology_snapshot.pkl"),
+    )
+)
+SNAPSHOT_ENABLED = os.getenv("ONTOLOGY_SNAPSHOT", "1").lower() in ("1", "true", "yes")
+
+_STATE_FIELDS = (
+    "_entries",
+    "_synonym_index",
+    "_compounds",
+    "_compound_index",
+    "_wait_profiles",
+    "_risk_profiles",
+    "_guidance_profiles",
+    "_validation_issues",
+)
+
+
+def _sources() -> Dict[str, Path]:
+    return {
+        "ontology_csv": ONTOLOGY_CSV,
+        "compounds_json": COMPOUNDS_JSON,
+        "wait_profiles_json": WAIT_PROFILES_JSON,
+        "risk_profiles_json": RISK_PROFILES_JSON,
+        "guidance_profiles_json": GUIDANCE_PROFILES_JSON,
+    }
+
+
+def _code_files() -> Dict[str, Path]:
+    return {
+        "ontology_py": Path(ontology_module.__file__),
+        "models_py": Path(models.__file__),
+        "ontology_snapshot_py": Path(__file__),
+    }
+
+
+def source_hashes(sources: Optional[Dict[str, Path]] = None) -> Dict[str, str]:
+    """SHA-256 per source file ("" for a missing file)."""
+    hashes = {}
+    for name, path in (sources or _sources()).items():
+        path = Path(path)
+        hashes[name] = hashlib.sha256(path.read_bytes()).hexdigest() if path.exists() else ""
+    return hashes
+
+
+def code_hashes() -> Dict[str, str]:
+    """SHA-256 of the modules that build / hold the pickled state, plus the pydantic version."""
+    hashes = source_hashes(_code_files())
+    hashes["pydantic"] = pydantic.VERSION
+    return hashes
+
+
+def compile_snapshot(ontology: Ontology, path: Path = None, sources: Dict[str, Path] = None) -> Path:
+    """Write the ontology state to `path` atomically (temp file + rename)."""
+    path = Path(path or SNAPSHOT_PATH)
+    payload = {
+        "code": code_hashes(),
+        "sources": source_hashes(sources),
+        "state": {name: getattr(ontology, name) for name in _STATE_FIELDS},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    logger.info("Ontology snapshot written: %s", path)
+    return path
+
+
+def load_snapshot(path: Path = None, sources: Dict[str, Path] = None) -> Optional[Ontology]:
+    """Ontology restored from `path`, or None if missing, stale or unreadable."""
+    path = Path(path or SNAPSHOT_PATH)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("code") != code_hashes() or payload.get("sources") != source_hashes(sources):
+            logger.info("Ontology snapshot %s is stale; rebuilding from CSV", path)
+            return None
+        state = {name: payload["state"][name] for name in _STATE_FIELDS}
+    except Exception as exc:
+        logger.warning("Ignoring unreadable ontology snapshot %s: %s", path, exc)
+        return None
+
+    src = sources or _sources()
+    ontology = Ontology.__new__(Ontology)
+    ontology._ontology_csv = Path(src["ontology_csv"])
+    ontology._compounds_json = Path(src["compounds_json"])
+    ontology._wait_profiles_json = Path(src["wait_profiles_json"])
+    ontology._risk_profiles_json = Path(src["risk_profiles_json"])
+    ontology._guidance_profiles_json = Path(src["guidance_profiles_json"])
+    for name, value in state.items():
+        setattr(ontology, name, value)
+    return ontology
+
+
+def _may_write(path: Optional[Path]) -> bool:
+    """False for the default SNAPSHOT_PATH during a test run."""
+    return path is not None or "pytest" not in sys.modules
+
+
+def load_ontology(path: Path = None) -> Ontology:
+    """Snapshot if fresh, else parse the CSV sources and (re)write the snapshot."""
+    if not SNAPSHOT_ENABLED:
+        return Ontology()
+    ontology = load_snapshot(path)
+    if ontology is not None:
+        return ontology
+    ontology = Ontology()
+    if not _may_write(path):
+        return ontology
+    try:
+        compile_snapshot(ontology, path)
+    except OSError as exc:
+        logger.warning("Could not write ontology snapshot: %s", exc)
+    return ontology
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Validate the ontology sources and compile the snapshot.")
+    parser.add_argument("--out", type=Path, default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    compiled = Ontology()
+    try:
+        compiled.assert_valid()
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+    out = compile_snapshot(compiled, args.out)
+    print(f"{len(compiled.entries)} entries, {len(compiled._synonym_index)} synonyms → {out}")